@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the compact character models: retained memory and JSON encode time of a cached party held as plain
+dicts (the previous representation) versus __slots__ models with shared spells.
+"""
+
+import gc
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root / 'server'))
+
+from character_models import Campaign, Character, encode_json
+from synthetic_party import build_party
+
+
+def build_snapshot(size):
+    """The party as it sits in the snapshot file"""
+    return encode_json(build_party(size))
+
+
+def load_as_dicts(body):
+    return json.loads(body)
+
+
+def load_as_models(body):
+    snapshot = json.loads(body)
+    return {
+        'characters': {k: Character.from_dict(v) for k, v in snapshot['characters'].items()},
+        'campaigns': {k: Campaign.from_dict(v) for k, v in snapshot['campaigns'].items()},
+    }
+
+
+def retained_bytes(loader, body):
+    """Bytes still allocated once loading finished and temporaries were freed"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    data = loader(body)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del data
+    return after - before
+
+
+def encode_dicts(data):
+    # What JSONResponse does with a dict
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode('utf-8')
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[5, 25, 100])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    print("Character models vs dicts")
+    print("=" * 30)
+    print(f"{'party':>6} {'dict KB':>9} {'model KB':>9} {'memory':>8} {'dict ms':>9} {'model ms':>9} {'encode':>8}")
+    mismatches = 0
+    for size in args.sizes:
+        body = build_snapshot(size)
+        dict_kb = retained_bytes(load_as_dicts, body) / 1024
+        model_kb = retained_bytes(load_as_models, body) / 1024
+        dicts = load_as_dicts(body)
+        models = load_as_models(body)
+        if encode_json(models) != encode_dicts(dicts):
+            mismatches += 1
+        dict_ms = timed(lambda: encode_dicts(dicts), args.repeat)
+        model_ms = timed(lambda: encode_json(models), args.repeat)
+        print(
+            f"{size:>6} {dict_kb:>9.1f} {model_kb:>9.1f} {dict_kb / model_kb:>7.2f}x "
+            f"{dict_ms:>9.3f} {model_ms:>9.3f} {dict_ms / model_ms:>7.2f}x"
+        )
+    if mismatches:
+        print(f"\n✗ Model encoding differed from the dict encoding for {mismatches} party sizes")
+        sys.exit(1)
+    print("\n✓ Model encoding is byte for byte identical to the dict encoding")
+
+
+if __name__ == "__main__":
+    main()
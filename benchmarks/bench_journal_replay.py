@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the journaled character cache: per-mutation write cost and startup replay time
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root / 'server'))
+
+from character_models import encode_json
+from character_store import CharacterStore
+from synthetic_party import build_party
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2] * 1000
+
+
+def bench_writes(party, repeat):
+    with tempfile.TemporaryDirectory() as directory:
+        # Compaction disabled so only the append is measured
+        store = CharacterStore(Path(directory), compact_min_bytes=1 << 40)
+        store.replace(party)
+        char_id = next(iter(party['characters']))
+        character = party['characters'][char_id]
+        journal_ms = timed(lambda: store.put({char_id: character}), repeat)
+
+        snapshot_path = Path(directory) / 'full_rewrite.json'
+
+        def full_rewrite():
+            with open(snapshot_path, 'wb') as f:
+                f.write(encode_json(party))
+
+        rewrite_ms = timed(full_rewrite, repeat)
+    return journal_ms, rewrite_ms
+
+
+def bench_replay(party, journal_records, repeat):
+    with tempfile.TemporaryDirectory() as directory:
+        store = CharacterStore(Path(directory), compact_min_bytes=1 << 40)
+        store.replace(party)
+        store.compact()
+        char_ids = list(party['characters'])
+        for i in range(journal_records):
+            char_id = char_ids[i % len(char_ids)]
+            store.put({char_id: party['characters'][char_id]})
+        journal_bytes = os.path.getsize(Path(directory) / 'local_character_data.journal') if journal_records else 0
+        load_ms = timed(lambda: CharacterStore(Path(directory)).load(), repeat)
+    return load_ms, journal_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[5, 25, 100])
+    parser.add_argument('--journal-records', type=int, nargs='+', default=[0, 10, 100, 500])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print("Character store benchmark (median ms)")
+    print("=" * 40)
+    print(f"{'party':>6} {'journal put':>12} {'full rewrite':>13}")
+    for size in args.sizes:
+        journal_ms, rewrite_ms = bench_writes(build_party(size), args.repeat)
+        print(f"{size:>6} {journal_ms:>12.3f} {rewrite_ms:>13.3f}")
+
+    print()
+    print(f"{'party':>6} {'records':>8} {'journal KB':>11} {'startup load':>13}")
+    for size in args.sizes:
+        party = build_party(size)
+        for records in args.journal_records:
+            load_ms, journal_bytes = bench_replay(party, records, args.repeat)
+            print(f"{size:>6} {records:>8} {journal_bytes / 1024:>11.1f} {load_ms:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
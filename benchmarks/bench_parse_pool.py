@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the parse pool: decoding and formatting a bulk refresh worth of character service responses
+in-process versus in 1..N worker processes (DND_TRACKER_PARSE_WORKERS). Bodies come from a synthetic party padded to
+the size of real responses, every pool is started and warmed up before it is timed, and every run has to give the
+same characters as in-process parsing.
+
+Scaling depends on the cores available, on a single core the pool can only add overhead.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root / 'server'))
+
+from beyond_dnd import BeyondDnDClient
+from character_models import encode_json
+from parse_pool import ParsePool
+from synthetic_party import generate_party
+
+
+def encoded_party(characters, pad_bytes):
+    bodies = []
+    for document in generate_party(characters, max(1, characters // 25), seed=49):
+        if pad_bytes:
+            document = dict(document, data=dict(document['data'], benchPadding='x' * pad_bytes))
+        bodies.append((str(document['data']['id']), json.dumps(document).encode()))
+    return bodies
+
+
+def parse_all(client, pool, bodies):
+    if pool is None:
+        return {char_id: client.parse_character_content(content, char_id) for char_id, content in bodies}
+    pending = {char_id: pool.submit(content, char_id, client.parse_character_content) for char_id, content in bodies}
+    return {char_id: pool.result(item) for char_id, item in pending.items()}
+
+
+def encoded(parsed):
+    return encode_json({char_id: character for char_id, (character, _, _) in parsed.items()})
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return min(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--characters', type=int, default=200)
+    parser.add_argument('--pad-bytes', type=int, default=100 * 1024,
+                        help='Added to every body, the fixtures are about 230KB and real parties go up to 400KB')
+    parser.add_argument('--workers', type=int, nargs='*', help='Pool sizes to try, default 1, 2, 4 and the CPU count')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    sizes = args.workers or sorted({1, 2, 4, cpus})
+    bodies = encoded_party(args.characters, args.pad_bytes)
+    total_mb = sum(len(content) for _, content in bodies) / 1024 / 1024
+    client = BeyondDnDClient(parse_pool=ParsePool(0))
+
+    print("Bulk refresh parsing")
+    print("=" * 30)
+    print(f"{len(bodies)} bodies, {total_mb:.1f}MB, {cpus} CPU(s)\n")
+    print(f"{'setup':>14} {'seconds':>9} {'chars/s':>9} {'MB/s':>7} {'speedup':>8}")
+
+    expected = encoded(parse_all(client, None, bodies))
+    baseline = timed(lambda: parse_all(client, None, bodies), args.repeat)
+    print(f"{'in-process':>14} {baseline:>9.3f} {len(bodies) / baseline:>9.0f} {total_mb / baseline:>7.1f} {1:>7.2f}x")
+    for workers in sizes:
+        pool = ParsePool(workers, min_batch=1)
+        try:
+            # Starts the workers, they are kept across batches in the server too
+            if encoded(parse_all(client, pool, bodies)) != expected:
+                print(f"✗ {workers} worker(s) parsed the party differently")
+                sys.exit(1)
+            seconds = timed(lambda: parse_all(client, pool, bodies), args.repeat)
+        finally:
+            pool.shutdown()
+        print(f"{f'{workers} worker(s)':>14} {seconds:>9.3f} {len(bodies) / seconds:>9.0f} {total_mb / seconds:>7.1f} "
+              f"{baseline / seconds:>7.2f}x")
+    print("\n✓ Every pool size parsed the party the same as in-process")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the parse/format pipeline and the cache, with a regression gate against stored baselines.
+
+Cases run on the test_data fixtures and on a synthetic party (benchmarks/synthetic_party.py, fixed seed):
+formatting whole characters, building spell lists, counting inventories, parsing spell descriptions, and saving and
+loading the party through the character store. Each reports per-op latency percentiles over the rounds, throughput
+and the peak memory allocated while it runs.
+
+    python benchmarks/bench_pipeline.py                    # compare against benchmarks/baselines/pipeline.json
+    python benchmarks/bench_pipeline.py --update-baseline  # record new baselines after an intended change
+
+A fixed calibration workload runs between every two rounds of a case, and each round is timed relative to the
+calibrations on either side of it. A machine that gets slower for a while (another process, frequency scaling) slows
+both down, so the relative time of a case stays put where its absolute time doesn't, and a baseline recorded on
+another machine still gives a usable comparison.
+
+Exits non-zero when a case's median relative time is more than --threshold above its baseline, or its peak
+allocation that much bigger. Baselines are recorded over several runs (--runs) and keep how far those runs were apart.
+Cases whose runs spread more than half the threshold (mostly the disk bound cache cases) are allowed twice their
+spread instead, a gate tighter than the noise would fail on its own. Re-record on the machine that runs the gate for
+tight thresholds.
+"""
+
+import gc
+import sys
+import math
+import json
+import time
+import argparse
+import platform
+import statistics
+import tempfile
+import tracemalloc
+from pathlib import Path
+from typing import Callable, List, Optional
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root / 'server'))
+
+from beyond_dnd import BeyondDnDClient
+from character_store import CharacterStore
+from synthetic_party import FIXTURES, generate_party, load_fixtures
+
+BASELINE_FILE = Path(__file__).resolve().parent / 'baselines' / 'pipeline.json'
+DEFAULT_THRESHOLD = 0.25
+# A case is allowed this many times the spread of its baseline runs when that is more than the threshold
+SPREAD_MARGIN = 2
+DEFAULT_BASELINE_RUNS = 5
+SYNTHETIC_SEED = 47
+
+
+def _no_setup():
+    pass
+
+
+class Case:
+    """One benchmark: run() does ops operations, setup() (untimed) prepares each round"""
+
+    def __init__(self, name: str, run: Callable[[], object], ops: int, setup: Optional[Callable[[], None]] = None):
+        self.name = name
+        self.run = run
+        self.ops = ops
+        self.setup = setup or _no_setup
+
+
+def _percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _loops_for(case: Case, min_round_seconds: float) -> int:
+    """Runs per round so a round takes at least min_round_seconds, shorter rounds are mostly timer noise"""
+    loops = 1
+    while True:
+        case.setup()
+        start = time.perf_counter()
+        for _ in range(loops):
+            case.run()
+        if time.perf_counter() - start >= min_round_seconds or case.setup is not _no_setup:
+            # Cases with a setup can't be repeated without it, one run per round
+            return loops
+        loops *= 2
+
+
+def measure(case: Case, rounds: int, min_round_seconds: float = 0.02) -> dict:
+    loops = _loops_for(case, min_round_seconds)  # also warms up, spells get interned and files cached
+    samples = []
+    relative = []
+    calibrations = [calibrate()]
+    for _ in range(rounds):
+        case.setup()
+        gc.collect()
+        start = time.perf_counter()
+        for _ in range(loops):
+            case.run()
+        sample = (time.perf_counter() - start) / (case.ops * loops) * 1e6
+        calibrations.append(calibrate())
+        samples.append(sample)
+        # Against the calibrations right before and after the round, a slow spell that hits it hits them too
+        relative.append(sample / math.sqrt(calibrations[-2] * calibrations[-1]))
+    samples.sort()
+    # Allocations are measured in a round of their own, tracing slows everything down
+    case.setup()
+    gc.collect()
+    tracemalloc.start()
+    case.run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    p50 = _percentile(samples, 50)
+    return {
+        'calibrationMs': round(statistics.median(calibrations), 3),
+        # us per op per calibration ms, what the gate compares
+        'relative': round(statistics.median(relative), 5),
+        'ops': case.ops * loops,
+        'minUs': round(samples[0], 3),
+        'p50Us': round(p50, 3),
+        'p95Us': round(_percentile(samples, 95), 3),
+        'p99Us': round(_percentile(samples, 99), 3),
+        'opsPerSecond': round(1e6 / p50, 1) if p50 else 0.0,
+        'peakKiB': round(peak / 1024, 1),
+    }
+
+
+def calibrate() -> float:
+    """ms of a fixed pure Python workload (JSON round trips and dict churn), the unit cases are timed in"""
+    document = {'spells': [{'name': f'spell {i}', 'level': i % 9, 'components': ['V', 'S', 'M']} for i in range(400)]}
+    start = time.perf_counter()
+    for _ in range(10):
+        decoded = json.loads(json.dumps(document))
+        counts = {}
+        for spell in decoded['spells']:
+            counts[spell['name'][-1]] = counts.get(spell['name'][-1], 0) + spell['level']
+    return (time.perf_counter() - start) * 1000
+
+
+def combine_runs(runs: List[dict]) -> dict:
+    """Per case, the run with the median relative time, and how far apart the runs were relative to it"""
+    combined = {}
+    for name in runs[0]:
+        results = sorted((run[name] for run in runs), key=lambda result: result['relative'])
+        median = results[len(results) // 2]
+        spread = (results[-1]['relative'] - results[0]['relative']) / median['relative'] if median['relative'] else 0
+        combined[name] = {**median, 'spread': round(spread, 3)}
+    return combined
+
+
+def allowed_slowdown(base: dict, threshold: float) -> float:
+    return max(threshold, SPREAD_MARGIN * base.get('spread', 0))
+
+
+def build_cases(characters: int, campaigns: int, directory: Path) -> List[Case]:
+    client = BeyondDnDClient()
+    format_data = client._BeyondDnDClient__format_character_data
+    build_spells = client._BeyondDnDClient__build_character_spell_list
+    count_items = client._BeyondDnDClient__count_inventory_items
+    parse_description = client._BeyondDnDClient__parse_spell_description
+
+    fixture_data = [document['data'] for document in load_fixtures(FIXTURES)]
+    synthetic_data = [document['data'] for document in generate_party(characters, campaigns, SYNTHETIC_SEED)]
+    descriptions = [
+        (spell['definition'].get('name'), spell['definition'].get('componentsDescription'))
+        for data in synthetic_data
+        for spell in data['spells']['race'] + data['spells']['class'] + data['classSpells'][0]['spells']
+    ]
+
+    cases = []
+    for label, party in (('fixtures', fixture_data), ('synthetic', synthetic_data)):
+        cases += [
+            Case(f'format_character/{label}',
+                 lambda party=party: [format_data(data, str(data['id'])) for data in party], len(party)),
+            Case(f'build_spell_list/{label}', lambda party=party: [build_spells(data) for data in party], len(party)),
+            Case(f'count_inventory/{label}',
+                 lambda party=party: [count_items(data['inventory'], data['customItems']) for data in party],
+                 len(party)),
+        ]
+    cases.append(Case('parse_spell_description/synthetic',
+                      lambda: [parse_description(name, description) for name, description in descriptions],
+                      len(descriptions)))
+
+    # The formatted party as the client caches it
+    formatted = {}
+    campaign_data = {}
+    for data in synthetic_data:
+        character = format_data(data, str(data['id']))
+        if data['campaign']:
+            campaign_id = str(data['campaign']['id'])
+            character = character.replace(campaign_id=campaign_id)
+            campaign_data[campaign_id] = {'name': data['campaign']['name'], 'description': '', 'dmUsername': ''}
+        formatted[str(data['id'])] = character
+    party = {'characters': formatted, 'campaigns': campaign_data}
+    # Background compaction off, each case triggers exactly the I/O it measures
+    no_compaction = 1 << 40
+
+    save_dir = directory / 'save'
+    save_dir.mkdir()
+    save_store = CharacterStore(save_dir, compact_min_bytes=no_compaction)
+
+    def replace_then_compact():
+        save_store.clear()
+        save_store.replace(party)
+
+    load_dir = directory / 'load'
+    load_dir.mkdir()
+    load_store = CharacterStore(load_dir, compact_min_bytes=no_compaction)
+    load_store.replace(party)
+    load_store.compact()
+    cases += [
+        Case('cache_save_journal/synthetic', lambda: save_store.replace(party), 1, save_store.clear),
+        Case('cache_save_snapshot/synthetic', save_store.compact, 1, replace_then_compact),
+        Case('cache_load/synthetic', lambda: CharacterStore(load_dir, compact_min_bytes=no_compaction).load(), 1),
+    ]
+    return cases
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    regressions = []
+    for name, result in results.items():
+        base = baseline['cases'].get(name)
+        if base is None or 'relative' not in base:
+            continue
+        allowed = allowed_slowdown(base, threshold)
+        change = result['relative'] / base['relative'] - 1
+        if change > allowed:
+            regressions.append(f"{name}: {change:+.0%} relative to its baseline, allowed {allowed:.0%}")
+        # Small peaks are mostly noise from interning and free lists
+        allowed_kib = max(base['peakKiB'] * (1 + threshold), base['peakKiB'] + 64)
+        if result['peakKiB'] > allowed_kib:
+            regressions.append(f"{name}: peak {result['peakKiB']:.0f}KiB, baseline {base['peakKiB']:.0f}KiB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--characters', type=int, default=300, help='Size of the synthetic party')
+    parser.add_argument('--campaigns', type=int, default=12)
+    parser.add_argument('--rounds', type=int, default=15)
+    parser.add_argument('--only', help='Only run cases whose name contains this')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='Allowed slowdown, 0.25 = 25%%')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_FILE)
+    parser.add_argument('--update-baseline', action='store_true', help='Write the results as the new baseline')
+    parser.add_argument('--runs', type=int,
+                        help=f'Times the suite runs, {DEFAULT_BASELINE_RUNS} when recording a baseline, else 1')
+    parser.add_argument('--json', type=Path, help='Also write the results here')
+    args = parser.parse_args()
+
+    runs = args.runs or (DEFAULT_BASELINE_RUNS if args.update_baseline else 1)
+    with tempfile.TemporaryDirectory() as directory:
+        cases = build_cases(args.characters, args.campaigns, Path(directory))
+        if args.only:
+            cases = [case for case in cases if args.only in case.name]
+        print("Parse/format pipeline and cache")
+        print("=" * 30)
+        print(f"Synthetic party of {args.characters} characters, {args.rounds} rounds, {runs} run(s)\n")
+        run_results = []
+        for run in range(runs):
+            if runs > 1:
+                print(f"Run {run + 1}/{runs}", flush=True)
+            run_results.append({case.name: measure(case, args.rounds) for case in cases})
+        results = combine_runs(run_results)
+    print(f"{'case':>36} {'best us':>10} {'p50 us':>10} {'p95 us':>10} {'p99 us':>10} {'ops/s':>10} {'peak KiB':>9} "
+          f"{'relative':>9} {'spread':>7}")
+    for name, result in results.items():
+        print(f"{name:>36} {result['minUs']:>10.1f} {result['p50Us']:>10.1f} {result['p95Us']:>10.1f} "
+              f"{result['p99Us']:>10.1f} {result['opsPerSecond']:>10.0f} {result['peakKiB']:>9.0f} "
+              f"{result['relative']:>9.4f} {result['spread']:>7.0%}")
+
+    report = {
+        'characters': args.characters,
+        'campaigns': args.campaigns,
+        'rounds': args.rounds,
+        'runs': runs,
+        'calibrationMs': min((result['calibrationMs'] for result in results.values()), default=0),
+        'python': platform.python_version(),
+        'cases': results,
+    }
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2) + '\n')
+    if args.update_baseline:
+        if args.only and args.baseline.exists():
+            # Keep the cases that weren't run
+            previous = json.loads(args.baseline.read_text())
+            report['cases'] = {**previous['cases'], **results}
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(report, indent=2) + '\n')
+        print(f"\nWrote baseline to {args.baseline}")
+        return
+    if not args.baseline.exists():
+        print(f"\nNo baseline at {args.baseline}, run with --update-baseline to record one")
+        return
+    baseline = json.loads(args.baseline.read_text())
+    if (baseline['characters'], baseline['campaigns']) != (args.characters, args.campaigns):
+        print(f"\n✗ Baseline was recorded for {baseline['characters']} characters in {baseline['campaigns']} "
+              f"campaigns, run with the same sizes")
+        sys.exit(2)
+    if baseline.get('rounds') != args.rounds or baseline.get('runs', 1) < 2:
+        print(f"\n✗ Baseline wasn't recorded over several runs of {args.rounds} rounds each, the way this check "
+              f"runs, re-record it with --update-baseline")
+        sys.exit(2)
+    regressions = compare(results, baseline, args.threshold)
+    loosened = {name: allowed_slowdown(base, args.threshold) for name, base in baseline['cases'].items()
+                if name in results and allowed_slowdown(base, args.threshold) > args.threshold}
+    if loosened:
+        print(f"\nToo noisy for {args.threshold:.0%}, gated at {SPREAD_MARGIN}x their baseline spread: "
+              + ', '.join(f"{name} {allowed:.0%}" for name, allowed in loosened.items()))
+    if regressions:
+        print(f"\n✗ {len(regressions)} regression(s) past {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print(f"\n✓ No case regressed past {args.threshold:.0%} of its baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for the SPA catch-all's exclusion check: the previous any() walks over the prefix and extension
+lists, str.startswith/endswith with tuples, and the compiled regex main.py uses. Runs over a mix of asset, API and
+deep-link paths like the catch-all sees them (leading slash stripped) and checks all three agree on every path.
+"""
+
+import sys
+import random
+import timeit
+import argparse
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from main import SPA_EXCLUDED_EXTENSIONS, SPA_EXCLUDED_PATH, SPA_EXCLUDED_PREFIXES
+
+
+def path_mix(count, seed=7):
+    """Mostly deep links and missing files, the paths that actually reach the catch-all"""
+    rng = random.Random(seed)
+    kinds = [
+        (30, lambda: f'campaign/{rng.randint(1, 99999)}/characters/{rng.randint(1, 9999999)}'),
+        (15, lambda: rng.choice(['spells', 'inventory', 'settings', 'party/overview', 'components'])),
+        (10, lambda: '/'.join(rng.choice(['party', 'wizard', 'cleric', 'spell', 'focus', 'x']) for _ in range(8))),
+        (15, lambda: f'assets/index-{rng.getrandbits(40):010x}.{rng.choice(["js", "css", "map"])}'),
+        (10, lambda: rng.choice(['robots.txt', 'manifest.json', 'logo.png', 'apple-touch-icon.png', 'sw.js'])),
+        (10, lambda: f'characters/{rng.randint(1, 9999999)}'),
+        (5, lambda: rng.choice(['docs', 'openapi.json', 'metrics', 'readyz', '.well-known/security.txt'])),
+        (5, lambda: f'parties/{rng.choice(["tuesday", "oneshot"])}/characters'),
+    ]
+    weights = [weight for weight, _ in kinds]
+    return [rng.choices(kinds, weights)[0][1]() for _ in range(count)]
+
+
+def any_lists(path):
+    # What serve_spa_routes did before
+    return (any(path.startswith(prefix) for prefix in list(SPA_EXCLUDED_PREFIXES)) or
+            any(path.endswith(ext) for ext in list(SPA_EXCLUDED_EXTENSIONS)))
+
+
+def str_tuples(path):
+    return path.startswith(SPA_EXCLUDED_PREFIXES) or path.endswith(SPA_EXCLUDED_EXTENSIONS)
+
+
+def compiled_regex(path):
+    return SPA_EXCLUDED_PATH.match(path) is not None
+
+
+MATCHERS = [('any() over lists', any_lists), ('str tuples', str_tuples), ('compiled regex', compiled_regex)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--paths', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    paths = path_mix(args.paths)
+    expected = [any_lists(path) for path in paths]
+    excluded = sum(expected)
+    print("SPA catch-all exclusion check")
+    print("=" * 30)
+    print(f"{len(paths)} paths, {excluded} excluded (404), {len(paths) - excluded} served index.html\n")
+    print(f"{'matcher':>18} {'ns/path':>9} {'speedup':>8}")
+    baseline = None
+    for name, matcher in MATCHERS:
+        if [matcher(path) for path in paths] != expected:
+            print(f"✗ {name} disagrees with the previous check")
+            sys.exit(1)
+        seconds = min(timeit.repeat(lambda: [matcher(path) for path in paths], number=1, repeat=args.repeat))
+        ns = seconds / len(paths) * 1e9
+        baseline = baseline or ns
+        print(f"{name:>18} {ns:>9.0f} {baseline / ns:>7.1f}x")
+    print("\n✓ All matchers agree on every path")
+
+
+if __name__ == "__main__":
+    main()
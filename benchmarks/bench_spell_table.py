@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Payload size of GET /characters in the default shape versus ?spell_table=true, where every distinct spell is sent
+once in a top level table and characters reference spells by id. Sizes are reported raw and gzipped, since browsers
+usually get the compressed body.
+"""
+
+import sys
+import gzip
+import argparse
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root / 'server'))
+
+from character_models import encode_json, encode_with_spell_table
+from synthetic_party import FIXTURES, build_party
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2, 4, 6, 10])
+    args = parser.parse_args()
+
+    print("Spell table payload reduction")
+    print("=" * 30)
+    print(f"{'party':>6} {'default KB':>11} {'table KB':>9} {'saved':>7} {'gzip KB':>8} {'gz table':>9} {'saved':>7}")
+    for size in args.sizes:
+        party = build_party(size)
+        default = encode_json(party)
+        table = encode_with_spell_table(party)
+        default_gz = gzip.compress(default)
+        table_gz = gzip.compress(table)
+        print(
+            f"{size:>6} {len(default) / 1024:>11.1f} {len(table) / 1024:>9.1f} "
+            f"{1 - len(table) / len(default):>7.1%} {len(default_gz) / 1024:>8.1f} {len(table_gz) / 1024:>9.1f} "
+            f"{1 - len(table_gz) / len(default_gz):>7.1%}"
+        )
+    print(f"\nA party of {len(FIXTURES)} is the fixtures without repeats, i.e. no spells shared between characters")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Cold start benchmark: import time of main.py and of the app (parsed from python -X importtime), the modules that
+dominate it, and the time from launching the server process to its first successful GET /characters.
+
+Exits non-zero when a budget is exceeded, or when importing main.py pulls in modules that are supposed to load
+lazily, so it can gate startup regressions.
+"""
+
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import tempfile
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root / 'server'))
+
+from synthetic_party import build_party
+
+# Must not be imported by `import main`, the parent of a multi-worker server never needs them
+LAZY_AT_MAIN = ('fastapi', 'requests', 'uvicorn', 'server', 'beyond_dnd')
+# Must not be imported by loading the app, the first upstream call loads them
+LAZY_AT_APP = ('requests', 'traced_adapter')
+
+# Loads the app like main() does for a single process, without opening a browser
+SERVER_SNIPPET = (
+    "import sys; sys.path.insert(0, {root!r}); import main, uvicorn; main.setup_frontend_serving(); "
+    "uvicorn.run(main.load_app(), host='127.0.0.1', port={port}, log_level='warning')"
+)
+
+
+def import_times(statement):
+    """
+    (self, cumulative) microseconds per module from one interpreter running statement with -X importtime, and the
+    total of the top level imports
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import sys; sys.path.insert(0, {str(project_root)!r}); {statement}"],
+        cwd=project_root, capture_output=True, text=True, check=True
+    )
+    modules = {}
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # Nested imports are indented by two more spaces per level
+        if not name.startswith('  '):
+            total_us += int(cumulative_us)
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules, total_us
+
+
+def loaded_modules(statement, names):
+    """Which of names end up in sys.modules after running statement"""
+    result = subprocess.run(
+        [
+            sys.executable, '-c',
+            f"import sys, json; sys.path.insert(0, {str(project_root)!r}); {statement}; "
+            f"print(json.dumps([name for name in {list(names)!r} if name in sys.modules]))"
+        ],
+        cwd=project_root, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def seed_cache(directory):
+    from cache_manager import CacheManager
+    cache = CacheManager(Path(directory) / 'tmp')
+    with cache.writing():
+        cache.store.replace(build_party())
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def time_to_first_request(workdir, timeout=30):
+    """Seconds from starting the server process until GET /characters answers 200"""
+    port = free_port()
+    url = f'http://127.0.0.1:{port}/characters'
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-c', SERVER_SNIPPET.format(root=str(project_root), port=port)],
+        cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as resp:
+                    if resp.status == 200:
+                        return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError):
+                pass
+            if process.poll() is not None:
+                raise RuntimeError('Server exited before answering')
+            time.sleep(0.005)
+        raise RuntimeError(f'Server did not answer within {timeout}s')
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='Slowest modules to list by self time')
+    parser.add_argument('--max-import-ms', type=float, help='Budget for `import main`')
+    parser.add_argument('--max-app-ms', type=float, help='Budget for importing main and loading the app')
+    parser.add_argument('--max-first-request-ms', type=float, help='Budget for the first successful request')
+    args = parser.parse_args()
+
+    failures = []
+
+    print("Startup")
+    print("=" * 30)
+    main_samples = []
+    app_samples = []
+    app_modules = {}
+    for _ in range(args.runs):
+        main_samples.append(import_times('import main')[0]['main'][1] / 1000)
+        app_modules, app_us = import_times('import main; main.load_app()')
+        app_samples.append(app_us / 1000)
+    main_ms = statistics.median(main_samples)
+    app_ms = statistics.median(app_samples)
+    print(f"import main:             {main_ms:8.1f} ms")
+    print(f"import main + load app:  {app_ms:8.1f} ms  (interpreter startup excluded)")
+
+    print(f"\nSlowest modules by self time (last run)")
+    slowest = sorted(app_modules.items(), key=lambda item: item[1][0], reverse=True)[:args.top]
+    for name, (self_us, cumulative_us) in slowest:
+        print(f"  {name:<45} {self_us / 1000:7.1f} ms self {cumulative_us / 1000:8.1f} ms cumulative")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        seed_cache(workdir)
+        first_samples = [time_to_first_request(workdir) * 1000 for _ in range(args.runs)]
+    first_ms = statistics.median(first_samples)
+    print(f"\nFirst successful request: {first_ms:7.1f} ms median, {min(first_samples):.1f} ms best of {args.runs}")
+
+    eager = loaded_modules('import main', LAZY_AT_MAIN)
+    if eager:
+        failures.append(f"import main loaded {', '.join(eager)}")
+    eager = loaded_modules('import main; main.load_app()', LAZY_AT_APP)
+    if eager:
+        failures.append(f"loading the app loaded {', '.join(eager)}")
+    for label, value, budget in (
+        ('import main', main_ms, args.max_import_ms),
+        ('app load', app_ms, args.max_app_ms),
+        ('first request', first_ms, args.max_first_request_ms),
+    ):
+        if budget is not None and value > budget:
+            failures.append(f"{label} took {value:.1f} ms, budget {budget:.1f} ms")
+
+    if failures:
+        for failure in failures:
+            print(f"✗ {failure}")
+        sys.exit(1)
+    print("\n✓ Startup within budget, lazy imports stay lazy")
+
+
+if __name__ == "__main__":
+    main()
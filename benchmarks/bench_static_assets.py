@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Requests/sec for the frontend files: the previous setup (StaticFiles mounts and FileResponse for index.html, read
+from disk on every request) versus the in-memory StaticBundle. Each setup runs under uvicorn in its own process and
+is hit over keep-alive connections with a mix of index.html, hashed asset and revalidation (If-None-Match) requests.
+
+Uses frontend/dist when it has been built, otherwise a synthetic build of about the same shape.
+"""
+
+import sys
+import time
+import socket
+import argparse
+import tempfile
+import subprocess
+import http.client
+import multiprocessing
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root / 'server'))
+
+SETUPS = ('disk', 'memory')
+
+
+def write_synthetic_dist(directory: Path):
+    """index.html, a hashed JS and CSS bundle of realistic size and a favicon"""
+    assets = directory / 'assets'
+    assets.mkdir(parents=True)
+    js = ''.join(
+        f'function component{i}(props){{return h("div",{{class:"spell-card-{i % 40}"}},[props.name,props.count])}}\n'
+        for i in range(4000)
+    )
+    (assets / 'index-BX3kq9aZ.js').write_text(js)
+    css = ''.join(f'.spell-card-{i}{{margin:{i % 8}px;color:#{i:06x}}}\n' for i in range(1500))
+    (assets / 'index-D41x8Ks2.css').write_text(css)
+    (directory / 'index.html').write_text(
+        '<!DOCTYPE html><html lang="en"><head><meta charset="UTF-8"><link rel="icon" href="/favicon.ico">'
+        '<meta name="viewport" content="width=device-width, initial-scale=1.0"><title>Spell Component Tracker</title>'
+        '<script type="module" crossorigin src="/assets/index-BX3kq9aZ.js"></script>'
+        '<link rel="stylesheet" crossorigin href="/assets/index-D41x8Ks2.css"></head>'
+        '<body><div id="app"></div></body></html>\n'
+    )
+    (directory / 'favicon.ico').write_bytes(bytes(range(256)) * 16)
+
+
+def build_app(setup: str, dist: Path):
+    from fastapi import FastAPI, Request
+    from fastapi.responses import FileResponse
+    from fastapi.staticfiles import StaticFiles
+    from static_assets import StaticBundle
+
+    app = FastAPI()
+    index_file = dist / 'index.html'
+    if setup == 'disk':
+        app.mount('/assets', StaticFiles(directory=dist / 'assets'), name='assets')
+
+        @app.get('/{full_path:path}')
+        async def serve_spa(full_path: str = ''):
+            return FileResponse(index_file, media_type='text/html')
+    else:
+        bundle = StaticBundle(dist)
+        app.mount('/assets', bundle.app('assets/'), name='assets')
+
+        @app.get('/{full_path:path}')
+        async def serve_spa(request: Request, full_path: str = ''):
+            return bundle.response('index.html', request.headers)
+    return app
+
+
+def serve(setup: str, dist: str, port: int):
+    import uvicorn
+    uvicorn.run(build_app(setup, Path(dist)), host='127.0.0.1', port=port, log_level='warning')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f'Server on port {port} did not start')
+
+
+def request_mix(dist: Path):
+    """(path, headers) pairs of a page load: the index, its bundles and a deep link that also gets the index"""
+    js = next((dist / 'assets').glob('*.js')).name
+    css = next((dist / 'assets').glob('*.css'), None)
+    gzip = {'Accept-Encoding': 'gzip'}
+    mix = [('/', gzip), (f'/assets/{js}', gzip), ('/campaign/123', gzip)]
+    if css is not None:
+        mix.append((f'/assets/{css.name}', gzip))
+    return mix
+
+
+def client_loop(args):
+    port, mix, seconds, revalidate = args
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    etags = {}
+    done = 0
+    received = 0
+    errors = 0
+    deadline = time.monotonic() + seconds
+    i = 0
+    while time.monotonic() < deadline:
+        path, headers = mix[i % len(mix)]
+        i += 1
+        headers = dict(headers)
+        if revalidate and path in etags:
+            headers['If-None-Match'] = etags[path]
+        conn.request('GET', path, headers=headers)
+        resp = conn.getresponse()
+        body = resp.read()
+        if resp.status not in (200, 304):
+            errors += 1
+        etags.setdefault(path, resp.getheader('etag'))
+        received += len(body)
+        done += 1
+    conn.close()
+    return done, received, errors
+
+
+def run_load(port, mix, clients, seconds, revalidate):
+    with multiprocessing.Pool(clients) as pool:
+        results = pool.map(client_loop, [(port, mix, seconds, revalidate)] * clients)
+    return (
+        sum(result[0] for result in results) / seconds,
+        sum(result[1] for result in results) / max(1, sum(result[0] for result in results)),
+        sum(result[2] for result in results),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--dist', type=Path, help='Frontend build to serve, defaults to frontend/dist or a synthetic one')
+    parser.add_argument('--serve', choices=SETUPS, help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.dist, args.port)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dist = args.dist
+        if dist is None:
+            dist = project_root / 'frontend' / 'dist'
+            if not (dist / 'index.html').exists():
+                dist = Path(tmp) / 'dist'
+                write_synthetic_dist(dist)
+        mix = request_mix(dist)
+        print("Frontend file serving")
+        print("=" * 30)
+        print(f"Serving {dist}, {args.clients} clients for {args.seconds}s per run\n")
+        print(f"{'setup':>8} {'run':>12} {'req/s':>9} {'avg bytes':>10} {'errors':>7}")
+        for setup in SETUPS:
+            port = free_port()
+            process = subprocess.Popen(
+                [sys.executable, __file__, '--serve', setup, '--dist', str(dist), '--port', str(port)]
+            )
+            try:
+                wait_for(port)
+                for label, revalidate in (('first', False), ('reload', True)):
+                    rps, avg_bytes, errors = run_load(port, mix, args.clients, args.seconds, revalidate)
+                    print(f"{setup:>8} {label:>12} {rps:>9.0f} {avg_bytes:>10.0f} {errors:>7}")
+            finally:
+                process.terminate()
+                process.wait()
+    print("\n'first' downloads every file, 'reload' sends the ETags back like a browser revalidating its cache")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+End-to-end HTTP load test: starts the stub character service (benchmarks/stub_upstream.py) with a synthetic party,
+starts the API from server/server.py under uvicorn pointed at it, seeds the cache, turns on the --upstream-* faults
+and then drives a weighted mix of requests from --concurrency clients, each sending its next request as soon as the
+last one returned.
+
+Routes in the mix (weights with --mix, e.g. --mix cached=60,single=25,refresh=10,delete=5):
+    cached          GET /characters, the cached party
+    single          GET /characters/{id}, one cached character
+    refresh         GET /characters/{id}?force_update=true, refetched from the stub. Deleted characters are
+                    refreshed first, which puts them back
+    delete          DELETE /characters/{id}
+    refresh_party   GET /characters?force_update=true with every id, refetches the whole party
+
+Reports latency percentiles, throughput, error rate and status codes per route. --json writes the same as one
+document, along with the settings and the commit it ran on, so runs can be compared across commits.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlencode
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from synthetic_party import FIRST_CHARACTER_ID
+
+ROUTES = ('cached', 'single', 'refresh', 'delete', 'refresh_party')
+DEFAULT_MIX = 'cached=60,single=25,refresh=10,delete=5'
+PERCENTILES = (50, 90, 95, 99)
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(','):
+        route, _, weight = part.partition('=')
+        route = route.strip()
+        if route not in ROUTES:
+            raise ValueError(f"Unknown route {route}, expected one of {', '.join(ROUTES)}")
+        mix[route] = float(weight or 1)
+    if not any(mix.values()):
+        raise ValueError('The mix needs at least one route with a weight')
+    return mix
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url_host: str, port: int, path: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(url_host, port, timeout=2)
+            conn.request('GET', path)
+            if conn.getresponse().status == 200:
+                conn.close()
+                return
+            conn.close()
+        except OSError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f'{url_host}:{port}{path} did not answer 200 within {timeout}s')
+
+
+def start_stub(port: int, args) -> subprocess.Popen:
+    # Without faults, they are turned on by configure_stub() once the cache is seeded
+    process = subprocess.Popen([
+        sys.executable, str(Path(__file__).resolve().parent / 'stub_upstream.py'), '--port', str(port),
+        '--synthetic', str(args.characters), '--synthetic-campaigns', str(args.campaigns), '--seed', str(args.seed),
+    ], stdout=subprocess.DEVNULL)
+    wait_for('127.0.0.1', port, '/stub/stats')
+    return process
+
+
+def configure_stub(port: int, args):
+    config = {
+        'latency': args.upstream_latency or 'none', 'errorRate': args.upstream_error_rate,
+        'rateLimitRate': args.upstream_rate_limit_rate, 'slowBodyRate': args.upstream_slow_body_rate,
+    }
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    conn.request('POST', '/stub/config', body=json.dumps(config), headers={'Content-Type': 'application/json'})
+    resp = conn.getresponse()
+    resp.read()
+    conn.close()
+    if resp.status != 200:
+        raise RuntimeError(f'Could not configure the stub, status {resp.status}')
+
+
+def start_server(port: int, workdir: str, upstream_url: str, workers: int) -> subprocess.Popen:
+    # Same settings main.py uses
+    server_dir = project_root / 'server'
+    env = dict(os.environ, DND_TRACKER_UPSTREAM_URL=upstream_url)
+    process = subprocess.Popen(
+        [
+            sys.executable, '-c',
+            f"import sys; sys.path.insert(0, {str(server_dir)!r}); import uvicorn; "
+            f"from tcp_nodelay import NoDelayH11Protocol; "
+            f"uvicorn.run('server:app', app_dir={str(server_dir)!r}, host='127.0.0.1', port={port}, "
+            f"workers={workers}, http=NoDelayH11Protocol, log_level='warning')"
+        ],
+        cwd=workdir, env=env,
+    )
+    wait_for('127.0.0.1', port, '/readyz')
+    return process
+
+
+class Party:
+    """Which characters are cached right now, so reads go to ones that exist and refreshes restore deleted ones"""
+
+    def __init__(self, char_ids: List[str], seed: int):
+        self.all_ids = list(char_ids)
+        self._present = list(char_ids)
+        self._deleted: List[str] = []
+        self._lock = threading.Lock()
+        # Deletes and whole party refreshes can't overlap, a refresh would bring back a character deleted meanwhile
+        self.membership = threading.Lock()
+        self._rng = random.Random(seed)
+
+    def pick_present(self) -> Optional[str]:
+        with self._lock:
+            return self._rng.choice(self._present) if self._present else None
+
+    def take_for_delete(self) -> Optional[str]:
+        with self._lock:
+            # Never empty the party, a cached read of nothing is a 400
+            if len(self._present) <= 1:
+                return None
+            char_id = self._present.pop(self._rng.randrange(len(self._present)))
+            self._deleted.append(char_id)
+            return char_id
+
+    def take_for_refresh(self) -> str:
+        with self._lock:
+            if self._deleted:
+                return self._deleted.pop(0)
+            return self._rng.choice(self.all_ids)
+
+    def restored(self, char_id: str):
+        with self._lock:
+            if char_id not in self._present:
+                self._present.append(char_id)
+
+    def refresh_failed(self, char_id: str):
+        with self._lock:
+            if char_id not in self._present and char_id not in self._deleted:
+                self._deleted.append(char_id)
+
+    def all_restored(self):
+        with self._lock:
+            self._present = list(self.all_ids)
+            self._deleted = []
+
+
+class Client(threading.Thread):
+    def __init__(self, port: int, party: Party, mix: Dict[str, float], deadline: float, warmup_until: float,
+                 seed: int):
+        super().__init__(daemon=True)
+        self.port = port
+        self.party = party
+        self.routes = list(mix)
+        self.weights = list(mix.values())
+        self.deadline = deadline
+        self.warmup_until = warmup_until
+        self.rng = random.Random(seed)
+        self.latencies: Dict[str, List[float]] = {route: [] for route in ROUTES}
+        self.statuses: Dict[str, Counter] = {route: Counter() for route in ROUTES}
+        self.conn: Optional[http.client.HTTPConnection] = None
+
+    def run(self):
+        while time.monotonic() < self.deadline:
+            route = self.rng.choices(self.routes, self.weights)[0]
+            getattr(self, f'_{route}')()
+
+    def _request(self, route: str, method: str, path: str, timeout: float = 60) -> int:
+        start = time.perf_counter()
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=timeout)
+            self.conn.request(method, path)
+            resp = self.conn.getresponse()
+            resp.read()
+            status = resp.status
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = None
+            status = 0  # connection error
+        elapsed = time.perf_counter() - start
+        if time.monotonic() >= self.warmup_until:
+            self.latencies[route].append(elapsed)
+            self.statuses[route][str(status)] += 1
+        return status
+
+    def _cached(self):
+        self._request('cached', 'GET', '/characters')
+
+    def _single(self):
+        char_id = self.party.pick_present()
+        if char_id is not None:
+            self._request('single', 'GET', f'/characters/{char_id}')
+
+    def _refresh(self):
+        char_id = self.party.take_for_refresh()
+        status = self._request('refresh', 'GET', f'/characters/{char_id}?force_update=true')
+        if status == 200:
+            self.party.restored(char_id)
+        else:
+            self.party.refresh_failed(char_id)
+
+    def _delete(self):
+        with self.party.membership:
+            char_id = self.party.take_for_delete()
+            if char_id is not None:
+                self._request('delete', 'DELETE', f'/characters/{char_id}')
+
+    def _refresh_party(self):
+        query = urlencode([('force_update', 'true')] + [('char_ids', char_id) for char_id in self.party.all_ids])
+        with self.party.membership:
+            if self._request('refresh_party', 'GET', f'/characters?{query}', timeout=600) == 200:
+                self.party.all_restored()
+
+
+def _percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(latencies: List[float], statuses: Counter, seconds: float) -> dict:
+    latencies = sorted(latencies)
+    requests = len(latencies)
+    errors = sum(count for status, count in statuses.items() if not status.startswith('2'))
+    summary = {
+        'requests': requests,
+        'throughput': round(requests / seconds, 2),
+        'errors': errors,
+        'errorRate': round(errors / requests, 4) if requests else 0.0,
+        'statuses': dict(sorted(statuses.items())),
+    }
+    for p in PERCENTILES:
+        summary[f'p{p}Ms'] = round(_percentile(latencies, p) * 1000, 3)
+    summary['maxMs'] = round(latencies[-1] * 1000, 3) if latencies else 0.0
+    return summary
+
+
+def seed_cache(port: int, char_ids: List[str]):
+    query = urlencode([('force_update', 'true')] + [('char_ids', char_id) for char_id in char_ids])
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=600)
+    conn.request('GET', f'/characters?{query}')
+    resp = conn.getresponse()
+    resp.read()
+    conn.close()
+    if resp.status != 200:
+        raise RuntimeError(f'Could not seed the cache, status {resp.status}')
+
+
+def current_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=project_root, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Route weights, default {DEFAULT_MIX}')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--warmup', type=float, default=2, help='Seconds at the start left out of the results')
+    parser.add_argument('--workers', type=int, default=1, help='uvicorn workers')
+    parser.add_argument('--characters', type=int, default=100, help='Size of the synthetic party')
+    parser.add_argument('--campaigns', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--upstream-latency', help="Stub latency spec, e.g. 'lognormal:80:0.5'")
+    parser.add_argument('--upstream-error-rate', type=float, default=0.0)
+    parser.add_argument('--upstream-rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--upstream-slow-body-rate', type=float, default=0.0)
+    parser.add_argument('--json', type=Path, help='Write the results as JSON to this file')
+    args = parser.parse_args()
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    char_ids = [str(FIRST_CHARACTER_ID + i) for i in range(args.characters)]
+    stub_port = free_port()
+    server_port = free_port()
+    stub = start_stub(stub_port, args)
+    server = None
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            server = start_server(server_port, workdir, f'http://127.0.0.1:{stub_port}', args.workers)
+            seed_cache(server_port, char_ids)
+            configure_stub(stub_port, args)
+            party = Party(char_ids, args.seed)
+            start = time.monotonic()
+            warmup_until = start + args.warmup
+            deadline = warmup_until + args.seconds
+            clients = [Client(server_port, party, mix, deadline, warmup_until, args.seed * 1000 + i)
+                       for i in range(args.concurrency)]
+            for client in clients:
+                client.start()
+            for client in clients:
+                client.join()
+            measured = time.monotonic() - warmup_until
+    finally:
+        for process in (server, stub):
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    routes = {}
+    all_latencies = []
+    all_statuses = Counter()
+    for route in ROUTES:
+        latencies = [latency for client in clients for latency in client.latencies[route]]
+        statuses = sum((client.statuses[route] for client in clients), Counter())
+        if latencies:
+            routes[route] = summarize(latencies, statuses, measured)
+            all_latencies += latencies
+            all_statuses += statuses
+    report = {
+        'commit': current_commit(),
+        'settings': {
+            'mix': mix, 'concurrency': args.concurrency, 'seconds': args.seconds, 'warmup': args.warmup,
+            'workers': args.workers, 'characters': args.characters, 'campaigns': args.campaigns, 'seed': args.seed,
+            'upstreamLatency': args.upstream_latency, 'upstreamErrorRate': args.upstream_error_rate,
+            'upstreamRateLimitRate': args.upstream_rate_limit_rate,
+            'upstreamSlowBodyRate': args.upstream_slow_body_rate,
+        },
+        'routes': routes,
+        'total': summarize(all_latencies, all_statuses, measured),
+    }
+
+    print("HTTP load test")
+    print("=" * 30)
+    print(f"{args.concurrency} clients, {args.workers} worker(s), {args.characters} characters, "
+          f"{measured:.1f}s measured after {args.warmup}s warmup\n")
+    print(f"{'route':>14} {'requests':>9} {'req/s':>8} {'errors':>7} "
+          + ' '.join(f"{f'p{p} ms':>8}" for p in PERCENTILES) + f" {'max ms':>8}")
+    for route, summary in list(routes.items()) + [('total', report['total'])]:
+        print(f"{route:>14} {summary['requests']:>9} {summary['throughput']:>8.1f} {summary['errorRate']:>7.1%} "
+              + ' '.join(f"{summary[f'p{p}Ms']:>8.1f}" for p in PERCENTILES) + f" {summary['maxMs']:>8.1f}")
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2) + '\n')
+        print(f"\nWrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Multi-process load test: runs the API under uvicorn with 1..N workers sharing one cache directory, checks that a
+write through one worker is visible to every other worker right away, and reports read throughput per worker count.
+"""
+
+import sys
+import time
+import socket
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+from pathlib import Path
+
+import requests
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root / 'server'))
+
+from cache_manager import CacheManager
+from synthetic_party import build_party
+
+LEDGER_COMPONENT = 'Diamond_Dust'
+
+
+def seed_cache(directory, size):
+    """Writes a formatted party straight into the cache so no upstream is needed"""
+    party = build_party(size)
+    cache = CacheManager(Path(directory) / 'tmp')
+    with cache.writing():
+        cache.store.replace(party)
+    # Odd ids come from the fixture with the SMC custom item
+    return list(party['characters']), '1001'
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(workdir, port, workers):
+    # Same settings main.py uses for multiple workers
+    server_dir = project_root / 'server'
+    process = subprocess.Popen(
+        [
+            sys.executable, '-c',
+            f"import sys; sys.path.insert(0, {str(server_dir)!r}); import uvicorn; "
+            f"from tcp_nodelay import NoDelayH11Protocol; "
+            f"uvicorn.run('server:app', app_dir={str(server_dir)!r}, host='127.0.0.1', port={port}, "
+            f"workers={workers}, http=NoDelayH11Protocol, log_level='warning')"
+        ],
+        cwd=workdir,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f'http://127.0.0.1:{port}/characters', timeout=1).status_code == 200:
+                return process
+        except requests.exceptions.ConnectionError:
+            pass
+        time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f'Server with {workers} workers did not start')
+
+
+def check_coherence(base_url, ledger_char_id, rounds):
+    """Every read after a write returns, whichever worker serves it, has to include that write"""
+    session = requests.Session()
+    stale = 0
+    for _ in range(rounds):
+        resp = session.post(f'{base_url}/characters/{ledger_char_id}/components/{LEDGER_COMPONENT}/consume')
+        expected = resp.json()['custom_items'][LEDGER_COMPONENT]
+        for _ in range(8):
+            character = session.get(f'{base_url}/characters/{ledger_char_id}').json()
+            if character['custom_items'][LEDGER_COMPONENT] != expected:
+                stale += 1
+        session.post(f'{base_url}/characters/{ledger_char_id}/components/{LEDGER_COMPONENT}/restock')
+    return stale
+
+
+def client_loop(args):
+    base_url, char_ids, seconds = args
+    session = requests.Session()
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + seconds
+    i = 0
+    while time.monotonic() < deadline:
+        # Mostly single character reads with a full party read every few requests, like page loads would do
+        url = f'{base_url}/characters' if i % 4 == 0 else f'{base_url}/characters/{char_ids[i % len(char_ids)]}'
+        start = time.perf_counter()
+        resp = session.get(url)
+        latencies.append(time.perf_counter() - start)
+        if resp.status_code != 200:
+            errors += 1
+        i += 1
+    return latencies, errors
+
+
+def run_load(base_url, char_ids, clients, seconds):
+    with multiprocessing.Pool(clients) as pool:
+        results = pool.map(client_loop, [(base_url, char_ids, seconds)] * clients)
+    latencies = sorted(latency for result in results for latency in result[0])
+    errors = sum(result[1] for result in results)
+    if not latencies:
+        return 0, 0, 0, errors
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    return len(latencies) / seconds, percentile(0.5), percentile(0.99), errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--clients', type=int, default=8, help='concurrent client processes')
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--characters', type=int, default=10)
+    parser.add_argument('--coherence-rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    rows = []
+    stale_reads = 0
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as workdir:
+            char_ids, ledger_char_id = seed_cache(workdir, args.characters)
+            port = free_port()
+            process = start_server(workdir, port, workers)
+            base_url = f'http://127.0.0.1:{port}'
+            try:
+                stale = check_coherence(base_url, ledger_char_id, args.coherence_rounds)
+                stale_reads += stale
+                rows.append((workers, stale) + run_load(base_url, char_ids, args.clients, args.seconds))
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+
+    print("Multi-worker load test")
+    print("=" * 30)
+    print(f"{'workers':>7} {'stale':>6} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    baseline = rows[0][2] if rows and rows[0][2] else None
+    for workers, stale, throughput, p50, p99, errors in rows:
+        scaling = f"  x{throughput / baseline:.2f}" if baseline else ""
+        print(f"{workers:>7} {stale:>6} {throughput:>9.1f} {p50:>8.2f} {p99:>8.2f} {errors:>7}{scaling}")
+    if stale_reads:
+        print(f"\n✗ {stale_reads} reads did not see a write made through another worker")
+        sys.exit(1)
+    print("\n✓ Writes were visible across all workers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Concurrency stress test for the character cache: hammers one BeyondDnDClient with mixed reads, refreshes, deletes
+and component consumption from many threads, then checks nothing was lost. Exits non-zero on any violation.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+from http import HTTPStatus
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root / 'server'))
+
+from beyond_dnd import BeyondDnDClient, BeyondDnDAPIError
+from cache_manager import CacheManager
+from synthetic_party import load_fixtures
+
+# Character from the fixture with an SMC custom item, never deleted so its ledger total can be checked at the end
+LEDGER_CHAR_ID = 'ledger'
+LEDGER_COMPONENT = 'Diamond_Dust'
+
+
+class OfflineClient(BeyondDnDClient):
+    """Serves the fixtures instead of calling D&D Beyond"""
+
+    def __init__(self, fixtures, latency):
+        super().__init__()
+        # Response bodies as the character service sends them
+        self._fixtures = [json.dumps(fixture).encode() for fixture in fixtures]
+        self._latency = latency
+
+    def _BeyondDnDClient__get_bdnd_character_data(self, char_id: str) -> bytes:
+        time.sleep(self._latency)
+        if char_id == LEDGER_CHAR_ID:
+            return self._fixtures[1]
+        return self._fixtures[hash(char_id) % len(self._fixtures)]
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.errors = []
+        self.net_delta = 0
+
+    def count(self, name):
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def fail(self, message):
+        with self.lock:
+            self.errors.append(message)
+
+
+def check_snapshot(data, stats):
+    campaigns = data.get('campaigns', {})
+    for char_id, character in data.get('characters', {}).items():
+        campaign_id = character.campaign_id
+        if campaign_id and campaign_id != 'None' and campaign_id not in campaigns:
+            stats.fail(f'character {char_id} references missing campaign {campaign_id}')
+
+
+def worker(client, char_ids, stats, deadline, seed):
+    rng = random.Random(seed)
+    while time.monotonic() < deadline:
+        roll = rng.random()
+        char_id = rng.choice(char_ids)
+        try:
+            if roll < 0.55:
+                check_snapshot(client.get_all_characters_data(), stats)
+                stats.count('read_all')
+            elif roll < 0.70:
+                client.get_one_characters_data(char_id)
+                stats.count('read_one')
+            elif roll < 0.80:
+                client.get_one_characters_data(char_id, force_update=True)
+                stats.count('refresh_one')
+            elif roll < 0.83:
+                check_snapshot(client.get_all_characters_data(char_ids + [LEDGER_CHAR_ID], force_update=True), stats)
+                stats.count('refresh_all')
+            elif roll < 0.90:
+                client.delete_character_by_id(char_id)
+                stats.count('delete')
+            elif roll < 0.95:
+                client.consume_component(LEDGER_CHAR_ID, LEDGER_COMPONENT)
+                with stats.lock:
+                    stats.net_delta -= 1
+                stats.count('consume')
+            else:
+                client.restock_component(LEDGER_CHAR_ID, LEDGER_COMPONENT)
+                with stats.lock:
+                    stats.net_delta += 1
+                stats.count('restock')
+        except BeyondDnDAPIError as e:
+            # Reading or deleting a character another thread just deleted is expected
+            if e.status_code != HTTPStatus.NOT_FOUND:
+                stats.fail(f'unexpected error: {repr(e)}')
+            stats.count('not_found')
+        except Exception as e:
+            stats.fail(f'unexpected exception: {repr(e)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--characters', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.001, help='simulated upstream latency in seconds')
+    args = parser.parse_args()
+
+    # Switch threads as often as possible so read-modify-write races actually interleave
+    sys.setswitchinterval(1e-6)
+    fixtures = load_fixtures()
+    char_ids = [str(1000 + i) for i in range(args.characters)]
+    original_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            client = OfflineClient(fixtures, args.latency)
+            client.get_all_characters_data(char_ids + [LEDGER_CHAR_ID], force_update=True)
+
+            stats = Stats()
+            deadline = time.monotonic() + args.seconds
+            threads = [
+                threading.Thread(target=worker, args=(client, char_ids, stats, deadline, seed))
+                for seed in range(args.threads)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            final = client.get_all_characters_data()
+            check_snapshot(final, stats)
+            expected = f'{500 + stats.net_delta}GP'
+            actual = final['characters'][LEDGER_CHAR_ID].custom_items[LEDGER_COMPONENT]
+            if actual != expected:
+                stats.fail(f'lost ledger update: expected {expected}, got {actual}')
+
+            # A fresh client replaying the files from disk has to see exactly what the live one has in memory
+            CacheManager(Path(directory) / 'tmp').compact()
+            reloaded = OfflineClient(fixtures, 0).get_all_characters_data()
+            if reloaded != final:
+                stats.fail('state replayed from disk does not match the in-memory cache')
+        finally:
+            os.chdir(original_cwd)
+
+    print("Cache concurrency stress test")
+    print("=" * 30)
+    for name, count in sorted(stats.counts.items()):
+        print(f"{name:>12}: {count}")
+    if stats.errors:
+        for error in stats.errors[:20]:
+            print(f"✗ {error}")
+        print(f"\n✗ {len(stats.errors)} violations")
+        sys.exit(1)
+    print("\n✓ No lost updates or inconsistent snapshots")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Offline stand-in for the D&D Beyond character service, for benchmarks, load tests and demos without network access.
+Serves /character/v5/character/{id} from the test_data fixtures: their own ids return them as they are, any other
+numeric id gets a variant of one of them under that id and a derived name. Latency, error and 429 rates, slow bodies
+and payload padding are configurable, every random choice comes from one seeded generator.
+
+Point the app at it with DND_TRACKER_UPSTREAM_URL=http://127.0.0.1:8999 (or BeyondDnDClient(upstream_url=...)).
+Request counts per status are at /stub/stats. POST /stub/config with a JSON object of latency, errorRate,
+rateLimitRate and slowBodyRate changes them while running, e.g. to seed a cache before turning faults on.
+
+Latency specs, in milliseconds: 'fixed:50', 'uniform:20:80', 'normal:50:10', 'lognormal:50:0.5' (median, sigma),
+'exp:50' (mean). The default is no added latency.
+"""
+
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from collections import Counter
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+
+from synthetic_party import FIXTURES
+
+CHARACTER_PREFIX = '/character/v5/character/'
+STATS_PATH = '/stub/stats'
+CONFIG_PATH = '/stub/config'
+SLOW_BODY_CHUNK_BYTES = 4096
+
+
+def parse_latency(spec: Optional[str]) -> Callable[[random.Random], float]:
+    """Sampler returning seconds for a latency spec, see the module docstring"""
+    if not spec or spec == 'none':
+        return lambda rng: 0.0
+    kind, *values = spec.split(':')
+    try:
+        values = [float(value) for value in values]
+    except ValueError:
+        raise ValueError(f'Invalid latency spec {spec}')
+    samplers = {
+        ('fixed', 1): lambda rng: values[0],
+        ('uniform', 2): lambda rng: rng.uniform(values[0], values[1]),
+        ('normal', 2): lambda rng: rng.gauss(values[0], values[1]),
+        ('lognormal', 2): lambda rng: rng.lognormvariate(math.log(values[0]), values[1]),
+        ('exp', 1): lambda rng: rng.expovariate(1 / values[0]) if values[0] > 0 else 0.0,
+    }
+    sampler = samplers.get((kind, len(values)))
+    if sampler is None:
+        raise ValueError(f'Invalid latency spec {spec}')
+    return lambda rng: max(0.0, sampler(rng)) / 1000
+
+
+class StubUpstream:
+    """
+    What the handler serves and how it misbehaves. Documents are encoded once per id and kept, so the stub itself
+    stays cheap next to the client it is measuring.
+    """
+
+    def __init__(self, fixtures=FIXTURES, latency: Optional[str] = None, error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, retry_after: int = 1, slow_body_rate: float = 0.0,
+                 slow_body_bps: int = 64 * 1024, pad_bytes: int = 0, missing_ids=(), seed: int = 0):
+        self.documents: Dict[str, dict] = {}
+        for fixture in fixtures:
+            with open(fixture, 'r') as f:
+                document = json.load(f)
+            self.documents[str(document['data']['id'])] = document
+        self._templates = list(self.documents.values())
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.slow_body_rate = slow_body_rate
+        self.slow_body_bps = slow_body_bps
+        self.pad_bytes = pad_bytes
+        self.missing_ids = set(missing_ids)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = Counter()
+        self.encoded = lru_cache(maxsize=4096)(self._encode)
+
+    def configure(self, latency: Optional[str] = None, errorRate: Optional[float] = None,
+                  rateLimitRate: Optional[float] = None, slowBodyRate: Optional[float] = None):
+        # Parameters named like the JSON POSTed to /stub/config, missing ones are left as they are
+        with self._lock:
+            if latency is not None:
+                self.latency = parse_latency(latency)
+            if errorRate is not None:
+                self.error_rate = float(errorRate)
+            if rateLimitRate is not None:
+                self.rate_limit_rate = float(rateLimitRate)
+            if slowBodyRate is not None:
+                self.slow_body_rate = float(slowBodyRate)
+
+    def add_document(self, document: dict):
+        """Serves document under its own id, e.g. one from a synthetic party"""
+        self.documents[str(document['data']['id'])] = document
+        self.encoded.cache_clear()
+
+    def document(self, char_id: str) -> Optional[dict]:
+        if char_id in self.documents:
+            return self.documents[char_id]
+        if not char_id.isdigit() or not self._templates:
+            return None
+        template = self._templates[int(char_id) % len(self._templates)]
+        data = dict(template['data'], id=int(char_id), name=f"{template['data']['name']} #{char_id}")
+        return dict(template, id=int(char_id), data=data)
+
+    def _encode(self, char_id: str) -> Optional[bytes]:
+        document = self.document(char_id)
+        if document is None:
+            return None
+        if self.pad_bytes:
+            # Unused by the client, only makes the body bigger
+            document = dict(document, data=dict(document['data'], stubPadding='x' * self.pad_bytes))
+        return json.dumps(document).encode()
+
+    def respond(self, char_id: str) -> Tuple[float, int, bytes, dict, bool]:
+        """Delay, status, body, headers and whether to trickle the body for one request"""
+        with self._lock:
+            delay = self.latency(self._rng)
+            roll = self._rng.random()
+            slow = self._rng.random() < self.slow_body_rate
+        headers = {}
+        if roll < self.rate_limit_rate:
+            status, body = 429, _error_body(char_id, 'Too Many Requests')
+            headers['Retry-After'] = str(self.retry_after)
+        elif roll < self.rate_limit_rate + self.error_rate:
+            status, body = 500, _error_body(char_id, 'Internal Server Error')
+        else:
+            body = None if char_id in self.missing_ids else self.encoded(char_id)
+            status = 200
+            if body is None:
+                status, body = 404, _error_body(char_id, 'Character not found')
+        with self._lock:
+            self.stats[str(status)] += 1
+        return delay, status, body, headers, slow and status == 200
+
+
+def _error_body(char_id: str, message: str) -> bytes:
+    # Same envelope the service uses, data is null on failures
+    return json.dumps({'id': char_id, 'success': False, 'message': message, 'data': None}).encode()
+
+
+def make_handler(stub: StubUpstream):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            if self.path.split('?', 1)[0] != CONFIG_PATH:
+                self._send(404, _error_body('', 'Not Found'), {})
+                return
+            try:
+                stub.configure(**json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}'))
+            except (TypeError, ValueError) as e:
+                self._send(400, _error_body('', str(e)), {})
+                return
+            self._send(200, b'{}', {})
+
+        def do_GET(self):
+            path = self.path.split('?', 1)[0]
+            if path == STATS_PATH:
+                with stub._lock:
+                    stats = dict(stub.stats)
+                self._send(200, json.dumps(stats).encode(), {})
+                return
+            if not path.startswith(CHARACTER_PREFIX):
+                self._send(404, _error_body('', 'Not Found'), {})
+                return
+            delay, status, body, headers, slow = stub.respond(path[len(CHARACTER_PREFIX):].strip('/'))
+            if delay:
+                time.sleep(delay)
+            self._send(status, body, headers, stub.slow_body_bps if slow else 0)
+
+        def _send(self, status: int, body: bytes, headers: dict, bytes_per_second: int = 0):
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            if not bytes_per_second:
+                self.wfile.write(body)
+                return
+            # Headers go out right away, the body trickles in at the given rate
+            for start in range(0, len(body), SLOW_BODY_CHUNK_BYTES):
+                chunk = body[start:start + SLOW_BODY_CHUNK_BYTES]
+                self.wfile.write(chunk)
+                self.wfile.flush()
+                time.sleep(len(chunk) / bytes_per_second)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up mid-body (timeouts, load test shutdown) are expected here
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def start_stub(host: str = '127.0.0.1', port: int = 0, **options) -> Tuple[ThreadingHTTPServer, StubUpstream, str]:
+    """Runs a stub in a background thread, returns the server (shutdown() it when done), the stub and its URL"""
+    stub = StubUpstream(**options)
+    server = _StubServer((host, port), make_handler(stub))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stub, f'http://{host}:{server.server_address[1]}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8999)
+    parser.add_argument('--latency', help="Added latency before the headers, e.g. 'lognormal:80:0.5'")
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with a 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Fraction answered with a 429')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After seconds sent with 429s')
+    parser.add_argument('--slow-body-rate', type=float, default=0.0, help='Fraction of 200s whose body trickles in')
+    parser.add_argument('--slow-body-bps', type=int, default=64 * 1024, help='Bytes per second of slow bodies')
+    parser.add_argument('--pad-bytes', type=int, default=0, help='Filler added to every character document')
+    parser.add_argument('--missing', nargs='*', default=[], help='Character ids answered with a 404')
+    parser.add_argument('--synthetic', type=int, default=0,
+                        help='Also serve a synthetic party of this many characters (benchmarks/synthetic_party.py)')
+    parser.add_argument('--synthetic-campaigns', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    try:
+        server, stub, url = start_stub(
+            args.host, args.port, latency=args.latency, error_rate=args.error_rate,
+            rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after, slow_body_rate=args.slow_body_rate,
+            slow_body_bps=args.slow_body_bps, pad_bytes=args.pad_bytes, missing_ids=args.missing, seed=args.seed,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Stub D&D Beyond serving {', '.join(stub.documents)} and numeric variants at {url}")
+    if args.synthetic:
+        from synthetic_party import FIRST_CHARACTER_ID, generate_party
+        for document in generate_party(args.synthetic, args.synthetic_campaigns, args.seed):
+            stub.add_document(document)
+        print(f"Synthetic party of {args.synthetic} characters from id {FIRST_CHARACTER_ID}")
+    print(f"Run the app with DND_TRACKER_UPSTREAM_URL={url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
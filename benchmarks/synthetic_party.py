@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Seeded generator of D&D Beyond character documents at scale, derived from the test_data fixtures. Every character
+keeps the shape of the service's response but gets its own spell list, inventory, SMC custom items, focus item and
+campaign, drawn from what the fixtures contain plus generated spells and items. The same seed and sizes always give
+the same party, byte for byte, so benchmarks over it are repeatable.
+
+    python benchmarks/synthetic_party.py --characters 1000 --campaigns 40 --out /tmp/party
+
+writes one <id>.json per character. generate_party() returns the documents for use in-process, e.g. to feed
+benchmarks/stub_upstream.py (--synthetic) or a benchmark of the formatter.
+"""
+
+import json
+import random
+import hashlib
+import argparse
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+project_root = Path(__file__).resolve().parent.parent
+
+FIXTURES = [
+    project_root / 'test_data' / 'character_example.json',
+    project_root / 'test_data' / 'full_fledged_custom_data.json',
+]
+# Ids well away from real D&D Beyond ones, character ids are FIRST_CHARACTER_ID + index
+FIRST_CHARACTER_ID = 900000000
+FIRST_CAMPAIGN_ID = 9000000
+FOCUS_SUBTYPES = ('Holy Symbol', 'Arcane Focus', 'Druidic Focus')
+FOCUS_NAMES = {
+    'Holy Symbol': ('Amulet', 'Emblem', 'Reliquary'),
+    'Arcane Focus': ('Crystal', 'Orb', 'Rod', 'Staff', 'Wand'),
+    'Druidic Focus': ('Sprig of Mistletoe', 'Totem', 'Wooden Staff', 'Yew Wand'),
+}
+COMPONENTS = (
+    'bat guano and sulfur', 'a bit of fleece', 'diamond dust', 'a pearl', 'powdered silver', 'an eyelash in gum arabic',
+    'a sprig of mistletoe', 'incense', 'a tiny bell', 'a jade circlet', 'ruby dust', 'holy water', 'a forked twig',
+    'an agate', 'a crystal sphere', 'black onyx', 'a miniature quiver', 'charcoal', 'a drop of blood', 'gilded skulls',
+)
+SYLLABLES = ('ar', 'bel', 'dor', 'eth', 'gar', 'hil', 'is', 'kor', 'lan', 'mir', 'nor', 'or', 'quil', 'ra', 'sil',
+             'tor', 'ul', 'vor', 'wyn', 'zan')
+SPELL_NOUNS = ('Ward', 'Bolt', 'Call', 'Sigil', 'Veil')
+CAMPAIGN_NOUNS = ('Saga', 'Chronicles', 'Expedition', 'Heist', 'Crusade')
+MUNDANE_ITEMS = ('Rope, Hempen (50 feet)', 'Torch', 'Rations (1 day)', 'Waterskin', 'Bedroll', 'Tinderbox', 'Crowbar',
+                 'Healer\'s Kit', 'Piton', 'Chalk (1 piece)', 'Caltrops (bag of 20)', 'Lantern, Hooded', 'Oil (flask)')
+
+
+def load_fixtures(fixtures=FIXTURES) -> List[dict]:
+    documents = []
+    for fixture in fixtures:
+        with open(fixture, 'r') as f:
+            documents.append(json.load(f))
+    return documents
+
+
+def build_party(size: Optional[int] = None, fixtures=FIXTURES) -> dict:
+    """
+    {'characters', 'campaigns'} as the client caches them, the fixtures formatted once through
+    BeyondDnDClient.parse_character_content. With size, characters cycle through the fixtures under ids 1000, 1001,
+    ..., without it each fixture appears once under its own id. The server directory must be on sys.path.
+    """
+    from beyond_dnd import BeyondDnDClient
+    client = BeyondDnDClient()
+    formatted = {}
+    campaigns = {}
+    for document in load_fixtures(fixtures):
+        char_id = str(document['data']['id'])
+        character, campaign_id, campaign = client.parse_character_content(json.dumps(document).encode(), char_id)
+        formatted[char_id] = character
+        if campaign_id:
+            campaigns[campaign_id] = campaign
+    if size is None:
+        return {'characters': formatted, 'campaigns': campaigns}
+    cycle = list(formatted.values())
+    return {'characters': {str(1000 + i): cycle[i % len(cycle)] for i in range(size)}, 'campaigns': campaigns}
+
+
+class _Pools:
+    """Spell entries and inventory items from the fixtures to draw characters from, plus generated ones"""
+
+    def __init__(self, rng: random.Random, documents: List[dict], extra_spells: int, extra_items: int):
+        self.spells: List[dict] = []
+        self.items: List[dict] = []
+        self.focus_items: List[dict] = []
+        seen_spells = set()
+        seen_items = set()
+        for document in documents:
+            data = document['data']
+            entries = [spell for cls in data.get('classSpells', []) for spell in cls.get('spells', [])]
+            entries += data['spells'].get('race', []) + data['spells'].get('class', [])
+            for entry in entries:
+                if entry['definition']['name'] not in seen_spells:
+                    seen_spells.add(entry['definition']['name'])
+                    self.spells.append(entry)
+            for item in data.get('inventory', []):
+                definition = item['definition']
+                if definition['name'] in seen_items:
+                    continue
+                seen_items.add(definition['name'])
+                if (definition.get('subType') or '') in FOCUS_SUBTYPES:
+                    self.focus_items.append(item)
+                else:
+                    self.items.append(item)
+        spell_templates = list(self.spells)
+        for i in range(extra_spells):
+            template = rng.choice(spell_templates)
+            name = f'{_name(rng).title()} {rng.choice(SPELL_NOUNS)} {i}'
+            definition = dict(template['definition'], name=name, componentsDescription=_components_description(rng))
+            self.spells.append(dict(template, definition=definition))
+        item_templates = list(self.items)
+        for i in range(extra_items):
+            template = rng.choice(item_templates)
+            name = f'{rng.choice(MUNDANE_ITEMS)} ({i})' if rng.random() < 0.7 else f'{_name(rng).title()}\'s Trinket'
+            self.items.append(dict(template, definition=dict(template['definition'], name=name, subType=None)))
+        for subtype in FOCUS_SUBTYPES:
+            template = self.focus_items[0] if self.focus_items else item_templates[0]
+            for name in FOCUS_NAMES[subtype]:
+                definition = dict(template['definition'], name=f'{name} ({subtype})', subType=subtype)
+                self.focus_items.append(dict(template, definition=definition))
+
+
+def _name(rng: random.Random) -> str:
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+
+
+def _components_description(rng: random.Random) -> str:
+    # Spread over the cases __parse_spell_description tells apart: none, plain, costly and consumed
+    roll = rng.random()
+    component = rng.choice(COMPONENTS)
+    if roll < 0.35:
+        return ''
+    if roll < 0.65:
+        return component
+    cost = rng.choice((5, 25, 50, 100, 300, 500, 1000))
+    if roll < 0.85:
+        return f'{component} worth {cost}+ GP'
+    return f'{component} worth {cost}+ GP, which the spell consumes'
+
+
+def _custom_items(rng: random.Random, first_id: int) -> List[dict]:
+    items = []
+    for i in range(rng.choice((0, 0, 1, 1, 2, 3, 5))):
+        component = rng.choice(COMPONENTS).replace(' ', '_')
+        count = str(rng.randint(0, 12)) if rng.random() < 0.6 else f'{rng.choice((50, 100, 300, 500, 1000))}GP'
+        items.append({'id': first_id + i, 'name': f'SMC:{component}:{count}', 'description': None, 'weight': 0,
+                      'cost': None, 'quantity': 1, 'notes': None})
+    if rng.random() < 0.2:
+        # Custom items the formatter has to skip, a homebrew item and a malformed SMC one
+        items.append({'id': first_id + 90, 'name': f'{_name(rng).title()}\'s Homebrew Blade', 'description': None,
+                      'weight': 3, 'cost': None, 'quantity': 1, 'notes': None})
+        items.append({'id': first_id + 91, 'name': 'SMC:Forgot_The_Count', 'description': None, 'weight': 0,
+                      'cost': None, 'quantity': 1, 'notes': None})
+    return items
+
+
+def _inventory(rng: random.Random, pools: _Pools) -> List[dict]:
+    inventory = [dict(item, quantity=rng.choice((1, 1, 1, 2, 3, 5, 10, 20)))
+                 for item in rng.sample(pools.items, min(len(pools.items), rng.randint(5, 40)))]
+    if inventory and rng.random() < 0.3:
+        # The same item in two stacks, the formatter adds them up
+        inventory.append(dict(rng.choice(inventory), quantity=rng.randint(1, 5)))
+    if rng.random() < 0.6:
+        inventory.append(dict(rng.choice(pools.focus_items), quantity=1))
+    rng.shuffle(inventory)
+    return inventory
+
+
+def _campaigns(rng: random.Random, count: int, dm_template: dict) -> List[dict]:
+    campaigns = []
+    for i in range(count):
+        campaign_id = FIRST_CAMPAIGN_ID + i
+        dm = _name(rng)
+        campaigns.append(dict(
+            dm_template, id=campaign_id, name=f'The {_name(rng).title()} {rng.choice(CAMPAIGN_NOUNS)}',
+            description=rng.choice(('', '', f'Tuesday nights with {dm}')), link=f'/campaigns/{campaign_id}',
+            dmUserId=rng.randint(100000000, 199999999), dmUsername=dm.title(), characters=[],
+        ))
+    return campaigns
+
+
+def generate_party(characters: int = 500, campaigns: int = 20, seed: int = 0, extra_spells: int = 300,
+                   extra_items: int = 200, no_campaign_rate: float = 0.1,
+                   fixtures: Optional[List[dict]] = None) -> List[dict]:
+    """
+    characters documents spread over campaigns campaigns (no_campaign_rate of them in none), as the character
+    service returns them. Fields the generator doesn't vary are shared with the fixtures rather than copied, treat
+    the documents as read only.
+    """
+    rng = random.Random(seed)
+    fixtures = fixtures or load_fixtures()
+    pools = _Pools(rng, fixtures, extra_spells, extra_items)
+    campaign_list = _campaigns(rng, campaigns, fixtures[0]['data'].get('campaign') or {})
+    documents = []
+    for index in range(characters):
+        template = fixtures[index % len(fixtures)]
+        char_id = FIRST_CHARACTER_ID + index
+        name = f'{_name(rng).title()} {_name(rng).title()}'
+        spells = rng.sample(pools.spells, min(len(pools.spells), rng.randint(0, 30)))
+        # Spells come from classSpells, spells.class and spells.race, spread them the way the fixtures do
+        race_spells = spells[:rng.randint(0, min(2, len(spells)))]
+        class_spells = spells[len(race_spells):len(race_spells) + rng.randint(0, 4)]
+        leveling_spells = spells[len(race_spells) + len(class_spells):]
+        campaign = None
+        if campaign_list and rng.random() >= no_campaign_rate:
+            campaign = rng.choice(campaign_list)
+            campaign['characters'].append({
+                'userId': rng.randint(100000000, 199999999), 'username': _name(rng), 'characterId': char_id,
+                'characterName': name, 'characterUrl': f'/profile/{_name(rng)}/characters/{char_id}',
+                'avatarUrl': None, 'privacyType': 3, 'campaignId': None, 'isAssigned': True,
+            })
+        class_spell_lists = template['data'].get('classSpells') or [{'entityTypeId': 1446578651, 'characterClassId': 0}]
+        data = dict(
+            template['data'], id=char_id, name=name,
+            inventory=_inventory(rng, pools),
+            customItems=_custom_items(rng, char_id * 10),
+            spells=dict(template['data']['spells'], race=race_spells, **{'class': class_spells}),
+            classSpells=[dict(class_spell_lists[0], spells=leveling_spells)],
+            campaign=campaign,
+        )
+        documents.append(dict(template, id=char_id, data=data))
+    return documents
+
+
+def digest(documents: List[dict]) -> str:
+    """Short hash of the encoded party, to check two runs generated the same thing"""
+    hasher = hashlib.blake2b(digest_size=8)
+    for document in documents:
+        # Key order is part of what has to be reproducible, no need to sort
+        hasher.update(json.dumps(document).encode())
+    return hasher.hexdigest()
+
+
+def write_party(documents: List[dict], directory: Path) -> Iterator[Path]:
+    directory.mkdir(parents=True, exist_ok=True)
+    for document in documents:
+        path = directory / f"{document['data']['id']}.json"
+        with open(path, 'w') as f:
+            json.dump(document, f)
+        yield path
+
+
+def summarize(documents: List[dict]) -> Dict[str, float]:
+    data = [document['data'] for document in documents]
+    campaigns = {d['campaign']['id'] for d in data if d['campaign']}
+    spells = [len(d['spells']['race']) + len(d['spells']['class']) + sum(len(c['spells']) for c in d['classSpells'])
+              for d in data]
+    return {
+        'characters': len(data),
+        'campaigns': len(campaigns),
+        'withoutCampaign': sum(1 for d in data if not d['campaign']),
+        'avgSpells': sum(spells) / max(1, len(data)),
+        'avgInventoryItems': sum(len(d['inventory']) for d in data) / max(1, len(data)),
+        'withFocus': sum(1 for d in data if any((i['definition'].get('subType') or '') in FOCUS_SUBTYPES
+                                                for i in d['inventory'])),
+        'smcCustomItems': sum(1 for d in data for i in d['customItems'] if i['name'].startswith('SMC:')),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--characters', type=int, default=500)
+    parser.add_argument('--campaigns', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', type=Path, help='Directory to write one <id>.json per character to')
+    args = parser.parse_args()
+
+    documents = generate_party(args.characters, args.campaigns, args.seed)
+    print(f"Synthetic party, seed {args.seed}, digest {digest(documents)}")
+    for key, value in summarize(documents).items():
+        print(f"  {key:>18}: {value:.1f}" if isinstance(value, float) else f"  {key:>18}: {value}")
+    if args.out:
+        written = sum(1 for _ in write_party(documents, args.out))
+        print(f"Wrote {written} characters to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
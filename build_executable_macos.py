@@ -208,10 +208,27 @@ a = Analysis(
         # Server modules
         'server',
         'server.beyond_dnd',
+        'server.cache_manager',
+        'server.character_models',
+        'server.character_store',
+        'server.component_ledger',
+        'server.file_lock',
+        'server.memory_report',
+        'server.metrics',
+        'server.parse_pool',
+        'server.profiling',
+        'server.readiness',
+        'server.request_timing',
         'server.server',
+        'server.static_assets',
+        'server.tcp_nodelay',
+        'server.traced_adapter',
+        'server.upstream_trace',
+        'main',
 
         # Standard library modules that might be missed
         'threading',
+        'multiprocessing',
         'webbrowser',
         'logging',
         'pathlib',
@@ -5,42 +5,89 @@ Main entry point that serves both the FastAPI backend and Vue.js frontend
 """
 
 import os
+import re
 import sys
 import threading
+import multiprocessing
 import time
-import webbrowser
 import logging
 from pathlib import Path
+from typing import Optional
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Number of uvicorn worker processes, 'auto' for one per core. The character cache is shared between them on disk.
+WORKERS_ENV_VAR = 'DND_TRACKER_WORKERS'
+
+# Inlines the cached party into index.html so the frontend can render without waiting for GET /characters. 'true'
+#   inlines it as /characters returns it, a comma separated field list (e.g. 'name,campaignId') a compact projection
+#   of it. Off by default.
+INLINE_PARTY_ENV_VAR = 'DND_TRACKER_INLINE_PARTY'
+INLINE_PARTY_ELEMENT_ID = 'initial-party'
+
+# The browser opens as soon as /readyz passes, or after the timeout if it never does
+READY_POLL_INTERVAL_SECONDS = 0.05
+READY_TIMEOUT_SECONDS = 60
+
+# Paths the SPA catch-all answers with a 404 instead of index.html: API and static routes (by prefix) and file
+#   requests (by extension), a missing asset must not come back as HTML
+SPA_EXCLUDED_PREFIXES = (
+    "api", "characters", "parties", "docs", "redoc", "openapi.json",
+    "assets", "static", "favicon.ico", "debug", "metrics", "healthz", "readyz",
+    ".well-known"
+)
+SPA_EXCLUDED_EXTENSIONS = (
+    ".js", ".css", ".map", ".png", ".jpg", ".jpeg", ".gif",
+    ".svg", ".ico", ".woff", ".woff2", ".ttf", ".eot", ".json", ".txt"
+)
+
+
+def compile_spa_exclusions(prefixes, extensions):
+    """One regex matching paths that start with any of prefixes or end with any of extensions"""
+    return re.compile(
+        "(?:{})|.*(?:{})\\Z".format("|".join(map(re.escape, prefixes)), "|".join(map(re.escape, extensions))),
+        re.DOTALL
+    )
+
+
+# Built once, the catch-all runs it on every deep link and missing file
+SPA_EXCLUDED_PATH = compile_spa_exclusions(SPA_EXCLUDED_PREFIXES, SPA_EXCLUDED_EXTENSIONS)
+
 # Add the server directory to the Python path
 current_dir = os.path.dirname(os.path.abspath(__file__))
 server_dir = os.path.join(current_dir, 'server')
 sys.path.insert(0, server_dir)
 
-# Import all dependencies explicitly to help PyInstaller
-import requests
-import uvicorn
-import fastapi
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from fastapi import HTTPException
-
-# Import the existing FastAPI app
-try:
-    from server.server import app
-    logger.info("Imported FastAPI app from server package")
-except ImportError:
+# The FastAPI app, imported by load_app(). Everything heavy (FastAPI, requests, the server modules) is imported
+#   where it's first used instead of up here: a multi-worker parent process only needs uvicorn, and the single
+#   process server gets to binding its port sooner. PyInstaller finds imports inside functions as well, and
+#   the build scripts list the server modules as hidden imports.
+app = None
+
+
+def load_app():
+    """Imports the FastAPI app on first use"""
+    global app
+    if app is not None:
+        return app
+    start = time.perf_counter()
     try:
-        import server as server_module
-        app = server_module.app
-        logger.info("Imported FastAPI app directly")
-    except ImportError as e:
-        logger.error(f"Failed to import server app: {e}")
-        sys.exit(1)
+        from server.server import app as server_app
+        logger.info("Imported FastAPI app from server package")
+    except ImportError:
+        try:
+            import server as server_module
+            server_app = server_module.app
+            logger.info("Imported FastAPI app directly")
+        except ImportError as e:
+            logger.error(f"Failed to import server app: {e}")
+            sys.exit(1)
+    from readiness import READINESS
+    READINESS.record_phase('import_app', time.perf_counter() - start)
+    app = server_app
+    return app
 
 
 def get_static_files_path():
@@ -85,11 +132,36 @@ def get_static_files_path():
     return default_path
 
 
+def get_inline_party_fields():
+    """None when inlining is off, () for the whole party, otherwise the fields of the projection"""
+    value = os.environ.get(INLINE_PARTY_ENV_VAR, '').strip()
+    if value.lower() in ('', '0', 'false', 'no', 'off'):
+        return None
+    if value.lower() in ('1', 'true', 'yes', 'on'):
+        return ()
+    from character_models import parse_fields
+    try:
+        return parse_fields(value)
+    except ValueError as e:
+        logger.warning(f"Invalid {INLINE_PARTY_ENV_VAR}={value}, not inlining the party: {e}")
+        return None
+
+
 def setup_frontend_serving():
     """Setup static file serving for the frontend"""
+    app = load_app()
+    from fastapi import HTTPException, Request
+    from starlette.concurrency import run_in_threadpool
+    from readiness import READINESS
+    from static_assets import InlinedJSONPage, StaticBundle
+    from upstream_trace import UPSTREAM_TRACES
+
+    start = time.perf_counter()
+    READINESS.require("frontend")
     static_path = get_static_files_path()
     index_file = os.path.join(static_path, "index.html")
     assets_path = os.path.join(static_path, "assets")
+    READINESS.mark_ready("frontend", {"path": static_path, "indexFound": os.path.exists(index_file)})
 
     logger.info(f"Static path: {static_path}")
     logger.info(f"Index file: {index_file}")
@@ -97,34 +169,69 @@ def setup_frontend_serving():
     logger.info(f"Index exists: {os.path.exists(index_file)}")
     logger.info(f"Assets exists: {os.path.exists(assets_path)}")
 
-    # Check if routes are already defined (to avoid duplicates)
-    existing_routes = [route.path for route in app.routes]
-    logger.info(f"Existing routes: {existing_routes}")
+    # Check if routes are already defined (to avoid duplicates), mounts included
+    existing_routes = {route.path for route in app.routes if hasattr(route, 'path')}
+    logger.info(f"Existing routes: {sorted(existing_routes)}")
+
+    # The whole build is read into memory once, with ETags and gzip variants, and served from there
+    bundle = None
+    if os.path.exists(static_path):
+        bundle = StaticBundle(static_path)
+        logger.info(f"✓ Loaded {len(bundle)} frontend files ({bundle.total_bytes() / 1024:.0f} KB) into memory")
 
     # Mount static files BEFORE any route definitions
-    if os.path.exists(assets_path) and "/assets" not in [str(route.path) for route in app.routes if hasattr(route, 'path')]:
+    if os.path.exists(assets_path) and "/assets" not in existing_routes:
         try:
-            app.mount("/assets", StaticFiles(directory=assets_path), name="assets")
+            app.mount("/assets", bundle.app("assets/"), name="assets")
             logger.info("✓ Mounted /assets")
         except Exception as e:
             logger.warning(f"Could not mount assets: {e}")
 
     # Mount the entire static directory as well for direct file access
-    if os.path.exists(static_path) and "/static" not in [str(route.path) for route in app.routes if hasattr(route, 'path')]:
+    if os.path.exists(static_path) and "/static" not in existing_routes:
         try:
-            app.mount("/static", StaticFiles(directory=static_path), name="static")
+            app.mount("/static", bundle.app(), name="static")
             logger.info("✓ Mounted /static")
         except Exception as e:
             logger.warning(f"Could not mount static: {e}")
 
+    # Upstream call traces, useful with or without a built frontend
+    if "/debug/upstream" not in existing_routes:
+        @app.get("/debug/upstream")
+        async def debug_upstream(char_id: Optional[str] = None, include_records: bool = False):
+            summary = UPSTREAM_TRACES.summary(char_id)
+            if include_records:
+                summary["records"] = UPSTREAM_TRACES.records(char_id)
+            return summary
+        logger.info("✓ Configured upstream debug route")
+
     # Only add frontend routes if we don't already have them and if frontend exists
     if os.path.exists(index_file):
+        inline_fields = get_inline_party_fields()
+        index_page = None
+        if inline_fields is not None:
+            # data-fields tells the frontend it got a projection and still has to fetch the full party
+            attributes = {"data-fields": ",".join(inline_fields)} if inline_fields else None
+            index_page = InlinedJSONPage(bundle, "index.html", INLINE_PARTY_ELEMENT_ID, attributes)
+            logger.info(f"✓ Inlining the cached party into index.html ({','.join(inline_fields) or 'all fields'})")
+
+        async def index_response(request: Request):
+            if index_page is None:
+                return bundle.response("index.html", request.headers)
+            try:
+                # Usually a lookup of the already encoded party, but it takes the cache's locks
+                document = await run_in_threadpool(app.state.beyond.get_encoded_party, inline_fields or None)
+            except Exception as e:
+                logger.error(f"Could not inline the party into index.html: {repr(e)}")
+                document = None
+            return index_page.response(document, request.headers)
+
         # Serve favicon
         favicon_path = os.path.join(static_path, "favicon.ico")
         if os.path.exists(favicon_path) and "/favicon.ico" not in existing_routes:
             @app.get("/favicon.ico")
-            async def serve_favicon():
-                return FileResponse(favicon_path)
+            async def serve_favicon(request: Request):
+                return bundle.response("favicon.ico", request.headers)
             logger.info("✓ Configured favicon route")
 
         # Add debug endpoint if it doesn't exist
@@ -148,50 +255,77 @@ def setup_frontend_serving():
         # Root route - serve index.html (only if it doesn't exist)
         if "/" not in existing_routes:
             @app.get("/")
-            async def serve_index():
+            async def serve_index(request: Request):
                 logger.info(f"Root route requested, serving: {index_file}")
-                return FileResponse(index_file, media_type="text/html")
+                return await index_response(request)
             logger.info("✓ Configured root route")
 
         # SPA catch-all route - ONLY if we have a valid frontend and no catch-all exists
-        catch_all_exists = any(
-            "path:path" in str(route.path_regex) for route in app.routes if hasattr(route, 'path_regex'))
+        catch_all_exists = any(path.endswith(":path}") for path in existing_routes)
         if not catch_all_exists:
             @app.get("/{full_path:path}")
-            async def serve_spa_routes(full_path: str = ""):
-                # Exclude API and static file routes
-                excluded_prefixes = [
-                    "api", "characters", "docs", "redoc", "openapi.json",
-                    "assets", "static", "favicon.ico", "debug", ".well-known"
-                ]
-
-                # Exclude file extensions that should return 404
-                excluded_extensions = [
-                    ".js", ".css", ".map", ".png", ".jpg", ".jpeg", ".gif",
-                    ".svg", ".ico", ".woff", ".woff2", ".ttf", ".eot", ".json", ".txt"
-                ]
-
-                # Check if this should be excluded
-                if (any(full_path.startswith(prefix) for prefix in excluded_prefixes) or
-                        any(full_path.endswith(ext) for ext in excluded_extensions)):
+            async def serve_spa_routes(request: Request, full_path: str = ""):
+                # Exclude API and static file routes, and file extensions that should return 404
+                if SPA_EXCLUDED_PATH.match(full_path):
                     logger.info(f"Excluded path: {full_path}")
                     raise HTTPException(status_code=404, detail="Not found")
 
                 # Serve index.html for SPA routes
                 logger.info(f"SPA route: {full_path}")
-                return FileResponse(index_file, media_type="text/html")
+                return await index_response(request)
             logger.info("✓ Configured SPA catch-all route")
         else:
             logger.info("Catch-all route already exists, skipping")
     else:
         logger.error("✗ Frontend not available - no frontend routes configured")
+    READINESS.record_phase("frontend_setup", time.perf_counter() - start)
+
+
+def get_worker_count():
+    """Worker count from the environment, defaults to a single process"""
+    value = os.environ.get(WORKERS_ENV_VAR, '1').strip().lower()
+    if value == 'auto':
+        return os.cpu_count() or 1
+    try:
+        return max(1, int(value))
+    except ValueError:
+        logger.warning(f"Invalid {WORKERS_ENV_VAR}={value}, using a single worker")
+        return 1
+
+
+def create_app():
+    """App factory used by uvicorn worker processes, each worker needs its own frontend routes"""
+    setup_frontend_serving()
+    return load_app()
+
+
+def wait_until_ready(url, timeout):
+    """Polls the readiness endpoint until it answers 200, False if that didn't happen within timeout seconds"""
+    import urllib.error
+    import urllib.request
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as resp:
+                if resp.status == 200:
+                    return True
+        except (urllib.error.URLError, ConnectionError, TimeoutError):
+            # Not listening yet (refused) or not ready yet (503)
+            pass
+        time.sleep(READY_POLL_INTERVAL_SECONDS)
+    return False
 
 
 def open_browser():
-    """Open the default web browser to the application"""
-    time.sleep(3)  # Wait for server to fully start
+    """Open the default web browser to the application once the server reports ready"""
+    import webbrowser
+    frontend_url = "http://127.0.0.1:8998"
+    start = time.perf_counter()
+    if wait_until_ready(f"{frontend_url}/readyz", READY_TIMEOUT_SECONDS):
+        logger.info(f"Server ready after {time.perf_counter() - start:.2f}s")
+    else:
+        logger.warning(f"Server not ready after {READY_TIMEOUT_SECONDS}s, opening the browser anyway")
     try:
-        frontend_url = "http://127.0.0.1:8998"
         logger.info(f"Opening browser to {frontend_url}")
         webbrowser.open(frontend_url)
         logger.info("✓ Browser opened")
@@ -202,14 +336,14 @@ def open_browser():
 
 def main():
     """Main entry point"""
+    import uvicorn
     try:
         logger.info("=" * 50)
         logger.info("Starting DnD Spell Component Tracker...")
         logger.info("Server will run on http://127.0.0.1:8998")
         logger.info("=" * 50)
 
-        # Setup frontend serving
-        setup_frontend_serving()
+        workers = get_worker_count()
 
         # Start browser in a separate thread
         browser_thread = threading.Thread(target=open_browser)
@@ -217,15 +351,34 @@ def main():
         browser_thread.start()
 
         # Start the server
-        logger.info("Starting server on 127.0.0.1:8998")
-        uvicorn.run(
-            app,
-            host="127.0.0.1",
-            port=8998,
-            log_level="info",
-            access_log=True,
-            reload=False  # Important: Disable auto-reload to prevent restart issues
-        )
+        if workers > 1:
+            # Workers are separate processes, uvicorn needs an import string to build the app in each of them
+            from tcp_nodelay import NoDelayH11Protocol
+            logger.info(f"Starting server on 127.0.0.1:8998 with {workers} workers")
+            uvicorn.run(
+                "main:create_app",
+                factory=True,
+                host="127.0.0.1",
+                port=8998,
+                workers=workers,
+                http=NoDelayH11Protocol,
+                log_level="info",
+                access_log=True,
+                reload=False
+            )
+        else:
+            # Setup frontend serving
+            setup_frontend_serving()
+
+            logger.info("Starting server on 127.0.0.1:8998")
+            uvicorn.run(
+                load_app(),
+                host="127.0.0.1",
+                port=8998,
+                log_level="info",
+                access_log=True,
+                reload=False  # Important: Disable auto-reload to prevent restart issues
+            )
 
     except KeyboardInterrupt:
         logger.info("Application stopped by user")
@@ -235,4 +388,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # Needed for worker processes when running as a PyInstaller executable
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
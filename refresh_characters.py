@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Refreshes characters into the tracker's cache without the server, e.g. from cron before a session so the server
+starts hot and no page load has to wait on D&D Beyond.
+
+Character IDs are read from a file, or stdin when none is given or it is '-', separated by whitespace or commas.
+Anything after a '#' on a line is ignored. Characters are merged into the cache the server in --directory uses
+(the current directory by default), the ones already cached and not listed are kept.
+
+    python refresh_characters.py party.txt
+    echo "12345678 87654321" | python refresh_characters.py --party tuesday --workers 8
+
+Prints one line per character as it finishes and a summary. Exits with 1 if any character failed (the others are
+still cached), 2 if no IDs were given.
+"""
+
+import os
+import re
+import sys
+import time
+import logging
+import argparse
+
+# Add the server directory to the Python path, like main.py
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(current_dir, 'server'))
+
+DEFAULT_WORKERS = 4
+ID_SEPARATOR_PATTERN = re.compile(r'[\s,]+')
+
+
+def read_character_ids(source) -> list:
+    """IDs in the order they were listed, duplicates dropped"""
+    char_ids = []
+    for line in source:
+        char_ids += [char_id for char_id in ID_SEPARATOR_PATTERN.split(line.split('#', 1)[0]) if char_id]
+    return list(dict.fromkeys(char_ids))
+
+
+def print_result(result: dict):
+    if result['error'] is None:
+        print(f"✓ {result['characterId']:>12} {result['seconds']:>7.2f}s  {result['name']}", flush=True)
+    else:
+        status = f" ({result['statusCode']})" if result['statusCode'] else ''
+        print(f"✗ {result['characterId']:>12} {result['seconds']:>7.2f}s  {result['error']}{status}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('ids_file', nargs='?', default='-', help="File with character IDs, '-' for stdin")
+    parser.add_argument('--party', default='default', help='Party to refresh the characters into')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Characters fetched at the same time')
+    parser.add_argument('--directory', help='Directory the server runs in, its cache is the tmp directory in it')
+    parser.add_argument('--verbose', action='store_true',
+                        help='Also log what the client logs, failures are printed either way')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+
+    if args.ids_file == '-':
+        char_ids = read_character_ids(sys.stdin)
+    else:
+        with open(args.ids_file) as f:
+            char_ids = read_character_ids(f)
+    if not char_ids:
+        print("No character IDs given", file=sys.stderr)
+        sys.exit(2)
+    if args.directory:
+        # The client caches under the working directory, the same way the server does
+        os.chdir(args.directory)
+
+    from beyond_dnd import BeyondDnDAPIError, BeyondDnDClient
+    client = BeyondDnDClient()
+    start = time.perf_counter()
+    try:
+        status = client.refresh_characters(char_ids, party=args.party, workers=args.workers, progress=print_result)
+    except BeyondDnDAPIError as e:
+        # Invalid party name
+        print(e, file=sys.stderr)
+        sys.exit(2)
+    finally:
+        client.close()
+    elapsed = time.perf_counter() - start
+
+    timings = sorted(status['refreshed'].values())
+    print(f"\nRefreshed {len(timings)}/{status['total']} characters into party '{args.party}' in {elapsed:.2f}s")
+    if timings:
+        print(f"Per character: median {timings[len(timings) // 2]:.2f}s, slowest {timings[-1]:.2f}s")
+    if status['failed']:
+        print(f"{len(status['failed'])} failed: {', '.join(status['failed'])}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
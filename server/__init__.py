@@ -3,8 +3,22 @@
 Server package for DnD Spell Component Tracker
 """
 
-# Make the main modules available at package level
-from .beyond_dnd import BeyondDnDClient, BeyondDnDAPIError
-from .server import app
+import importlib
 
-__all__ = ['BeyondDnDClient', 'BeyondDnDAPIError', 'app']
\ No newline at end of file
+# The main modules are available at package level, imported on first access so that importing the package (or one
+# of its modules) doesn't load FastAPI and the whole app
+_EXPORTS = {
+    'BeyondDnDClient': '.beyond_dnd',
+    'BeyondDnDAPIError': '.beyond_dnd',
+    'app': '.server',
+}
+
+__all__ = ['BeyondDnDClient', 'BeyondDnDAPIError', 'app']
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
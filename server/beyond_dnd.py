@@ -1,12 +1,24 @@
 import os
-import shutil
-import requests
+import re
+import time
 import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from http import HTTPStatus
 from json import dumps, loads
-from typing import List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 from pathlib import Path
 
+from cache_manager import CacheManager
+from character_models import Campaign, Character, Focus, Spell, encode_json
+from parse_pool import ParsePool
+from metrics import (
+    CACHE_REQUESTS, FORMAT_SECONDS, UPSTREAM_REQUESTS, UPSTREAM_REQUEST_SECONDS, UPSTREAM_RESPONSE_BYTES
+)
+from request_timing import phase
+from upstream_trace import UPSTREAM_TRACES
+
 logger = logging.getLogger(__name__)
 
 # Constants
@@ -16,6 +28,18 @@ DRUIDIC_FOCUS = 'druidic focus'
 SPELL_COMPONENT_PREFIX = 'SMC'
 CONSUME_TEXT = 'consume'
 GP_COST_TEXT = 'gp'
+# SMC counts are free text after the second ':' (e.g. '3' or '500GP'), only the leading number is adjusted
+COMPONENT_COUNT_PATTERN = re.compile(r'^\s*(\d+)(.*)$', re.DOTALL)
+DEFAULT_PARTY = 'default'
+# Party names become directory names, keep them to something that can't escape the cache directory
+PARTY_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+# Names of what CacheManager.derived() keeps per party
+CAMPAIGN_INDEX = 'campaign_index'
+LEDGER_VIEW = 'ledger_view'
+ENCODED_PARTY = 'encoded_party'
+# Root URL of the character service, e.g. http://127.0.0.1:8999 to run against benchmarks/stub_upstream.py
+UPSTREAM_URL_ENV_VAR = 'DND_TRACKER_UPSTREAM_URL'
+CHARACTER_PATH = '/character/v5/character/{}?includeCustomItems=true'
 
 
 class BeyondDnDAPIError(Exception):
@@ -23,18 +47,51 @@ class BeyondDnDAPIError(Exception):
         super().__init__(message)
         self.status_code = status_code
 
+    def __reduce__(self):
+        # Raised in parse pool workers too, pickled with both arguments so it comes back as it was
+        return self.__class__, (str(self), self.status_code)
+
 
 class BeyondDnDClient:
     # Added custom item param in case, to prevent changes in future if we use homebrew/custom
-    _BASE_URL = 'https://character-service.dndbeyond.com/character/v5/character/{}?includeCustomItems=true'
-    _LOCAL_CHARACTER_DATA_FILE = 'local_character_data.json'
+    _BASE_URL = 'https://character-service.dndbeyond.com' + CHARACTER_PATH
+    _PARTIES_DIR = 'parties'
+    # Parties whose cache stays loaded in memory, least recently used ones are dropped and reread from disk on demand
+    _MAX_LOADED_PARTIES = 32
+
+    def __init__(self, upstream_url: Optional[str] = None, parse_pool: Optional[ParsePool] = None):
+        self._cache_root = Path(os.getcwd() + '/tmp/')
+        upstream_url = upstream_url or os.environ.get(UPSTREAM_URL_ENV_VAR, '').strip()
+        if upstream_url:
+            self._BASE_URL = upstream_url.rstrip('/') + CHARACTER_PATH
+        self._caches: OrderedDict[str, CacheManager] = OrderedDict()
+        self._caches_lock = threading.Lock()
+        self._parse_pool = parse_pool or ParsePool.from_env()
+
+    def close(self):
+        self._parse_pool.shutdown()
 
-    def get_all_characters_data(self, char_ids: Optional[List[str]] = None, force_update: bool = False) -> dict:
+    def list_parties(self) -> List[str]:
+        parties_dir = self._cache_root / self._PARTIES_DIR
+        parties = [DEFAULT_PARTY]
+        if parties_dir.exists():
+            parties += sorted(
+                entry.name for entry in os.scandir(parties_dir)
+                if entry.is_dir() and entry.name != DEFAULT_PARTY and PARTY_NAME_PATTERN.match(entry.name)
+            )
+        return parties
+
+    def get_all_characters_data(self, char_ids: Optional[List[str]] = None, force_update: bool = False,
+                                party: str = DEFAULT_PARTY) -> dict:
+        cache = self.__cache_for(party)
         if not force_update:
-            character_data = self.__load_local_file_if_exists(self._LOCAL_CHARACTER_DATA_FILE)
-            if character_data:
-                # return whatever data was previously saved
-                return character_data
+            with cache.reading():
+                character_data = cache.store.load()
+                if character_data:
+                    # return whatever data was previously saved
+                    CACHE_REQUESTS.inc('hit')
+                    return self.__ledger_view(cache)
+            CACHE_REQUESTS.inc('miss')
         if not char_ids or len(char_ids) == 0:
             raise BeyondDnDAPIError(
                 "No Character Ids proviced and no cached data found.",
@@ -42,26 +99,37 @@ class BeyondDnDClient:
             )
         dungeon_data = self.__get_all_character_data(char_ids)
         if dungeon_data:
-            self.__save_local_file(dungeon_data, self._LOCAL_CHARACTER_DATA_FILE)
-            return dungeon_data
+            with cache.writing():
+                cache.store.replace(dungeon_data)
+                self.__reconcile_component_ledger(cache, dungeon_data)
+                return self.__apply_component_ledger(cache, dungeon_data)
         raise BeyondDnDAPIError(
             "Characters ids were not provided and/or the default file was not found.", HTTPStatus.BAD_REQUEST
         )
 
-    def get_one_characters_data(self, char_id: str, force_update: bool = False):
+    def get_one_characters_data(self, char_id: str, force_update: bool = False, party: str = DEFAULT_PARTY):
+        cache = self.__cache_for(party)
         if not char_id:
             raise BeyondDnDAPIError(message=f"No Character ID provided.", status_code=HTTPStatus.BAD_REQUEST)
 
         if force_update:
             dungeon_data = self.__get_one_characters_data(char_id)
-            self.__update_local_file_if_exists(dungeon_data, self._LOCAL_CHARACTER_DATA_FILE)
-            return dungeon_data
+            with cache.writing():
+                # Merge into the cache if there is one, a single refresh shouldn't drop the rest of the party
+                if cache.store.load():
+                    cache.store.put(dungeon_data['characters'], dungeon_data['campaigns'])
+                self.__reconcile_component_ledger(cache, dungeon_data)
+                return self.__apply_component_ledger(cache, dungeon_data)
         else:
             # Check if the data exists locally
-            all_character_data = self.__load_local_file_if_exists(self._LOCAL_CHARACTER_DATA_FILE)
-            if all_character_data:
-                character_data = all_character_data.get('characters', {})
-                if char_id in character_data: return character_data[char_id]
+            with cache.reading():
+                all_character_data = cache.store.load()
+                if all_character_data:
+                    character_data = all_character_data.get('characters', {})
+                    if char_id in character_data:
+                        CACHE_REQUESTS.inc('hit')
+                        return self.__ledger_view(cache)['characters'][char_id]
+            CACHE_REQUESTS.inc('miss')
             # If no data stored locally, do not retrieve from API. Prefer bulk ID's to prevent random characters
             #   from being added.
         raise BeyondDnDAPIError(
@@ -70,30 +138,225 @@ class BeyondDnDClient:
             status_code=HTTPStatus.NOT_FOUND,
         )
 
-    @staticmethod
-    def delete_all_cached_character_data():
-        cur_dir = os.getcwd()
-        directory_path = Path(cur_dir + '/tmp/')
-        if os.path.exists(directory_path):
-            shutil.rmtree(directory_path)
-
-    def delete_character_by_id(self, char_id: str) -> dict:
-        all_data = self.__load_local_file_if_exists(self._LOCAL_CHARACTER_DATA_FILE)
-        if not all_data or 'characters' not in all_data:
-            raise BeyondDnDAPIError(message="Cached file not found or it contained no character data.", status_code=HTTPStatus.NOT_FOUND)
-        return self.__remove_relevant_char_data(all_data, char_id)
+    def get_cached_character_data(self, party: str = DEFAULT_PARTY) -> Optional[dict]:
+        # The stored snapshot as is, without component ledger adjustments. Shared with the cache, do not modify.
+        cache = self.__cache_for(party)
+        with cache.reading():
+            return cache.store.load()
+
+    def get_encoded_party(self, fields: Optional[Tuple[str, ...]] = None, party: str = DEFAULT_PARTY) -> Optional[bytes]:
+        """The cached party encoded as GET /characters returns it, None if nothing is cached"""
+        cache = self.__cache_for(party)
+        with cache.reading():
+            if not cache.store.load():
+                return None
+            return cache.derived(
+                f"{ENCODED_PARTY}:{','.join(fields or ())}",
+                lambda data: encode_json(self.__ledger_view(cache), fields)
+            )
+
+    def warm_up(self, party: str = DEFAULT_PARTY) -> dict:
+        """Loads the party's cache and builds what requests derive from it, returns how much was loaded"""
+        cache = self.__cache_for(party)
+        with cache.reading():
+            data = cache.store.load()
+            if not data:
+                return {'characters': 0, 'campaigns': 0}
+            cache.derived(CAMPAIGN_INDEX, self.__index_campaigns)
+            self.__ledger_view(cache)
+            return {'characters': len(data['characters']), 'campaigns': len(data['campaigns'])}
+
+    def stale_character_ids(self, max_age_seconds: float, party: str = DEFAULT_PARTY) -> List[str]:
+        # Characters cached before fetch times were recorded count as stale
+        cache = self.__cache_for(party)
+        with cache.reading():
+            data = cache.store.load() or {}
+            fetched_at = cache.store.fetched_at()
+        cutoff = time.time() - max_age_seconds
+        return [char_id for char_id in data.get('characters', {}) if fetched_at.get(char_id, 0) < cutoff]
+
+    def refresh_stale_characters(self, max_age_seconds: float, party: str = DEFAULT_PARTY,
+                                 progress: Optional[Callable[[dict], None]] = None) -> dict:
+        """Refetches the characters last fetched more than max_age_seconds ago, one at a time"""
+        char_ids = self.stale_character_ids(max_age_seconds, party)
+        status = {'total': len(char_ids), 'refreshed': 0, 'skipped': 0, 'failed': {}, 'finished': False}
+        if progress:
+            progress(dict(status))
+        for char_id in char_ids:
+            if char_id not in self.stale_character_ids(max_age_seconds, party):
+                status['skipped'] += 1
+            else:
+                try:
+                    self.get_one_characters_data(char_id, force_update=True, party=party)
+                    status['refreshed'] += 1
+                except Exception as e:
+                    logger.warning(f"Background refresh of character {char_id} failed: {repr(e)}")
+                    status['failed'][char_id] = repr(e)
+            if progress:
+                progress(dict(status))
+        status['finished'] = True
+        if progress:
+            progress(dict(status))
+        return status
+
+    def refresh_characters(self, char_ids: List[str], party: str = DEFAULT_PARTY, workers: int = 4,
+                           progress: Optional[Callable[[dict], None]] = None) -> dict:
+        """Fetches char_ids, workers at a time, into the party's cache, progress gets each character's result"""
+        cache = self.__cache_for(party)
+        char_ids = list(dict.fromkeys(char_ids))
+        status = {'total': len(char_ids), 'refreshed': {}, 'failed': {}}
+
+        def refresh(char_id: str) -> dict:
+            start = time.perf_counter()
+            result = {'characterId': char_id, 'name': None, 'error': None, 'statusCode': None}
+            try:
+                dungeon_data = self.__get_one_characters_data(char_id)
+                with cache.writing():
+                    cache.store.put(dungeon_data['characters'], dungeon_data['campaigns'])
+                    self.__reconcile_component_ledger(cache, dungeon_data)
+                result['name'] = dungeon_data['characters'][char_id].name
+            except Exception as e:
+                logger.warning(f"Refresh of character {char_id} failed: {repr(e)}")
+                result['error'] = str(e) or repr(e)
+                result['statusCode'] = getattr(e, 'status_code', None)
+            result['seconds'] = time.perf_counter() - start
+            return result
+
+        with ThreadPoolExecutor(max(1, workers), thread_name_prefix='character-refresh') as executor:
+            for future in as_completed([executor.submit(refresh, char_id) for char_id in char_ids]):
+                result = future.result()
+                if result['error'] is None:
+                    status['refreshed'][result['characterId']] = result['seconds']
+                else:
+                    status['failed'][result['characterId']] = result['error']
+                if progress:
+                    progress(result)
+        if status['refreshed']:
+            cache.compact()
+        return status
+
+    def delete_all_cached_character_data(self, party: str = DEFAULT_PARTY):
+        cache = self.__cache_for(party)
+        with cache.writing():
+            cache.clear()
+
+    def delete_character_by_id(self, char_id: str, party: str = DEFAULT_PARTY) -> dict:
+        cache = self.__cache_for(party)
+        with cache.writing():
+            all_data = cache.store.load()
+            if not all_data or 'characters' not in all_data:
+                raise BeyondDnDAPIError(message="Cached file not found or it contained no character data.", status_code=HTTPStatus.NOT_FOUND)
+            remaining_data = self.__remove_relevant_char_data(cache, all_data, char_id)
+            cache.ledger.forget(char_id)
+            return self.__apply_component_ledger(cache, remaining_data)
+
+    def consume_component(self, char_id: str, component: str, amount: int = 1, party: str = DEFAULT_PARTY) -> dict:
+        return self.__adjust_component(self.__cache_for(party), char_id, component, -amount)
+
+    def restock_component(self, char_id: str, component: str, amount: int = 1, party: str = DEFAULT_PARTY) -> dict:
+        return self.__adjust_component(self.__cache_for(party), char_id, component, amount)
+
+    def __cache_for(self, party: Optional[str]) -> CacheManager:
+        # Every party gets its own directory, store, ledger and locks. The default party keeps the original location.
+        party = party or DEFAULT_PARTY
+        if not PARTY_NAME_PATTERN.match(party):
+            raise BeyondDnDAPIError(
+                message=f"Invalid party name: {party}. Use letters, numbers, '-' and '_' only.",
+                status_code=HTTPStatus.BAD_REQUEST
+            )
+        with self._caches_lock:
+            cache = self._caches.get(party)
+            if cache is None:
+                directory = self._cache_root if party == DEFAULT_PARTY else self._cache_root / self._PARTIES_DIR / party
+                cache = CacheManager(directory)
+                self._caches[party] = cache
+                while len(self._caches) > self._MAX_LOADED_PARTIES:
+                    self._caches.popitem(last=False)
+            else:
+                self._caches.move_to_end(party)
+            return cache
+
+    def __adjust_component(self, cache: CacheManager, char_id: str, component: str, delta: int) -> dict:
+        # Mid-session count changes are recorded locally, no upstream call and no rewrite of the cached snapshot
+        if delta == 0:
+            raise BeyondDnDAPIError(message="Amount must be greater than 0.", status_code=HTTPStatus.BAD_REQUEST)
+        with cache.writing():
+            all_data = cache.store.load() or {}
+            character = all_data.get('characters', {}).get(char_id)
+            if not character:
+                raise BeyondDnDAPIError(message="Character not stored on server.", status_code=HTTPStatus.NOT_FOUND)
+            custom_items = character.custom_items
+            if component not in custom_items:
+                raise BeyondDnDAPIError(
+                    message=f"No {SPELL_COMPONENT_PREFIX} custom item named '{component}' found for character: {char_id}",
+                    status_code=HTTPStatus.NOT_FOUND
+                )
+            base = custom_items[component]
+            match = COMPONENT_COUNT_PATTERN.match(str(base))
+            if not match:
+                raise BeyondDnDAPIError(
+                    message=f"Count for '{component}' is not a number: {base}", status_code=HTTPStatus.BAD_REQUEST
+                )
+            adjustment = cache.ledger.get_adjustments(char_id).get(component, {})
+            current = int(match.group(1)) + (adjustment.get('delta', 0) if adjustment.get('base') == base else 0)
+            if current + delta < 0:
+                raise BeyondDnDAPIError(
+                    message=f"Not enough '{component}' to consume, only {current} left.",
+                    status_code=HTTPStatus.BAD_REQUEST
+                )
+            cache.ledger.record(char_id, component, base, delta)
+            return {
+                'characterId': char_id,
+                'component': component,
+                'custom_items': self.__apply_component_adjustments(cache, char_id, character).custom_items,
+            }
+
+    def __reconcile_component_ledger(self, cache: CacheManager, fresh_data: dict):
+        for char_id, character in fresh_data.get('characters', {}).items():
+            cache.ledger.reconcile(char_id, character.custom_items)
+
+    def __ledger_view(self, cache: CacheManager) -> dict:
+        # The cached party with the ledger applied, reused (with its encoded JSON) until the data or ledger changes
+        return cache.derived(LEDGER_VIEW, lambda data: self.__apply_component_ledger(cache, data))
+
+    def __apply_component_ledger(self, cache: CacheManager, all_data: dict) -> dict:
+        if not cache.ledger.has_adjustments():
+            return all_data
+        characters = {
+            char_id: self.__apply_component_adjustments(cache, char_id, character)
+            for char_id, character in all_data.get('characters', {}).items()
+        }
+        return {**all_data, 'characters': characters}
+
+    def __apply_component_adjustments(self, cache: CacheManager, char_id: str, character: Character) -> Character:
+        # Builds a new character rather than editing in place, the cached character stays the upstream truth
+        adjustments = cache.ledger.get_adjustments(char_id)
+        if not adjustments:
+            return character
+        custom_items = dict(character.custom_items)
+        for component, entry in adjustments.items():
+            match = COMPONENT_COUNT_PATTERN.match(str(custom_items.get(component, '')))
+            if not match or custom_items[component] != entry['base']:
+                continue
+            custom_items[component] = f"{int(match.group(1)) + entry['delta']}{match.group(2)}"
+        return character.replace(custom_items=custom_items)
+
+    def parse_character_content(self, content: bytes, char_id: str) -> Tuple[Character, Optional[str], Optional[Campaign]]:
+        """Formatted character, its campaign id and campaign from the raw body of a character service response"""
+        resp_data = loads(content).get('data', {})
+        # Characters outside of any campaign come back with "campaign": null
+        campaign = resp_data.get('campaign') or {}
+        campaign_id = str(campaign['id']) if campaign.get('id') else None
+        character_data = self.__format_character_data(resp_data, char_id)
+        extracted_metadata = self.__extract_campaign_metadata(campaign) if campaign_id else None
+        return character_data.replace(campaign_id=campaign_id), campaign_id, extracted_metadata
 
     def __get_one_characters_data(self, char_id: str) -> dict:
         campaign_data = {}
-        resp = self.__get_bdnd_character_data(char_id)
-        resp_data = resp.get('data', {})
-        campaign = resp_data.get('campaign', {})
-        campaign_id = campaign.get('id')
-        character_data = self.__format_character_data(resp_data, char_id)
-        extracted_metadata = self.__extract_campaign_metadata(resp_data.get('campaign'))
+        content = self.__get_bdnd_character_data(char_id)
+        character_data, campaign_id, extracted_metadata = self.parse_character_content(content, char_id)
         if extracted_metadata:
             campaign_data[campaign_id] = extracted_metadata
-            character_data['campaignId'] = str(campaign_id)
         return {
             "characters": {char_id: character_data},
             "campaigns": campaign_data
@@ -102,57 +365,54 @@ class BeyondDnDClient:
     def __get_all_character_data(self, char_ids: List[str]) -> dict:
         all_character_data = {}
         campaign_data = {}
+        # Big batches are decoded and formatted in worker processes, each body handed over as soon as it is in so
+        #   that parsing runs while the next character downloads
+        pool = self._parse_pool if self._parse_pool.use_for(len(char_ids)) else None
+        parsed = {}
         for char_id in char_ids:
-            resp = self.__get_bdnd_character_data(char_id)
-            resp_data = resp.get('data', {})
-            campaign = resp_data.get('campaign', {})
-            campaign_id = campaign.get('id')
-            if campaign_id and campaign_id not in campaign_data:
-                extracted_metadata = self.__extract_campaign_metadata(resp_data.get('campaign'))
-                if extracted_metadata:
-                    campaign_data[campaign_id] = extracted_metadata
-            character_data = self.__format_character_data(resp_data, char_id)
-            character_data['campaignId'] = str(campaign_id)
+            content = self.__get_bdnd_character_data(char_id)
+            if pool:
+                parsed[char_id] = pool.submit(content, char_id, fallback=self.parse_character_content)
+            else:
+                parsed[char_id] = self.parse_character_content(content, char_id)
+        for char_id in char_ids:
+            character_data, campaign_id, extracted_metadata = pool.result(parsed[char_id]) if pool else parsed[char_id]
+            if extracted_metadata and campaign_id not in campaign_data:
+                campaign_data[campaign_id] = extracted_metadata
             all_character_data[char_id] = character_data
         return {
             "characters": all_character_data,
             "campaigns": campaign_data
         }
 
-    @staticmethod
-    def __save_local_file(data, file: str):
-        cur_dir = os.getcwd()
-        file_path = cur_dir+'/tmp/'
-        if not os.path.exists(file_path):
-            os.makedirs(file_path, exist_ok=True)
-        with open(file_path+file, 'w') as f:
-            body = dumps(data)
-            f.write(body)
-            f.close()
-
-    @staticmethod
-    def __load_local_file_if_exists(save_path: str):
-        cur_dir = os.getcwd()
-        file_path = Path(cur_dir + '/tmp/' + save_path)
-        if file_path.exists():
-            with open(file_path, 'r') as f:
-                return loads(f.read())
-        return None
-
-    def __update_local_file_if_exists(self, data: dict, file: str) -> bool:
-        local_data = self.__load_local_file_if_exists(file)
-        if local_data and isinstance(local_data, dict):
-            local_data.update(data)
-            self.__save_local_file(local_data, file)
-            return True
-        return False
-
-    def __get_bdnd_character_data(self, char_id: str):
+    def __get_bdnd_character_data(self, char_id: str) -> bytes:
+        # Raw body of a successful response, parse_character_content() turns it into a character
         headers = {
             'Accept': 'application/json',
             'Content-Type': 'application/json'
         }
-        resp = requests.get(headers=headers, url=self._BASE_URL.format(char_id))
+        # Imported here rather than at the top so that starting the server doesn't wait for requests to load
+        from requests.exceptions import RequestException
+        start = time.perf_counter()
+        with UPSTREAM_TRACES.trace(char_id) as trace:
+            try:
+                with phase('upstream', char_id), UPSTREAM_TRACES.session() as session:
+                    # stream=True returns once the headers are in, reading the content then downloads the body
+                    resp = session.get(headers=headers, url=self._BASE_URL.format(char_id), stream=True)
+                    trace['ttfbMs'] = (time.perf_counter() - start) * 1000
+                    content = resp.content
+            except RequestException:
+                UPSTREAM_REQUEST_SECONDS.observe(time.perf_counter() - start, 'network_error')
+                UPSTREAM_REQUESTS.inc('none', 'network_error')
+                raise
+            retries = getattr(resp.raw, 'retries', None)
+            trace['retries'] = len(retries.history) if retries else 0
+            trace['statusCode'] = resp.status_code
+            trace['bytes'] = len(content)
+        outcome = 'error' if resp.status_code >= 300 else 'success'
+        UPSTREAM_REQUEST_SECONDS.observe(time.perf_counter() - start, outcome)
+        UPSTREAM_REQUESTS.inc(str(resp.status_code), outcome)
+        UPSTREAM_RESPONSE_BYTES.inc(outcome, amount=len(content))
         if resp.status_code >= 300:
             logger.error(dumps({
                 "message": "Shit broke, debug it",
@@ -162,28 +422,23 @@ class BeyondDnDClient:
             }))
             raise BeyondDnDAPIError(f"BeyondDnD API failure, ensure character profile is set to Public and "
                                     f"that the ID was entered correctly. Error: {resp.text}", resp.status_code)
-        return resp.json()
+        return content
 
-    def __format_character_data(self, char_data: dict, char_id: str) -> dict:
+    def __format_character_data(self, char_data: dict, char_id: str) -> Character:
         if not char_data:
             raise BeyondDnDAPIError(
                 f'No Character Data found for characterId: {char_id}', HTTPStatus.INTERNAL_SERVER_ERROR
             )
-        name = char_data.get("name")
-        inventory_items = char_data.get("inventory", [])
-        custom_items = char_data.get("customItems", [])
-        counted_items, counted_custom_items, focus = self.__count_inventory_items(inventory_items, custom_items)
-        spells = self.__build_character_spell_list(char_data)
-        return {
+        with FORMAT_SECONDS.time(), phase('format', char_id):
+            name = char_data.get("name")
+            inventory_items = char_data.get("inventory", [])
+            custom_items = char_data.get("customItems", [])
+            counted_items, counted_custom_items, focus = self.__count_inventory_items(inventory_items, custom_items)
+            spells = self.__build_character_spell_list(char_data)
             # need to add campaignId
-            'name': name,
-            'spells': spells,
-            'custom_items': counted_custom_items,
-            'inventory': counted_items,
-            'focus': focus,
-        }
+            return Character(name, spells, counted_custom_items, counted_items, focus)
 
-    def __build_character_spell_list(self, data: dict) -> List[dict]:
+    def __build_character_spell_list(self, data: dict) -> List[Spell]:
         """
         Spells can come from multiple places in test_data:
             test_data.spells.race [] - Spells from characters race/species
@@ -210,28 +465,20 @@ class BeyondDnDClient:
         return parsed_spells
 
     @staticmethod
-    def __parse_spell_description(name: str, description: Optional[str]) -> dict:
+    def __parse_spell_description(name: str, description: Optional[str]) -> Spell:
         if not description:
-            return {
-                'name': name,
-                'componentsDescription': '',
-                'componentsAreConsumed': False,
-                'componentsHaveCost': False,
-                'focusWillWork': True,  # This is just set for true, nothing is needed but whatever
-            }
+            # focusWillWork is just set for true, nothing is needed but whatever
+            return Spell.get(name, '', components_are_consumed=False, components_have_cost=False, focus_will_work=True)
         # Are there any other words used to designate the use of items when spell is cast
         found_consume_text = CONSUME_TEXT.lower() in description.lower()
         # This needs to be updated but need more info on what I can expect data wise (other currencies / formats)
         found_gp_cost_text = GP_COST_TEXT.lower() in description.lower()
-        return {
-            'name': name,
-            'componentsDescription': description,
-            'componentsAreConsumed': found_consume_text,
-            'componentsHaveCost': found_gp_cost_text,
-            'focusWillWork': not found_consume_text and not found_gp_cost_text
-        }
+        return Spell.get(
+            name, description, components_are_consumed=found_consume_text, components_have_cost=found_gp_cost_text,
+            focus_will_work=not found_consume_text and not found_gp_cost_text
+        )
 
-    def __count_inventory_items(self, inventory_items: List[dict], custom_items: List[dict]) -> Tuple[dict, dict, Optional[dict]]:
+    def __count_inventory_items(self, inventory_items: List[dict], custom_items: List[dict]) -> Tuple[dict, dict, Optional[Focus]]:
         # Returns item counts, custom item counts, and focus item if found (None otherwise)
         focus = None
         counts = {}
@@ -274,51 +521,40 @@ class BeyondDnDClient:
         return subtype.lower() in {HOLY_SYMBOL, ARCANE_FOCUS, DRUIDIC_FOCUS}
 
     @staticmethod
-    def __extract_focus_data(focus_data: dict) -> dict:
-        return {
-            'name': focus_data.get('name', ''),
-            'type': focus_data.get('type', ''),
-            'subType': focus_data.get('subType', ''),
-            'description': focus_data.get('description', '')
-        }
+    def __extract_focus_data(focus_data: dict) -> Focus:
+        return Focus.from_dict(focus_data)
 
     @staticmethod
-    def __extract_campaign_metadata(campaign_data: Optional[dict]) -> Optional[dict]:
+    def __extract_campaign_metadata(campaign_data: Optional[dict]) -> Optional[Campaign]:
         if not campaign_data:
             return None
-        return {
-            "name": campaign_data.get('name', ''),
-            "description": campaign_data.get('description', ''),
-            "dmUsername": campaign_data.get('dmUsername', '')
-        }
+        return Campaign.from_dict(campaign_data)
 
     @staticmethod
-    def __match_character_ids_with_campaign_id(campaign_id_to_match: str, character_data: dict[str, dict]) -> List[str]:
-        matched = []
-        for char_id, character in character_data.items():
-            campaign_id = character.get('campaignId', '')
-            if campaign_id_to_match == campaign_id:
-                matched.append(char_id)
-        return matched
-
-    def __remove_relevant_char_data(self, all_data: dict[str, dict], char_id: str) -> dict[str, dict]:
+    def __index_campaigns(all_data: dict) -> Dict[str, List[str]]:
+        # {campaign_id: [char_id, ...]}, characters without a campaign are left out
+        index = {}
+        for char_id, character in all_data.get('characters', {}).items():
+            if character.campaign_id:
+                index.setdefault(character.campaign_id, []).append(char_id)
+        return index
+
+    def __remove_relevant_char_data(self, cache: CacheManager, all_data: dict[str, dict], char_id: str) -> dict[str, dict]:
         characters = all_data.get('characters', {})
         character = characters.get(char_id)
-        campaigns = all_data.get('campaigns', {})
         if not character:
             raise BeyondDnDAPIError(message="Character not stored on server.", status_code=HTTPStatus.NOT_FOUND)
-        character_campaign_id = character.get('campaignId')
-        char_ids_in_campaign = self.__match_character_ids_with_campaign_id(character_campaign_id, characters)
+        character_campaign_id = character.campaign_id
+        char_ids_in_campaign = cache.derived(CAMPAIGN_INDEX, self.__index_campaigns).get(character_campaign_id, [])
 
-        del characters[char_id]
         # There was only one character stored, delete it all now
-        if len(characters.keys()) == 0:
-            self.delete_all_cached_character_data()
+        if len(characters.keys()) == 1:
+            cache.clear()
             return {'characters': {}, 'campaigns': {}}
 
         # Character was only one from campaign, delete it too and signal
+        campaign_ids = []
         if len(char_ids_in_campaign) < 2 and char_id in char_ids_in_campaign:
-            del campaigns[character_campaign_id]
-        all_data = {'characters': characters, 'campaigns': campaigns}
-        self.__update_local_file_if_exists(all_data, self._LOCAL_CHARACTER_DATA_FILE)
-        return all_data
+            campaign_ids.append(character_campaign_id)
+        cache.store.delete(char_ids=[char_id], campaign_ids=campaign_ids)
+        return cache.store.load() or {'characters': {}, 'campaigns': {}}
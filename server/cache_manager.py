@@ -0,0 +1,140 @@
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Tuple
+
+from character_store import LOCK_FILE, CharacterStore
+from component_ledger import ComponentLedger
+from file_lock import InterProcessLock
+from request_timing import phase
+
+
+class ReadWriteLock:
+    """
+    Many concurrent readers or a single writer. Writers are preferred, once one is waiting new readers queue behind
+    it so a steady stream of page loads can't starve a refresh or delete.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    def acquire_read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._cond:
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            try:
+                while self._writer or self._readers:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = True
+
+    def release_write(self):
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+    @contextmanager
+    def read_locked(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write_locked(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class CacheManager:
+    """
+    Owns everything BeyondDnDClient keeps on disk (character store + component ledger) and the locks around it.
+
+    Reads happen inside reading(), any read-modify-write cycle (refresh, delete, consume) inside writing(), so FastAPI's
+    threadpool can serve page loads in parallel while mutations are serialized. Readers get snapshot isolation for
+    free from the store being copy-on-write: the dict returned by store.load() is never modified afterwards, a writer
+    swaps in a new one, so it can still be serialized after the lock is released.
+    Upstream fetches must happen outside writing(), only the cache update belongs in it.
+
+    writing() also holds the inter-process file lock and catches up on what other processes (uvicorn workers, CLI)
+    appended, so a check-then-write like consume can't act on stale counts. reading() only stats the files and
+    briefly takes the write lock to pull in new records when something changed.
+    """
+    _COMPONENT_LEDGER_FILE = 'component_ledger.jsonl'
+
+    def __init__(self, directory: Path):
+        self._directory = Path(directory)
+        self._file_lock = InterProcessLock(self._directory / LOCK_FILE)
+        self.store = CharacterStore(self._directory, lock=self._file_lock)
+        self.ledger = ComponentLedger(self._directory / self._COMPONENT_LEDGER_FILE, lock=self._file_lock)
+        self._lock = ReadWriteLock()
+        # {name: (store data, ledger version, value)}
+        self._derived: Dict[str, Tuple[dict, int, object]] = {}
+
+    @contextmanager
+    def reading(self):
+        with phase('cache_load'):
+            if self.store.has_external_changes() or self.ledger.has_external_changes():
+                with self._lock.write_locked():
+                    self.__sync()
+            self._lock.acquire_read()
+        try:
+            yield self
+        finally:
+            self._lock.release_read()
+
+    @contextmanager
+    def writing(self):
+        with phase('cache_write'), self._lock.write_locked(), self._file_lock:
+            self.__sync()
+            yield self
+
+    def derived(self, name: str, build: Callable[[dict], object]):
+        """
+        Something computed from the cached data and the ledger (campaign membership, ledger adjusted characters),
+        built once and reused until either of them changes. Only call inside reading() or writing() with data in the
+        store. Two readers may both build it, whichever finishes last is kept.
+        """
+        data = self.store.load()
+        version = self.ledger.version
+        entry = self._derived.get(name)
+        if entry is not None and entry[0] is data and entry[1] == version:
+            return entry[2]
+        value = build(data)
+        self._derived[name] = (data, version, value)
+        return value
+
+    def compact(self):
+        # Folds the journal into the snapshot and rewrites the ledger right away instead of waiting until they grow
+        with self.writing():
+            self.store.compact()
+            self.ledger.compact()
+
+    def clear(self):
+        # Only call inside writing(). Removes just this cache's own files: other parties live in subdirectories of
+        #   the default party's directory and the lock file may be waited on by other processes.
+        self.store.clear()
+        self.ledger.clear()
+
+    def __sync(self):
+        self.store.sync()
+        self.ledger.sync()
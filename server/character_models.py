@@ -0,0 +1,332 @@
+"""
+Compact models for the cached character data: __slots__ classes with interned strings and spells shared between
+characters. Models are immutable, replace() returns a changed copy.
+"""
+
+import sys
+import weakref
+from json import dumps
+from typing import Dict, List, Optional, Tuple, Union
+
+
+def _dumps(value) -> str:
+    return dumps(value, ensure_ascii=False, allow_nan=False, separators=(',', ':'))
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+class _Model:
+    __slots__ = ()
+
+    def to_dict(self) -> dict:
+        raise NotImplementedError
+
+    def __eq__(self, other):
+        return type(other) is type(self) and self.to_dict() == other.to_dict()
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.to_dict()!r})'
+
+
+class Spell(_Model):
+    __slots__ = (
+        'name', 'components_description', 'components_are_consumed', 'components_have_cost', 'focus_will_work',
+        'encoded', '__weakref__',
+    )
+    # One instance per distinct spell while any character still references it
+    _instances = weakref.WeakValueDictionary()
+
+    def __init__(self, name: Optional[str], components_description: str, components_are_consumed: bool,
+                 components_have_cost: bool, focus_will_work: bool):
+        self.name = _intern(name)
+        self.components_description = _intern(components_description)
+        self.components_are_consumed = components_are_consumed
+        self.components_have_cost = components_have_cost
+        self.focus_will_work = focus_will_work
+        self.encoded = _dumps(self.to_dict())
+
+    @classmethod
+    def get(cls, name: Optional[str], components_description: str, components_are_consumed: bool,
+            components_have_cost: bool, focus_will_work: bool) -> 'Spell':
+        key = (name, components_description, components_are_consumed, components_have_cost, focus_will_work)
+        spell = cls._instances.get(key)
+        if spell is None:
+            # Two threads racing here both get a valid spell, one of them just isn't shared
+            spell = cls(*key)
+            cls._instances[key] = spell
+        return spell
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Spell':
+        return cls.get(
+            data.get('name'),
+            data.get('componentsDescription', ''),
+            data.get('componentsAreConsumed', False),
+            data.get('componentsHaveCost', False),
+            data.get('focusWillWork', True),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'componentsDescription': self.components_description,
+            'componentsAreConsumed': self.components_are_consumed,
+            'componentsHaveCost': self.components_have_cost,
+            'focusWillWork': self.focus_will_work,
+        }
+
+    def _encode_into(self, parts: List[str]):
+        parts.append(self.encoded)
+
+
+class Focus(_Model):
+    __slots__ = ('name', 'type', 'sub_type', 'description')
+
+    def __init__(self, name: str = '', type: str = '', sub_type: str = '', description: str = ''):
+        self.name = _intern(name)
+        self.type = _intern(type)
+        self.sub_type = _intern(sub_type)
+        self.description = description
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> Optional['Focus']:
+        if data is None:
+            return None
+        return cls(data.get('name', ''), data.get('type', ''), data.get('subType', ''), data.get('description', ''))
+
+    def to_dict(self) -> dict:
+        return {'name': self.name, 'type': self.type, 'subType': self.sub_type, 'description': self.description}
+
+    def _encode_into(self, parts: List[str]):
+        parts.append(_dumps(self.to_dict()))
+
+
+class Campaign(_Model):
+    __slots__ = ('name', 'description', 'dm_username')
+
+    def __init__(self, name: str = '', description: str = '', dm_username: str = ''):
+        self.name = _intern(name)
+        self.description = description
+        self.dm_username = _intern(dm_username)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Campaign':
+        return cls(data.get('name', ''), data.get('description', ''), data.get('dmUsername', ''))
+
+    def to_dict(self) -> dict:
+        return {'name': self.name, 'description': self.description, 'dmUsername': self.dm_username}
+
+    def _encode_into(self, parts: List[str]):
+        parts.append(_dumps(self.to_dict()))
+
+
+# Field names as they appear in the JSON, in output order
+CHARACTER_FIELDS = ('name', 'spells', 'custom_items', 'inventory', 'focus', 'campaignId')
+
+
+def parse_fields(value: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """'name,focus' -> ('name', 'focus') in output order, None (everything) for an empty value"""
+    if not value:
+        return None
+    requested = {field.strip() for field in value.split(',') if field.strip()}
+    unknown = requested.difference(CHARACTER_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}. Valid fields: {', '.join(CHARACTER_FIELDS)}")
+    return tuple(field for field in CHARACTER_FIELDS if field in requested) or None
+
+
+class Character(_Model):
+    _ATTRIBUTES = ('name', 'spells', 'custom_items', 'inventory', 'focus', 'campaign_id')
+    __slots__ = _ATTRIBUTES + ('_fragments',)
+
+    def __init__(self, name: Optional[str], spells: Tuple[Spell, ...] = (), custom_items: Optional[Dict[str, str]] = None,
+                 inventory: Optional[Dict[str, int]] = None, focus: Optional[Focus] = None,
+                 campaign_id: Optional[str] = None):
+        self.name = _intern(name)
+        self.spells = tuple(spells)
+        self.custom_items = {_intern(key): value for key, value in (custom_items or {}).items()}
+        self.inventory = {_intern(key): value for key, value in (inventory or {}).items()}
+        self.focus = focus
+        self.campaign_id = _intern(campaign_id)
+        # Encoded '"field":value' fragments for projected responses, filled on first use
+        self._fragments: Optional[Dict[str, str]] = None
+
+    def replace(self, **changes) -> 'Character':
+        values = {attribute: getattr(self, attribute) for attribute in self._ATTRIBUTES}
+        values.update(changes)
+        return Character(**values)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Character':
+        return cls(
+            data.get('name'),
+            tuple(Spell.from_dict(spell) for spell in data.get('spells', [])),
+            data.get('custom_items', {}),
+            data.get('inventory', {}),
+            Focus.from_dict(data.get('focus')),
+            data.get('campaignId'),
+        )
+
+    def to_dict(self) -> dict:
+        data = {
+            'name': self.name,
+            'spells': [spell.to_dict() for spell in self.spells],
+            'custom_items': dict(self.custom_items),
+            'inventory': dict(self.inventory),
+            'focus': self.focus.to_dict() if self.focus else None,
+        }
+        if self.campaign_id is not None:
+            data['campaignId'] = self.campaign_id
+        return data
+
+    def _encode_into(self, parts: List[str], spell_table: Optional[Dict[str, str]] = None,
+                     fields: Optional[Tuple[str, ...]] = None):
+        if fields is not None:
+            self.__encode_fields_into(parts, spell_table, fields)
+            return
+        parts.append('{"name":')
+        parts.append(_dumps(self.name))
+        parts.append(',"spells":')
+        self.__encode_spells_into(parts, spell_table)
+        parts.append(',"custom_items":')
+        parts.append(_dumps(self.custom_items))
+        parts.append(',"inventory":')
+        parts.append(_dumps(self.inventory))
+        parts.append(',"focus":')
+        if self.focus is None:
+            parts.append('null')
+        else:
+            self.focus._encode_into(parts)
+        if self.campaign_id is not None:
+            parts.append(',"campaignId":')
+            parts.append(_dumps(self.campaign_id))
+        parts.append('}')
+
+    def __encode_fields_into(self, parts: List[str], spell_table: Optional[Dict[str, str]], fields: Tuple[str, ...]):
+        # Characters never change once created, so the fragments of small fields are kept and a projection like
+        #   fields=name,campaignId,focus is just joining strings. Spells are already pre-encoded flyweights.
+        fragments = self._fragments
+        if fragments is None:
+            fragments = self._fragments = {}
+        parts.append('{')
+        first = True
+        for field in fields:
+            if field == 'campaignId' and self.campaign_id is None:
+                # Omitted, same as in the full shape
+                continue
+            if not first:
+                parts.append(',')
+            first = False
+            if field == 'spells':
+                parts.append('"spells":')
+                self.__encode_spells_into(parts, spell_table)
+                continue
+            fragment = fragments.get(field)
+            if fragment is None:
+                fragment = f'"{field}":{self.__encode_field(field)}'
+                fragments[field] = fragment
+            parts.append(fragment)
+        parts.append('}')
+
+    def __encode_field(self, field: str) -> str:
+        if field == 'name':
+            return _dumps(self.name)
+        if field == 'custom_items':
+            return _dumps(self.custom_items)
+        if field == 'inventory':
+            return _dumps(self.inventory)
+        if field == 'focus':
+            return 'null' if self.focus is None else _dumps(self.focus.to_dict())
+        return _dumps(self.campaign_id)
+
+    def __encode_spells_into(self, parts: List[str], spell_table: Optional[Dict[str, str]]):
+        parts.append('[')
+        if spell_table is None:
+            parts.append(','.join([spell.encoded for spell in self.spells]))
+        else:
+            spell_ids = []
+            for spell in self.spells:
+                spell_id = spell_table.get(spell.encoded)
+                if spell_id is None:
+                    spell_id = str(len(spell_table))
+                    spell_table[spell.encoded] = spell_id
+                spell_ids.append(f'"{spell_id}"')
+            parts.append(','.join(spell_ids))
+        parts.append(']')
+
+
+def as_character(value: Union[Character, dict]) -> Character:
+    return value if isinstance(value, Character) else Character.from_dict(value)
+
+
+def as_campaign(value: Union[Campaign, dict]) -> Campaign:
+    return value if isinstance(value, Campaign) else Campaign.from_dict(value)
+
+
+def encode_json(content, fields: Optional[Tuple[str, ...]] = None) -> bytes:
+    """
+    JSON encodes content that may contain models anywhere inside dicts, lists and tuples. With fields, characters
+    only include those fields (see parse_fields).
+    """
+    parts: List[str] = []
+    _encode_into(content, parts, fields)
+    return ''.join(parts).encode('utf-8')
+
+
+def encode_with_spell_table(data: dict, fields: Optional[Tuple[str, ...]] = None) -> bytes:
+    """
+    Encodes {'characters', 'campaigns'} with every distinct spell once in a top level 'spells' table keyed by spell
+    id, characters list the ids of their spells instead of the full definitions.
+
+    Ids are numbered per response ("0", "1", ...) in order of first use. Short ids that repeat a lot compress well,
+    content hashes were tried and cost more bytes after gzip than the deduplication saved.
+    """
+    # Encoded definition -> id
+    spell_table: Dict[str, str] = {}
+    parts = ['{"characters":{']
+    for index, (char_id, character) in enumerate(data.get('characters', {}).items()):
+        if index:
+            parts.append(',')
+        parts.append(_dumps(str(char_id)))
+        parts.append(':')
+        character._encode_into(parts, spell_table, fields)
+    parts.append('},"campaigns":')
+    _encode_into(data.get('campaigns', {}), parts)
+    parts.append(',"spells":{')
+    parts.append(','.join([f'"{spell_id}":{encoded}' for encoded, spell_id in spell_table.items()]))
+    parts.append('}}')
+    return ''.join(parts).encode('utf-8')
+
+
+def _encode_into(value, parts: List[str], fields: Optional[Tuple[str, ...]] = None):
+    if isinstance(value, Character):
+        value._encode_into(parts, fields=fields)
+    elif isinstance(value, _Model):
+        value._encode_into(parts)
+    elif isinstance(value, dict):
+        parts.append('{')
+        first = True
+        for key, item in value.items():
+            if not first:
+                parts.append(',')
+            first = False
+            if not isinstance(key, str):
+                # Same key conversion as json.dumps
+                key = _dumps(key) if key is None or isinstance(key, bool) else str(key)
+            parts.append(_dumps(key))
+            parts.append(':')
+            _encode_into(item, parts, fields)
+        parts.append('}')
+    elif isinstance(value, (list, tuple)):
+        parts.append('[')
+        for index, item in enumerate(value):
+            if index:
+                parts.append(',')
+            _encode_into(item, parts, fields)
+        parts.append(']')
+    else:
+        parts.append(_dumps(value))
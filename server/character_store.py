@@ -0,0 +1,379 @@
+import os
+import time
+import shutil
+import logging
+import threading
+from json import loads
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from character_models import as_campaign, as_character, encode_json
+from file_lock import InterProcessLock
+from metrics import CACHE_WRITE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+OP_REPLACE = 'replace'
+OP_PUT = 'put'
+OP_DELETE = 'delete'
+LOCK_FILE = '.cache.lock'
+
+
+def file_signature(path: Path) -> Optional[Tuple[int, int, int]]:
+    # Changes whenever the file is rewritten or swapped in by an atomic rename
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def read_complete_records(f, source: Path) -> Tuple[List[dict], int]:
+    # Returns the parsed records and how many bytes they span. A trailing line without a newline is either another
+    #   process mid-append or a torn write from a crash, it is left for the next read either way.
+    records = []
+    consumed = 0
+    for line in f:
+        if not line.endswith(b'\n'):
+            break
+        consumed += len(line)
+        if not line.strip():
+            continue
+        try:
+            records.append(loads(line))
+        except ValueError:
+            logger.warning(f'Skipping unreadable journal line in {source}')
+    return records, consumed
+
+
+def append_record(path: Path, line: bytes, offset: int) -> os.stat_result:
+    # Caller holds the inter-process lock and has read everything up to offset. Anything past it is a torn record
+    #   from a crashed writer, start on a fresh line so it stays an unreadable line of its own.
+    if not path.parent.exists():
+        os.makedirs(path.parent, exist_ok=True)
+    with open(path, 'ab') as f:
+        if f.tell() > offset:
+            line = b'\n' + line
+        f.write(line)
+        f.flush()
+        return os.fstat(f.fileno())
+
+
+class CharacterStore:
+    """
+    Cached character data kept as a JSON snapshot plus an append-only journal.
+
+    Every mutation is appended to the journal as one small record (O(change) instead of rewriting the whole party)
+    and applied to the in-memory copy. On load the snapshot is read and the journal replayed on top of it. Once the
+    journal outgrows the snapshot a background thread folds it into a new snapshot that is swapped in with an atomic
+    rename, so a crash at any point leaves either the old or the new snapshot plus a journal that replays onto it.
+
+    Several processes can share one directory. Writers take an inter-process file lock, catch up on the journal and
+    then append. Every other process follows the journal from the byte offset it last read, so seeing another
+    worker's refresh costs a stat and reading the new records, not a reload. Only a compaction or clear done
+    elsewhere (new snapshot or journal file) triggers a full reload.
+
+    The in-memory data is copy-on-write: mutations build new top level dicts and never edit a character in place, so
+    anything returned from load() can be handed out without copying, but must not be modified by the caller.
+    Characters and campaigns are held as the compact models from character_models, plain dicts passed in (or read
+    from disk) are converted on the way in.
+
+    When each character was last fetched is kept next to the data rather than in it (it isn't part of what the API
+    returns): replace and put records carry their time and the snapshot stores the times under 'fetchedAt'.
+    """
+    _SNAPSHOT_FILE = 'local_character_data.json'
+    _JOURNAL_FILE = 'local_character_data.journal'
+    _COMPACTING_SUFFIX = '.compacting'
+    # Journal is folded into the snapshot when it is larger than the snapshot and at least this big
+    _COMPACT_MIN_BYTES = 256 * 1024
+    _RELOAD_ATTEMPTS = 5
+    _COMPACTOR_IDLE_SECONDS = 30
+
+    def __init__(self, directory: Path, lock: Optional[InterProcessLock] = None,
+                 compact_min_bytes: Optional[int] = None):
+        self._directory = Path(directory)
+        self._snapshot_path = self._directory / self._SNAPSHOT_FILE
+        self._journal_path = self._directory / self._JOURNAL_FILE
+        self._compacting_path = self._directory / (self._JOURNAL_FILE + self._COMPACTING_SUFFIX)
+        self._file_lock = lock or InterProcessLock(self._directory / LOCK_FILE)
+        self._compact_min_bytes = self._COMPACT_MIN_BYTES if compact_min_bytes is None else compact_min_bytes
+        self._lock = threading.RLock()
+        self._data: Optional[dict] = None
+        # {char_id: epoch seconds}, copy-on-write like the data
+        self._fetched_at: Dict[str, float] = {}
+        # What was read from disk: snapshot identity, journal identity and how far into the journal we are
+        self._snapshot_signature = None
+        self._journal_inode = None
+        self._journal_offset = 0
+        self._compacting_bytes = 0
+        self._snapshot_bytes = 0
+        self._compact_requested = threading.Event()
+        self._compactor: Optional[threading.Thread] = None
+        self._compactor_lock = threading.Lock()
+
+    def load(self) -> Optional[dict]:
+        # Returns None when nothing has been cached yet, same as a missing file used to
+        with self._lock:
+            if self._data is None:
+                self.__reload()
+            if not self._data['characters'] and not self._data['campaigns']:
+                return None
+            return self._data
+
+    def fetched_at(self) -> Dict[str, float]:
+        # Characters cached before fetch times were recorded are missing, do not modify
+        with self._lock:
+            if self._data is None:
+                self.__reload()
+            return self._fetched_at
+
+    def has_external_changes(self) -> bool:
+        # Cheap stat based check whether another process wrote since we last read
+        with self._lock:
+            if self._data is None:
+                return True
+            if file_signature(self._snapshot_path) != self._snapshot_signature:
+                return True
+            try:
+                journal_stat = os.stat(self._journal_path)
+            except FileNotFoundError:
+                return self._journal_inode is not None
+            return journal_stat.st_ino != self._journal_inode or journal_stat.st_size > self._journal_offset
+
+    def sync(self):
+        with self._lock:
+            if self._data is None or file_signature(self._snapshot_path) != self._snapshot_signature:
+                self.__reload()
+                return
+            self.__tail_journal()
+
+    def replace(self, data: dict):
+        self.__mutate({
+            'op': OP_REPLACE, 'at': time.time(),
+            'data': self.__to_models(data.get('characters'), data.get('campaigns')),
+        })
+
+    def put(self, characters: Optional[dict] = None, campaigns: Optional[dict] = None):
+        self.__mutate({'op': OP_PUT, 'at': time.time(), **self.__to_models(characters, campaigns)})
+
+    def delete(self, char_ids: Iterable[str] = (), campaign_ids: Iterable[str] = ()):
+        self.__mutate({'op': OP_DELETE, 'characters': list(char_ids), 'campaigns': list(campaign_ids)})
+
+    def clear(self):
+        with self._file_lock, self._lock:
+            for path in (self._snapshot_path, self._journal_path, self._compacting_path):
+                if path.exists():
+                    os.remove(path)
+            self._data = {'characters': {}, 'campaigns': {}}
+            self._fetched_at = {}
+            self._snapshot_signature = None
+            self._journal_inode = None
+            self._journal_offset = 0
+            self._compacting_bytes = 0
+            self._snapshot_bytes = 0
+
+    def compact(self):
+        # The file lock is held throughout so no process appends to a journal that is being folded away. The store
+        #   lock is only held for the rotation, readers in this process keep being served while the snapshot is written
+        with self._file_lock:
+            with self._lock:
+                self.sync()
+                if self._journal_offset == 0 and self._compacting_bytes == 0:
+                    # Nothing to fold, or another process already compacted
+                    return
+                data = self._data
+                fetched_at = self._fetched_at
+                if not self._compacting_path.exists():
+                    if self._journal_path.exists():
+                        os.replace(self._journal_path, self._compacting_path)
+                elif self._journal_path.exists():
+                    # Left behind by an interrupted compaction, keep its records ahead of the current journal
+                    with open(self._journal_path, 'rb') as src, open(self._compacting_path, 'ab') as dest:
+                        shutil.copyfileobj(src, dest)
+                    os.remove(self._journal_path)
+                self._journal_inode = None
+                self._journal_offset = 0
+            tmp_path, snapshot_bytes = self.__write_snapshot_tmp(data, fetched_at)
+            with self._lock:
+                os.replace(tmp_path, self._snapshot_path)
+                self._snapshot_signature = file_signature(self._snapshot_path)
+                self._snapshot_bytes = snapshot_bytes
+                if self._compacting_path.exists():
+                    os.remove(self._compacting_path)
+                self._compacting_bytes = 0
+
+    def __mutate(self, record: dict):
+        with CACHE_WRITE_SECONDS.time(record['op']), self._file_lock, self._lock:
+            self.sync()
+            line = encode_json(record) + b'\n'
+            journal_stat = append_record(self._journal_path, line, self._journal_offset)
+            self._journal_inode = journal_stat.st_ino
+            self._journal_offset = journal_stat.st_size
+            self._data = self.__apply(self._data, record)
+            self._fetched_at = self.__apply_fetch_time(self._fetched_at, record)
+            if self._journal_offset + self._compacting_bytes >= max(self._compact_min_bytes, self._snapshot_bytes):
+                self.__request_compaction()
+
+    @staticmethod
+    def __to_models(characters: Optional[dict], campaigns: Optional[dict]) -> dict:
+        return {
+            'characters': {char_id: as_character(character) for char_id, character in (characters or {}).items()},
+            'campaigns': {
+                campaign_id: as_campaign(campaign) for campaign_id, campaign in (campaigns or {}).items()
+            },
+        }
+
+    @classmethod
+    def __apply(cls, data: dict, record: dict) -> dict:
+        op = record.get('op')
+        if op == OP_REPLACE:
+            replacement = record['data']
+            return cls.__to_models(replacement.get('characters'), replacement.get('campaigns'))
+        characters = dict(data['characters'])
+        campaigns = dict(data['campaigns'])
+        if op == OP_PUT:
+            put = cls.__to_models(record.get('characters'), record.get('campaigns'))
+            characters.update(put['characters'])
+            campaigns.update(put['campaigns'])
+        elif op == OP_DELETE:
+            for char_id in record.get('characters', []):
+                characters.pop(char_id, None)
+            for campaign_id in record.get('campaigns', []):
+                campaigns.pop(campaign_id, None)
+        else:
+            logger.warning(f'Skipping unknown character journal op: {op}')
+            return data
+        return {'characters': characters, 'campaigns': campaigns}
+
+    @staticmethod
+    def __apply_fetch_time(fetched_at: Dict[str, float], record: dict) -> Dict[str, float]:
+        op = record.get('op')
+        if op == OP_REPLACE:
+            at = record.get('at')
+            return {char_id: at for char_id in record['data'].get('characters') or {}} if at else {}
+        if op == OP_PUT:
+            at = record.get('at')
+            fetched_at = dict(fetched_at)
+            for char_id in record.get('characters') or {}:
+                if at:
+                    fetched_at[char_id] = at
+                else:
+                    fetched_at.pop(char_id, None)
+            return fetched_at
+        if op == OP_DELETE:
+            return {char_id: at for char_id, at in fetched_at.items() if char_id not in record.get('characters', [])}
+        return fetched_at
+
+    def __reload(self):
+        # Without the file lock a compaction elsewhere can swap the snapshot mid-read, retry until it held still
+        for _ in range(self._RELOAD_ATTEMPTS):
+            snapshot_signature = self.__read_from_disk()
+            if file_signature(self._snapshot_path) == snapshot_signature:
+                break
+        if self._compacting_bytes:
+            # Interrupted (or in progress elsewhere) compaction, the compactor takes the lock and finishes folding it
+            self.__request_compaction()
+
+    def __read_from_disk(self) -> Optional[Tuple[int, int, int]]:
+        data = {'characters': {}, 'campaigns': {}}
+        fetched_at = {}
+        snapshot_signature = None
+        snapshot_bytes = 0
+        try:
+            with open(self._snapshot_path, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                body = f.read()
+            snapshot_signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            snapshot_bytes = len(body)
+            snapshot = loads(body)
+            data = self.__to_models(snapshot.get('characters'), snapshot.get('campaigns'))
+            fetched_at = snapshot.get('fetchedAt') or {}
+        except FileNotFoundError:
+            pass
+
+        compacting_bytes = 0
+        try:
+            with open(self._compacting_path, 'rb') as f:
+                records, compacting_bytes = read_complete_records(f, self._compacting_path)
+            for record in records:
+                data = self.__apply(data, record)
+                fetched_at = self.__apply_fetch_time(fetched_at, record)
+        except FileNotFoundError:
+            pass
+
+        journal_inode = None
+        journal_offset = 0
+        try:
+            with open(self._journal_path, 'rb') as f:
+                journal_inode = os.fstat(f.fileno()).st_ino
+                records, journal_offset = read_complete_records(f, self._journal_path)
+            for record in records:
+                data = self.__apply(data, record)
+                fetched_at = self.__apply_fetch_time(fetched_at, record)
+        except FileNotFoundError:
+            pass
+
+        self._data = data
+        self._fetched_at = fetched_at
+        self._snapshot_signature = snapshot_signature
+        self._snapshot_bytes = snapshot_bytes
+        self._compacting_bytes = compacting_bytes
+        self._journal_inode = journal_inode
+        self._journal_offset = journal_offset
+        return snapshot_signature
+
+    def __tail_journal(self):
+        try:
+            with open(self._journal_path, 'rb') as f:
+                if os.fstat(f.fileno()).st_ino != self._journal_inode:
+                    # Journal was rotated or recreated by another process, our offset means nothing in it
+                    self.__reload()
+                    return
+                f.seek(self._journal_offset)
+                records, consumed = read_complete_records(f, self._journal_path)
+        except FileNotFoundError:
+            if self._journal_inode is not None:
+                self.__reload()
+            return
+        data = self._data
+        fetched_at = self._fetched_at
+        for record in records:
+            data = self.__apply(data, record)
+            fetched_at = self.__apply_fetch_time(fetched_at, record)
+        self._data = data
+        self._fetched_at = fetched_at
+        self._journal_offset += consumed
+
+    def __write_snapshot_tmp(self, data: dict, fetched_at: Dict[str, float]) -> Tuple[Path, int]:
+        if not self._directory.exists():
+            os.makedirs(self._directory, exist_ok=True)
+        body = encode_json({**data, 'fetchedAt': fetched_at})
+        tmp_path = self._snapshot_path.with_name(self._snapshot_path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+            f.flush()
+            os.fsync(f.fileno())
+        return tmp_path, len(body)
+
+    def __request_compaction(self):
+        with self._compactor_lock:
+            self._compact_requested.set()
+            if self._compactor is None or not self._compactor.is_alive():
+                self._compactor = threading.Thread(
+                    target=self.__run_compactor, name='character-store-compactor', daemon=True
+                )
+                self._compactor.start()
+
+    def __run_compactor(self):
+        # Exits once idle so stores of evicted parties don't keep a thread (and their data) alive forever
+        while True:
+            if not self._compact_requested.wait(self._COMPACTOR_IDLE_SECONDS):
+                with self._compactor_lock:
+                    if not self._compact_requested.is_set():
+                        self._compactor = None
+                        return
+            self._compact_requested.clear()
+            try:
+                self.compact()
+            except Exception as e:
+                logger.error(f'Character store compaction failed: {repr(e)}')
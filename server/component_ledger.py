@@ -0,0 +1,242 @@
+import os
+import time
+import logging
+import threading
+from json import dumps
+from pathlib import Path
+from typing import Dict, Optional
+
+from character_store import LOCK_FILE, append_record, read_complete_records
+from file_lock import InterProcessLock
+
+logger = logging.getLogger(__name__)
+
+RECORD_ADJUST = 'adjust'
+RECORD_RESET = 'reset'
+# First line of a compacted file, unique per compaction. Tells a rewritten file apart from the one a process was
+#   following when the new file got the old one's inode number.
+RECORD_COMPACTED = 'compacted'
+
+
+class ComponentLedger:
+    """
+    Local consumption ledger for SMC custom item counts.
+
+    Consuming or restocking a component does not touch D&D Beyond or the cached character snapshot, it appends a
+    single delta line to a small jsonl file and keeps a running total in memory. Each entry remembers the upstream
+    value it was recorded against ('base') so the next refresh can tell whether the player already synced the item
+    on D&D Beyond (drop the delta) or not (keep applying it).
+
+    Like the character journal it is shared between processes: appends happen under the inter-process lock and other
+    processes pick the new lines up from their last read offset. Entries are edited in place, so sync() and the
+    mutating methods must not run concurrently with readers (CacheManager only calls them under its write lock).
+
+    Resets and repeated adjustments leave lines behind that no longer matter. Once the file is several times the size
+    of its live entries it is rewritten with one line per entry and swapped in with an atomic rename, other processes
+    see the new file and replay it.
+    """
+    # The file is rewritten when it is at least this big and this many times the size of the live entries
+    _COMPACT_MIN_BYTES = 64 * 1024
+    _COMPACT_RATIO = 4
+
+    def __init__(self, file_path: Path, lock: Optional[InterProcessLock] = None,
+                 compact_min_bytes: Optional[int] = None):
+        self._file_path = Path(file_path)
+        self._file_lock = lock or InterProcessLock(self._file_path.parent / LOCK_FILE)
+        # File size at which compaction is next considered, raised when the live entries alone are too big for it
+        self._compact_at = self._COMPACT_MIN_BYTES if compact_min_bytes is None else compact_min_bytes
+        self._lock = threading.RLock()
+        # {char_id: {component_name: {'base': str, 'delta': int}}}
+        self._entries: Optional[Dict[str, Dict[str, dict]]] = None
+        self._file_inode = None
+        self._offset = 0
+        # First line of the file followed, None until it has one
+        self._head: Optional[bytes] = None
+        # Bumped whenever the entries change, lets readers cache what they derive from them
+        self._version = 0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def get_adjustments(self, char_id: str) -> Dict[str, dict]:
+        return self.__entries().get(char_id, {})
+
+    def has_adjustments(self) -> bool:
+        return any(self.__entries().values())
+
+    def has_external_changes(self) -> bool:
+        with self._lock:
+            if self._entries is None:
+                return True
+            try:
+                stat = os.stat(self._file_path)
+            except FileNotFoundError:
+                return self._file_inode is not None
+            # Smaller than what was read means rewritten, even if the new file got the old one's inode number
+            return stat.st_ino != self._file_inode or stat.st_size != self._offset
+
+    def sync(self):
+        with self._lock:
+            if self._entries is None:
+                self.__replay()
+                return
+            try:
+                with open(self._file_path, 'rb') as f:
+                    stat = os.fstat(f.fileno())
+                    if stat.st_ino != self._file_inode or stat.st_size < self._offset or (
+                            self._head is not None and f.readline() != self._head):
+                        # Cleared and recreated or compacted by another process
+                        self.__replay()
+                        return
+                    f.seek(self._offset)
+                    records, consumed = read_complete_records(f, self._file_path)
+            except FileNotFoundError:
+                if self._file_inode is not None:
+                    self.__replay()
+                return
+            for record in records:
+                self.__apply(self._entries, record)
+            if records:
+                self._version += 1
+            self._offset += consumed
+
+    def record(self, char_id: str, component: str, base: str, delta: int) -> int:
+        record = {'op': RECORD_ADJUST, 'characterId': char_id, 'component': component, 'base': base, 'delta': delta}
+        with self._file_lock, self._lock:
+            self.sync()
+            self.__append(record)
+            self.__apply(self._entries, record)
+            self._version += 1
+            delta = self._entries[char_id][component]['delta']
+            self.__maybe_compact()
+            return delta
+
+    def reconcile(self, char_id: str, upstream_custom_items: Optional[dict]):
+        # Upstream counts changed since the delta was recorded -> the player updated D&D Beyond, upstream wins
+        with self._file_lock, self._lock:
+            self.sync()
+            upstream_custom_items = upstream_custom_items or {}
+            for component, entry in list(self._entries.get(char_id, {}).items()):
+                if upstream_custom_items.get(component) != entry['base']:
+                    record = {'op': RECORD_RESET, 'characterId': char_id, 'component': component}
+                    self.__append(record)
+                    self.__apply(self._entries, record)
+                    self._version += 1
+            self.__maybe_compact()
+
+    def forget(self, char_id: str):
+        with self._file_lock, self._lock:
+            self.sync()
+            if self._entries.get(char_id):
+                record = {'op': RECORD_RESET, 'characterId': char_id}
+                self.__append(record)
+                self.__apply(self._entries, record)
+                self._version += 1
+                self.__maybe_compact()
+
+    def compact(self):
+        # Rewrites the file with only the live entries right away
+        with self._file_lock, self._lock:
+            self.sync()
+            if self._file_inode is not None:
+                self.__rewrite(self.__live_records())
+
+    def clear(self):
+        with self._file_lock, self._lock:
+            self._entries = {}
+            self._version += 1
+            self._file_inode = None
+            self._offset = 0
+            self._head = None
+            if self._file_path.exists():
+                os.remove(self._file_path)
+
+    def __entries(self) -> Dict[str, Dict[str, dict]]:
+        if self._entries is None:
+            with self._lock:
+                if self._entries is None:
+                    self.__replay()
+        return self._entries
+
+    def __replay(self):
+        entries = {}
+        file_inode = None
+        offset = 0
+        head = None
+        try:
+            with open(self._file_path, 'rb') as f:
+                file_inode = os.fstat(f.fileno()).st_ino
+                head = f.readline()
+                f.seek(0)
+                records, offset = read_complete_records(f, self._file_path)
+            for record in records:
+                self.__apply(entries, record)
+        except FileNotFoundError:
+            pass
+        self._entries = entries
+        self._version += 1
+        self._file_inode = file_inode
+        self._offset = offset
+        self._head = head if head and head.endswith(b'\n') else None
+
+    @staticmethod
+    def __apply(entries: Dict[str, Dict[str, dict]], record: dict):
+        char_id = record.get('characterId')
+        component = record.get('component')
+        if record.get('op') == RECORD_ADJUST:
+            char_entries = entries.setdefault(char_id, {})
+            entry = char_entries.get(component)
+            if not entry or entry['base'] != record['base']:
+                entry = {'base': record['base'], 'delta': 0}
+                char_entries[component] = entry
+            entry['delta'] += record['delta']
+        elif record.get('op') == RECORD_RESET:
+            if component is None:
+                entries.pop(char_id, None)
+            elif char_id in entries:
+                entries[char_id].pop(component, None)
+                if not entries[char_id]:
+                    del entries[char_id]
+
+    def __maybe_compact(self):
+        # Caller holds both locks and the entries are in sync with the file
+        if self._offset < self._compact_at:
+            return
+        body = self.__live_records()
+        if self._offset < self._COMPACT_RATIO * len(body):
+            # Mostly live entries, wait until the file is far enough past them
+            self._compact_at = self._COMPACT_RATIO * len(body)
+            return
+        self.__rewrite(body)
+
+    def __live_records(self) -> bytes:
+        # One adjust record per entry replays to the same entries, deltas of 0 included
+        return b''.join(
+            (dumps({'op': RECORD_ADJUST, 'characterId': char_id, 'component': component, 'base': entry['base'],
+                    'delta': entry['delta']}) + '\n').encode()
+            for char_id, char_entries in self._entries.items()
+            for component, entry in char_entries.items()
+        )
+
+    def __rewrite(self, body: bytes):
+        head = (dumps({'op': RECORD_COMPACTED, 'at': time.time_ns()}) + '\n').encode()
+        tmp_path = self._file_path.with_name(self._file_path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(head + body)
+            f.flush()
+            os.fsync(f.fileno())
+            stat = os.fstat(f.fileno())
+        os.replace(tmp_path, self._file_path)
+        logger.info(f'Compacted {self._file_path.name} from {self._offset} to {stat.st_size} bytes')
+        self._file_inode = stat.st_ino
+        self._offset = stat.st_size
+        self._head = head
+
+    def __append(self, record: dict):
+        line = (dumps(record) + '\n').encode()
+        if self._offset == 0:
+            self._head = line
+        stat = append_record(self._file_path, line, self._offset)
+        self._file_inode = stat.st_ino
+        self._offset = stat.st_size
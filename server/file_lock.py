@@ -0,0 +1,79 @@
+import os
+import threading
+from pathlib import Path
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+
+class InterProcessLock:
+    """
+    Exclusive lock shared by every process (uvicorn worker, CLI, ...) using the same cache directory.
+
+    Re-entrant within a process: threads queue on an RLock and only the outermost acquire takes the OS level lock,
+    so the compactor thread and a request thread of the same worker serialize like two different workers would.
+    The lock file itself is never deleted, otherwise processes could end up holding locks on different files.
+    """
+
+    def __init__(self, path: Path):
+        self._path = Path(path)
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                self.__lock_file()
+            except BaseException:
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            self.__unlock_file()
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    def __lock_file(self):
+        if not self._path.parent.exists():
+            os.makedirs(self._path.parent, exist_ok=True)
+        self._file = open(self._path, 'a+b')
+        try:
+            if os.name == 'nt':
+                self._file.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        # LK_LOCK gives up after ~10 seconds, keep waiting like flock does
+                        continue
+            else:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        except BaseException:
+            self._file.close()
+            self._file = None
+            raise
+
+    def __unlock_file(self):
+        try:
+            if os.name == 'nt':
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,172 @@
+import gc
+import os
+import sys
+import threading
+import tracemalloc
+from typing import Callable, Optional, Set
+
+# Off by default: POST /debug/memory/refresh force refreshes a whole party from D&D Beyond with tracing slowing it down
+MEMORY_TRACING_ENV_VAR = 'DND_TRACKER_MEMORY_TRACING'
+# Frames kept per allocation while a refresh is being traced
+TRACEMALLOC_FRAMES = 25
+
+# tracemalloc is process wide, one trace at a time or the first one to finish stops it under the others
+_trace_lock = threading.Lock()
+
+
+class TraceInProgressError(RuntimeError):
+    pass
+
+
+def memory_tracing_enabled() -> bool:
+    return os.environ.get(MEMORY_TRACING_ENV_VAR, '').strip().lower() in ('1', 'true', 'yes')
+
+
+def deep_sizeof(obj, seen: Optional[Set[int]] = None) -> int:
+    """
+    Bytes held by obj and everything reachable through its dicts, lists, tuples and sets. Objects already in seen are
+    not counted again, pass one set across calls to count objects shared between them (e.g. interned strings or
+    spells) once.
+    """
+    if seen is None:
+        seen = set()
+    size = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        else:
+            # Slotted models, their attributes aren't in a __dict__
+            for cls in type(current).__mro__:
+                for slot in getattr(cls, '__slots__', ()):
+                    if slot != '__weakref__' and hasattr(current, slot):
+                        stack.append(getattr(current, slot))
+    return size
+
+
+def process_rss_bytes() -> Optional[int]:
+    """Current resident set size of this process, None where it can't be read"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    if os.name == 'nt':
+        return _windows_working_set_bytes()
+    try:
+        import resource
+        # Only the peak is available here (macOS reports bytes, other BSDs kilobytes)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except (ImportError, OSError):
+        return None
+
+
+def _windows_working_set_bytes() -> Optional[int]:
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [
+            ('cb', wintypes.DWORD),
+            ('PageFaultCount', wintypes.DWORD),
+            ('PeakWorkingSetSize', ctypes.c_size_t),
+            ('WorkingSetSize', ctypes.c_size_t),
+            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+            ('PagefileUsage', ctypes.c_size_t),
+            ('PeakPagefileUsage', ctypes.c_size_t),
+        ]
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    try:
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return None
+    except (AttributeError, OSError):
+        return None
+    return counters.WorkingSetSize
+
+
+def character_data_report(data: Optional[dict]) -> dict:
+    """
+    Sizes of a cached party. Per character and per campaign sizes count everything the entry references, the store
+    total counts objects shared between entries once, so it can be less than the sum of the parts.
+    """
+    data = data or {'characters': {}, 'campaigns': {}}
+    characters = data.get('characters', {})
+    campaigns = data.get('campaigns', {})
+    character_sizes = {char_id: deep_sizeof(character) for char_id, character in characters.items()}
+    campaign_sizes = {}
+    for campaign_id, campaign in campaigns.items():
+        members = [character for character in characters.values() if character.campaign_id == campaign_id]
+        campaign_sizes[campaign_id] = {
+            'bytes': deep_sizeof(campaign),
+            'characters': len(members),
+            # Campaign metadata plus its characters, shared objects counted once
+            'withCharactersBytes': deep_sizeof([campaign] + members),
+        }
+    return {
+        'storeBytes': deep_sizeof(data),
+        'characters': dict(sorted(character_sizes.items(), key=lambda item: item[1], reverse=True)),
+        'campaigns': campaign_sizes,
+    }
+
+
+def trace_allocations(func: Callable, top: int = 20):
+    """
+    Runs func between two tracemalloc snapshots and returns its result with the biggest allocation differences by
+    source line. Tracing is switched off again afterwards unless it was already on. Raises TraceInProgressError
+    instead of waiting when another trace is running.
+    """
+    if not _trace_lock.acquire(blocking=False):
+        raise TraceInProgressError('An allocation trace is already running')
+    try:
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        try:
+            gc.collect()
+            rss_before = process_rss_bytes()
+            before = tracemalloc.take_snapshot()
+            result = func()
+            gc.collect()
+            after = tracemalloc.take_snapshot()
+            rss_after = process_rss_bytes()
+        finally:
+            if started:
+                tracemalloc.stop()
+    finally:
+        _trace_lock.release()
+    filters = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<unknown>'),
+    ]
+    stats = after.filter_traces(filters).compare_to(before.filter_traces(filters), 'lineno')
+    diff = {
+        'rssBeforeBytes': rss_before,
+        'rssAfterBytes': rss_after,
+        'netAllocatedBytes': sum(stat.size_diff for stat in stats),
+        'top': [
+            {
+                'location': f'{stat.traceback[0].filename}:{stat.traceback[0].lineno}',
+                'sizeDiffBytes': stat.size_diff,
+                'countDiff': stat.count_diff,
+                'sizeBytes': stat.size,
+            }
+            for stat in stats[:top]
+        ],
+    }
+    return result, diff
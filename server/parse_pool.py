@@ -0,0 +1,148 @@
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional, Tuple
+
+from character_models import Campaign, Character
+
+logger = logging.getLogger(__name__)
+
+# Worker processes bulk refreshes decode and format character service responses in, 'auto' for one per CPU. Unset or
+#   0 keeps parsing in-process
+PARSE_WORKERS_ENV_VAR = 'DND_TRACKER_PARSE_WORKERS'
+# Batches with fewer characters than this are parsed in-process, handing bodies to another process costs more than
+#   it saves for a few of them
+PARSE_MIN_BATCH_ENV_VAR = 'DND_TRACKER_PARSE_MIN_BATCH'
+DEFAULT_MIN_BATCH = 8
+# A pool that broke this many times in a row (e.g. workers that can't start) is given up on, parsing stays in-process
+MAX_CONSECUTIVE_FAILURES = 3
+
+Parsed = Tuple[Character, Optional[str], Optional[Campaign]]
+
+# The client each worker process parses with, created once per process by _init_worker
+_worker_client = None
+
+
+def _init_worker():
+    global _worker_client
+    from beyond_dnd import BeyondDnDClient
+    _worker_client = BeyondDnDClient(parse_pool=ParsePool(0))
+
+
+def _parse_in_worker(content: bytes, char_id: str) -> Tuple[dict, Optional[str], Optional[dict]]:
+    # Sent back as plain dicts, the parent rebuilds the models so its spells stay shared with the rest of the cache
+    character, campaign_id, campaign = _worker_client.parse_character_content(content, char_id)
+    return character.to_dict(), campaign_id, campaign.to_dict() if campaign else None
+
+
+def _workers_from_env() -> int:
+    value = os.environ.get(PARSE_WORKERS_ENV_VAR, '0').strip().lower()
+    if value == 'auto':
+        return os.cpu_count() or 1
+    try:
+        return max(0, int(value or 0))
+    except ValueError:
+        logger.warning(f"Invalid {PARSE_WORKERS_ENV_VAR}={value}, parsing in-process")
+        return 0
+
+
+def _min_batch_from_env() -> int:
+    value = os.environ.get(PARSE_MIN_BATCH_ENV_VAR, '').strip()
+    if not value:
+        return DEFAULT_MIN_BATCH
+    try:
+        return max(1, int(value))
+    except ValueError:
+        logger.warning(f"Invalid {PARSE_MIN_BATCH_ENV_VAR}={value}, using {DEFAULT_MIN_BATCH}")
+        return DEFAULT_MIN_BATCH
+
+
+class ParsePool:
+    """
+    Optional process pool for the CPU-bound part of a bulk refresh: decoding a few hundred KB of JSON per character and
+    formatting it, which threads can't spread over cores. Raw response bodies go to the workers and only the compact
+    formatted character comes back.
+
+    The workers are started (spawned, forking a threaded server isn't safe) on the first batch that uses them and kept
+    for the next ones. If a worker dies, what it didn't finish is parsed in-process and a new pool is started.
+    """
+
+    def __init__(self, workers: int, min_batch: int = DEFAULT_MIN_BATCH):
+        self.workers = workers
+        self.min_batch = min_batch
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._failures = 0
+
+    @classmethod
+    def from_env(cls) -> 'ParsePool':
+        return cls(_workers_from_env(), _min_batch_from_env())
+
+    def use_for(self, batch_size: int) -> bool:
+        return self.workers > 0 and batch_size >= self.min_batch
+
+    def submit(self, content: bytes, char_id: str, fallback: Callable[[bytes, str], Parsed]) -> '_Pending':
+        """Starts parsing in a worker, fallback (in-process parsing) is used instead if the pool is broken"""
+        executor = self.__executor()
+        if executor is None:
+            return _Pending(None, None, content, char_id, fallback)
+        try:
+            future = executor.submit(_parse_in_worker, content, char_id)
+        except BrokenProcessPool:
+            self.__discard_executor(executor)
+            future = None
+        return _Pending(executor, future, content, char_id, fallback)
+
+    def result(self, pending: '_Pending') -> Parsed:
+        if pending.future is not None:
+            try:
+                character, campaign_id, campaign = pending.future.result()
+                self._failures = 0
+                return Character.from_dict(character), campaign_id, Campaign.from_dict(campaign) if campaign else None
+            except BrokenProcessPool:
+                self.__discard_executor(pending.executor)
+        return pending.fallback(pending.content, pending.char_id)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def __executor(self) -> Optional[ProcessPoolExecutor]:
+        with self._lock:
+            if self._executor is None and self.workers > 0:
+                logger.info(f"Starting {self.workers} parse worker(s)")
+                self._executor = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context('spawn'), initializer=_init_worker
+                )
+            return self._executor
+
+    def __discard_executor(self, executor: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            self._failures += 1
+            if self._failures >= MAX_CONSECUTIVE_FAILURES:
+                logger.error(f"Parse pool broke {self._failures} times in a row, parsing in-process from now on")
+                self.workers = 0
+            else:
+                logger.warning("Parse pool broke, parsing in-process until a new one is started")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+class _Pending:
+    """A character handed to the pool, with what it takes to parse it in-process instead"""
+    __slots__ = ('executor', 'future', 'content', 'char_id', 'fallback')
+
+    def __init__(self, executor: Optional[ProcessPoolExecutor], future: Optional[Future], content: bytes, char_id: str,
+                 fallback: Callable[[bytes, str], Parsed]):
+        self.executor = executor
+        self.future = future
+        self.content = content
+        self.char_id = char_id
+        self.fallback = fallback
@@ -0,0 +1,199 @@
+import os
+import re
+import asyncio
+import sys
+import time
+import logging
+import functools
+import threading
+from collections import defaultdict
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from fastapi.routing import APIRoute
+
+logger = logging.getLogger(__name__)
+
+# Off by default: tracing every call slows the profiled request down several times over
+PROFILING_ENV_VAR = 'DND_TRACKER_PROFILING'
+PROFILE_QUERY_PARAM = 'profile'
+PROFILE_HEADER = 'x-profile'
+PROFILE_FILE_SUFFIX = '.collapsed'
+PROFILE_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_.-]+\.collapsed$')
+# Stacks with less self time than this are folded into their caller, most of a profile's lines are one-off stacks of
+#   a few microseconds (imports, the requests/urllib3 internals)
+MIN_STACK_MICROSECONDS = 100
+# Profiles kept on disk, the oldest are deleted past either limit
+MAX_PROFILES = 20
+MAX_PROFILE_BYTES = 64 * 1024 * 1024
+
+_current_profile: ContextVar[Optional['StackProfiler']] = ContextVar('request_profile', default=None)
+
+
+def profiling_enabled() -> bool:
+    return os.environ.get(PROFILING_ENV_VAR, '').strip().lower() in ('1', 'true', 'yes')
+
+
+class StackProfiler:
+    """Deterministic profiler for the thread it runs in, giving collapsed stacks ('outer;inner;leaf <microseconds>')"""
+
+    def __init__(self):
+        self._stack: List[str] = []
+        self._totals: Dict[Tuple[str, ...], float] = defaultdict(float)
+        self._last = 0.0
+
+    def runcall(self, func: Callable, *args, **kwargs):
+        self._last = time.perf_counter()
+        sys.setprofile(self.__trace)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            sys.setprofile(None)
+            self.__charge(time.perf_counter())
+
+    def collapsed(self, min_microseconds: int = MIN_STACK_MICROSECONDS) -> str:
+        by_depth = defaultdict(dict)
+        for stack, seconds in self._totals.items():
+            by_depth[len(stack)][stack] = seconds
+        totals = {}
+        # Deepest first, a caller can get over the minimum with what its callees folded into it
+        for depth in range(max(by_depth, default=0), 0, -1):
+            for stack, seconds in by_depth[depth].items():
+                if depth > 1 and seconds * 1_000_000 < min_microseconds:
+                    parents = by_depth[depth - 1]
+                    parents[stack[:-1]] = parents.get(stack[:-1], 0.0) + seconds
+                else:
+                    totals[stack] = seconds
+        lines = []
+        for stack, seconds in sorted(totals.items()):
+            microseconds = int(seconds * 1_000_000)
+            if microseconds:
+                lines.append(f"{';'.join(stack)} {microseconds}")
+        return '\n'.join(lines) + '\n'
+
+    def __trace(self, frame, event, arg):
+        if event.startswith('c_'):
+            # c_call, c_return and c_exception, the time stays with the calling Python function
+            return
+        now = time.perf_counter()
+        self.__charge(now)
+        if event == 'call':
+            code = frame.f_code
+            # co_qualname is Python 3.11+, older versions only have the bare name
+            self._stack.append(f"{frame.f_globals.get('__name__', '?')}:{getattr(code, 'co_qualname', code.co_name)}")
+        elif self._stack:
+            # Returns from frames that were entered before profiling started are ignored
+            self._stack.pop()
+        self._last = now
+
+    def __charge(self, now: float):
+        if self._stack:
+            self._totals[tuple(self._stack)] += now - self._last
+
+
+class ProfileStore:
+    """Keeps the most recent profiles as files, oldest ones are deleted past max_profiles or max_bytes in total"""
+
+    def __init__(self, directory: Path, max_profiles: int = MAX_PROFILES, max_bytes: int = MAX_PROFILE_BYTES):
+        self._directory = Path(directory)
+        self._max_profiles = max_profiles
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def save(self, method: str, path: str, profile: str) -> str:
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', path).strip('_') or 'root'
+        name = f'{time.strftime("%Y%m%dT%H%M%S")}-{time.time_ns() % 1_000_000_000:09d}-{method}-{slug[:60]}'
+        name += PROFILE_FILE_SUFFIX
+        with self._lock:
+            os.makedirs(self._directory, exist_ok=True)
+            with open(self._directory / name, 'w') as f:
+                f.write(profile)
+            kept_bytes = 0
+            for index, profile in enumerate(self.list()):
+                kept_bytes += profile['bytes']
+                # The newest one is kept even if it is bigger than max_bytes by itself
+                if index and (index >= self._max_profiles or kept_bytes > self._max_bytes):
+                    try:
+                        os.remove(self._directory / profile['name'])
+                    except FileNotFoundError:
+                        pass
+        return name
+
+    def list(self) -> List[dict]:
+        # Newest first
+        if not self._directory.exists():
+            return []
+        profiles = [
+            {'name': entry.name, 'bytes': entry.stat().st_size, 'createdAt': entry.stat().st_mtime}
+            for entry in os.scandir(self._directory)
+            if entry.is_file() and PROFILE_NAME_PATTERN.match(entry.name)
+        ]
+        return sorted(profiles, key=lambda profile: profile['name'], reverse=True)
+
+    def read(self, name: str) -> Optional[str]:
+        if not PROFILE_NAME_PATTERN.match(name):
+            return None
+        try:
+            with open(self._directory / name, 'r') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+class ProfiledRoute(APIRoute):
+    """Route class running sync endpoints under the request's StackProfiler, on the thread that executes them"""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if not asyncio.iscoroutinefunction(endpoint):
+            endpoint = _profiled(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+def _profiled(endpoint: Callable) -> Callable:
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        profiler = _current_profile.get()
+        if profiler is None:
+            return endpoint(*args, **kwargs)
+        return profiler.runcall(endpoint, *args, **kwargs)
+    return wrapper
+
+
+class ProfilingMiddleware:
+    """Profiles requests with ?profile=1 when DND_TRACKER_PROFILING is set, the profile's name goes in X-Profile"""
+
+    def __init__(self, app, store: ProfileStore):
+        self.app = app
+        self.store = store
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self.__profile_requested(scope):
+            await self.app(scope, receive, send)
+            return
+        profiler = StackProfiler()
+        token = _current_profile.set(profiler)
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                # The endpoint has returned by now, its profile is complete
+                try:
+                    name = self.store.save(scope.get('method', ''), scope.get('path', ''), profiler.collapsed())
+                    headers = list(message.get('headers', [])) + [(PROFILE_HEADER.encode(), name.encode())]
+                    message = {**message, 'headers': headers}
+                except OSError as e:
+                    logger.error(f'Could not store request profile: {repr(e)}')
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_profile.reset(token)
+
+    @staticmethod
+    def __profile_requested(scope) -> bool:
+        if not profiling_enabled():
+            return False
+        values = parse_qs(scope.get('query_string', b'').decode('latin-1')).get(PROFILE_QUERY_PARAM, [])
+        return any(value.lower() in ('1', 'true', 'yes') for value in values)
@@ -0,0 +1,91 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from metrics import STARTUP_PHASE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Checks every server waits on, main.py adds 'frontend' when it serves the built frontend
+DEFAULT_CHECKS = ('cache',)
+
+
+class Readiness:
+    """
+    What /readyz reports: the server is ready once every required check (frontend path resolved, cache warmed, ...)
+    has been marked ready. Liveness is separate, /healthz answers as soon as the port is bound.
+
+    Work that carries on after the server is ready (e.g. refreshing stale characters) reports through progress(), it
+    shows up in /readyz without holding readiness back.
+
+    Startup phases timed with phase() are logged and exported as dnd_startup_phase_duration_seconds, so is the time
+    from this object's creation (the app being imported) until the last check passed, as phase 'ready'.
+    """
+
+    def __init__(self, checks=DEFAULT_CHECKS):
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._checks: Dict[str, dict] = {}
+        self._phases: Dict[str, float] = {}
+        self._progress: Dict[str, dict] = {}
+        self._ready = threading.Event()
+        for name in checks:
+            self.require(name)
+
+    def require(self, name: str):
+        with self._lock:
+            if name not in self._checks:
+                self._checks[name] = {'ready': False, 'detail': None}
+                self._ready.clear()
+
+    def update(self, name: str, detail):
+        """Progress of a required check that isn't done yet"""
+        with self._lock:
+            if name in self._checks:
+                self._checks[name]['detail'] = detail
+
+    def progress(self, name: str, detail: dict):
+        with self._lock:
+            self._progress[name] = detail
+
+    def mark_ready(self, name: str, detail=None):
+        with self._lock:
+            self._checks[name] = {'ready': True, 'detail': detail}
+            if self._ready.is_set() or not all(check['ready'] for check in self._checks.values()):
+                return
+            self._ready.set()
+        self.record_phase('ready', time.perf_counter() - self._started)
+
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def record_phase(self, name: str, seconds: float):
+        with self._lock:
+            self._phases[name] = seconds * 1000
+        STARTUP_PHASE_SECONDS.set(name, value=seconds)
+        logger.info(f"Startup phase {name} took {seconds * 1000:.1f}ms")
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_phase(name, time.perf_counter() - start)
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                'ready': self._ready.is_set(),
+                'checks': {name: dict(check) for name, check in self._checks.items()},
+                'startupPhasesMs': {name: round(ms, 3) for name, ms in self._phases.items()},
+                'background': dict(self._progress),
+            }
+
+
+READINESS = Readiness()
@@ -0,0 +1,163 @@
+import re
+import time
+from json import dumps, loads
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from fastapi.responses import JSONResponse
+
+from character_models import encode_json, encode_with_spell_table
+
+# Query parameter that also puts the breakdown into the JSON body, for clients that can't see response headers
+DEBUG_QUERY_PARAM = 'debug_timing'
+
+# Descriptions can come from the URL (character ids). Header values are limited to printable ASCII here, anything
+#   else is dropped and the quoted-string specials are escaped
+_UNPRINTABLE = re.compile(r'[^\x20-\x7e]')
+_QUOTED_SPECIALS = re.compile(r'(["\\])')
+
+_current_timings: ContextVar[Optional['RequestTimings']] = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Phases recorded while serving one request, in the order they finished"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases: List[Tuple[str, float, Optional[str]]] = []
+
+    def add(self, name: str, seconds: float, description: Optional[str] = None):
+        # list.append is atomic, phases may be recorded from threadpool threads
+        self.phases.append((name, seconds * 1000, description))
+
+    def header_value(self, total_seconds: float) -> str:
+        entries = []
+        for name, duration_ms, description in self.phases:
+            entry = f'{name};dur={duration_ms:.2f}'
+            description = _quoted(description) if description else None
+            if description:
+                entry += f';desc="{description}"'
+            entries.append(entry)
+        entries.append(f'total;dur={total_seconds * 1000:.2f}')
+        return ', '.join(entries)
+
+    def as_dict(self, total_seconds: float) -> dict:
+        return {
+            'phases': [
+                {'name': name, 'durationMs': round(duration_ms, 3), 'description': description}
+                for name, duration_ms, description in self.phases
+            ],
+            'totalMs': round(total_seconds * 1000, 3),
+        }
+
+
+def _quoted(description: str) -> str:
+    return _QUOTED_SPECIALS.sub(r'\\\1', _UNPRINTABLE.sub('', description))
+
+
+@contextmanager
+def phase(name: str, description: Optional[str] = None):
+    """Times the block as one Server-Timing entry of the current request, a no-op outside of one"""
+    timings = _current_timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start, description)
+
+
+class TimedJSONResponse(JSONResponse):
+    """
+    JSONResponse for character data: encodes the character models straight to bytes, limited to fields if given,
+    and records doing so as the 'serialize' phase
+    """
+
+    def __init__(self, content, *args, fields: Optional[Tuple[str, ...]] = None, **kwargs):
+        # Set before JSONResponse.__init__, which renders the body
+        self.fields = fields
+        super().__init__(content, *args, **kwargs)
+
+    def render(self, content) -> bytes:
+        with phase('serialize'):
+            return encode_json(content, self.fields)
+
+
+class SpellTableJSONResponse(TimedJSONResponse):
+    """Party data with the spell definitions deduplicated into a top level 'spells' table"""
+
+    def render(self, content) -> bytes:
+        with phase('serialize'):
+            return encode_with_spell_table(content, self.fields)
+
+
+class ServerTimingMiddleware:
+    """
+    Adds a Server-Timing header breaking the request down into the phases recorded with phase() (cache load,
+    upstream fetch per character, formatting, cache write, serialization), so browser devtools show where a slow
+    refresh spent its time. With ?debug_timing=true the same breakdown is added to a JSON object body as 'debugTiming'.
+
+    The timings object lives in a context variable, FastAPI copies the context into the threadpool that runs the sync
+    routes so phases recorded there end up on the right request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+        debug = self.__debug_requested(scope)
+        response_start = {}
+        body_parts = []
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                if debug:
+                    # Held back until the body is complete, the debug block changes its length
+                    response_start.update(message)
+                    return
+                headers = list(message.get('headers', []))
+                headers.append((b'server-timing', timings.header_value(time.perf_counter() - timings.start).encode()))
+                message = {**message, 'headers': headers}
+            elif debug and message['type'] == 'http.response.body':
+                body_parts.append(message.get('body', b''))
+                if message.get('more_body', False):
+                    return
+                await self.__send_debug_response(send, timings, response_start, b''.join(body_parts))
+                return
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_timings.reset(token)
+
+    @staticmethod
+    def __debug_requested(scope) -> bool:
+        values = parse_qs(scope.get('query_string', b'').decode('latin-1')).get(DEBUG_QUERY_PARAM, [])
+        return any(value.lower() in ('1', 'true', 'yes') for value in values)
+
+    @staticmethod
+    async def __send_debug_response(send, timings: RequestTimings, response_start: dict, body: bytes):
+        total_seconds = time.perf_counter() - timings.start
+        headers = [(key, value) for key, value in response_start.get('headers', []) if key.lower() != b'content-length']
+        if any(key.lower() == b'content-type' and value.startswith(b'application/json') for key, value in headers):
+            try:
+                content = loads(body)
+            except ValueError:
+                content = None
+            if isinstance(content, dict):
+                content['debugTiming'] = timings.as_dict(total_seconds)
+                body = dumps(content).encode()
+        headers.append((b'content-length', str(len(body)).encode()))
+        headers.append((b'server-timing', timings.header_value(total_seconds).encode()))
+        await send({**response_start, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
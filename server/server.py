@@ -1,4 +1,8 @@
+import os
+import logging
+import threading
 import uvicorn
+from contextlib import asynccontextmanager
 from typing import Optional, List, Annotated
 from http import HTTPStatus
 from fastapi import FastAPI, Query
@@ -7,9 +11,67 @@ from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
 
-from beyond_dnd import BeyondDnDClient, BeyondDnDAPIError
+from beyond_dnd import BeyondDnDClient, BeyondDnDAPIError, DEFAULT_PARTY
+from metrics import REGISTRY, CONTENT_TYPE, MetricsMiddleware
+from request_timing import ServerTimingMiddleware, SpellTableJSONResponse, TimedJSONResponse
+from character_models import parse_fields
+from profiling import ProfiledRoute, ProfileStore, ProfilingMiddleware, profiling_enabled
+from memory_report import (
+    TraceInProgressError, character_data_report, memory_tracing_enabled, process_rss_bytes, trace_allocations
+)
+from readiness import READINESS
+
+logger = logging.getLogger(__name__)
+
+
+# Characters last fetched longer ago than this many seconds are refetched in the background after startup, unset
+#   or 0 leaves the cache as it is
+STALE_REFRESH_ENV_VAR = 'DND_TRACKER_REFRESH_STALE_AFTER'
+
+
+def stale_refresh_seconds() -> float:
+    value = os.environ.get(STALE_REFRESH_ENV_VAR, '').strip()
+    if not value:
+        return 0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        logger.warning(f"Invalid {STALE_REFRESH_ENV_VAR}={value}, not refreshing stale characters")
+        return 0
+
+
+def warm_up_cache():
+    # Loads the default party and builds its indexes so the first page load is served from memory
+    READINESS.update('cache', {'stage': 'loading'})
+    try:
+        with READINESS.phase('cache_warm'):
+            summary = beyond.warm_up()
+        READINESS.mark_ready('cache', summary)
+    except Exception as e:
+        # Requests will run into the same problem and report it, an unreadable cache shouldn't keep the UI closed
+        logger.error(f"Cache warm-up failed: {repr(e)}")
+        READINESS.mark_ready('cache', {'error': repr(e)})
+        return
+    max_age = stale_refresh_seconds()
+    if max_age:
+        with READINESS.phase('stale_refresh'):
+            beyond.refresh_stale_characters(max_age, progress=lambda status: READINESS.progress('staleRefresh', status))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm-up runs next to the server rather than before it: /healthz answers right away, /readyz once the cache is
+    #   loaded. A stale refresh afterwards doesn't hold up readiness, its progress is listed under 'background'.
+    threading.Thread(target=warm_up_cache, name='cache-warm-up', daemon=True).start()
+    yield
+    # Stops the parse workers if a bulk refresh started them
+    beyond.close()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
+# Must be set before the routes below are declared
+app.router.route_class = ProfiledRoute
+profiles = ProfileStore(os.getcwd() + '/tmp/profiles/')
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,8 +80,13 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(ProfilingMiddleware, store=profiles)
 
 beyond = BeyondDnDClient()
+# For code that only gets hold of the app, like main.py's frontend routes
+app.state.beyond = beyond
 
 
 @app.exception_handler(RequestValidationError)
@@ -36,13 +103,129 @@ def testing_stuff(request: Request, exc: RequestValidationError):
     )
 
 
+@app.get('/metrics')
+def get_metrics():
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+@app.get('/healthz')
+async def get_health():
+    return JSONResponse(content={'status': 'ok'})
+
+
+@app.get('/readyz')
+async def get_readiness():
+    status = READINESS.status()
+    return JSONResponse(content=status, status_code=HTTPStatus.OK if status['ready'] else HTTPStatus.SERVICE_UNAVAILABLE)
+
+
+@app.get('/debug/profiles')
+def list_profiles():
+    if not profiling_enabled():
+        return JSONResponse(
+            content={'message': 'Profiling is disabled, set DND_TRACKER_PROFILING=1 to enable it.',
+                     'statusCode': HTTPStatus.NOT_FOUND},
+            status_code=HTTPStatus.NOT_FOUND
+        )
+    return JSONResponse(content={'profiles': profiles.list()})
+
+
+@app.get('/debug/profiles/{name}')
+def get_profile(name: str):
+    profile = profiles.read(name) if profiling_enabled() else None
+    if profile is None:
+        return JSONResponse(
+            content={'message': f'Profile not found: {name}', 'statusCode': HTTPStatus.NOT_FOUND},
+            status_code=HTTPStatus.NOT_FOUND
+        )
+    # Collapsed stacks, open with speedscope (https://www.speedscope.app) or flamegraph.pl
+    return Response(content=profile, media_type='text/plain; charset=utf-8')
+
+
+@app.get('/debug/memory')
+def get_memory_report(party: str = DEFAULT_PARTY):
+    try:
+        report = character_data_report(beyond.get_cached_character_data(party=party))
+    except BeyondDnDAPIError as e:
+        return JSONResponse(
+            content={'message': f'An error occurred: {repr(e)}', 'statusCode': HTTPStatus.INTERNAL_SERVER_ERROR},
+            status_code=e.status_code
+        )
+    return JSONResponse(content={'party': party, 'processRssBytes': process_rss_bytes(), **report})
+
+
+@app.post('/debug/memory/refresh')
+def trace_refresh_memory(
+        char_ids: Optional[List[str]] = Query(None, nullable=True), party: str = DEFAULT_PARTY,
+        top: int = Query(20, ge=1, le=200)
+):
+    # Force refreshes the party (the cached characters unless char_ids are given) with tracemalloc running around it
+    if not memory_tracing_enabled():
+        return JSONResponse(
+            content={'message': 'Memory tracing is disabled, set DND_TRACKER_MEMORY_TRACING=1 to enable it.',
+                     'statusCode': HTTPStatus.NOT_FOUND},
+            status_code=HTTPStatus.NOT_FOUND
+        )
+    try:
+        if not char_ids:
+            char_ids = list((beyond.get_cached_character_data(party=party) or {}).get('characters', {}))
+        char_data, allocations = trace_allocations(
+            lambda: beyond.get_all_characters_data(char_ids=char_ids, force_update=True, party=party), top=top
+        )
+        report = character_data_report(beyond.get_cached_character_data(party=party))
+    except TraceInProgressError as e:
+        return JSONResponse(
+            content={'message': f'{e}, try again once it finished.', 'statusCode': HTTPStatus.CONFLICT},
+            status_code=HTTPStatus.CONFLICT
+        )
+    except BeyondDnDAPIError as e:
+        return JSONResponse(
+            content={'message': f'An error occurred: {repr(e)}', 'statusCode': HTTPStatus.INTERNAL_SERVER_ERROR},
+            status_code=e.status_code
+        )
+    except Exception as e:
+        return JSONResponse(
+            content={'message': f'An error occurred: {repr(e)}', 'statusCode': HTTPStatus.INTERNAL_SERVER_ERROR},
+            status_code=HTTPStatus.INTERNAL_SERVER_ERROR
+        )
+    return JSONResponse(content={
+        'party': party,
+        'refreshedCharacters': len(char_data.get('characters', {})),
+        'processRssBytes': process_rss_bytes(),
+        'allocations': allocations,
+        **report,
+    })
+
+
+@app.get('/parties')
+def get_parties():
+    try:
+        return JSONResponse(content={'parties': beyond.list_parties()})
+    except Exception as e:
+        return JSONResponse(
+            content={'message': f'An error occurred: {repr(e)}', 'statusCode': HTTPStatus.INTERNAL_SERVER_ERROR},
+            status_code=HTTPStatus.INTERNAL_SERVER_ERROR
+        )
+
+
+# Every character route also exists under /parties/{party}, the plain routes are the default party
 @app.get('/characters')
+@app.get('/parties/{party}/characters')
 def get_all_character_data(
-        request: Request, char_ids: Optional[List[str]] = Query(None, nullable=True), force_update: bool = False
+        request: Request, char_ids: Optional[List[str]] = Query(None, nullable=True), force_update: bool = False,
+        party: str = DEFAULT_PARTY, spell_table: bool = False, fields: Optional[str] = None
 ):
     # Note: This would be simpler if the DnDBeyond API allowed for a get on campaign w/o auth. One ID, all characters.
     try:
-        char_data = beyond.get_all_characters_data(char_ids=char_ids, force_update=force_update)
+        # e.g. fields=name,campaignId,focus, characters are sent with just those fields
+        projection = parse_fields(fields)
+    except ValueError as e:
+        return JSONResponse(
+            content={'message': f'An error occurred: {repr(e)}', 'statusCode': HTTPStatus.BAD_REQUEST},
+            status_code=HTTPStatus.BAD_REQUEST
+        )
+    try:
+        char_data = beyond.get_all_characters_data(char_ids=char_ids, force_update=force_update, party=party)
     except BeyondDnDAPIError as e:
         return JSONResponse(
             content={'message': f'An error occurred: {repr(e)}', 'statusCode': HTTPStatus.INTERNAL_SERVER_ERROR},
@@ -53,14 +236,64 @@ def get_all_character_data(
             content={'message': f'An error occurred: {repr(e)}', 'statusCode': HTTPStatus.INTERNAL_SERVER_ERROR},
             status_code=HTTPStatus.INTERNAL_SERVER_ERROR
         )
-    return JSONResponse(content=char_data)
+    if spell_table:
+        # Opt-in shape: each spell definition once under 'spells', characters reference them by id
+        return SpellTableJSONResponse(content=char_data, fields=projection)
+    return TimedJSONResponse(content=char_data, fields=projection)
 
 
 @app.get("/characters/{char_id}")
-def get_character_data(request: Request, char_id: str, force_update: bool = False):
+@app.get("/parties/{party}/characters/{char_id}")
+def get_character_data(
+        request: Request, char_id: str, force_update: bool = False, party: str = DEFAULT_PARTY,
+        fields: Optional[str] = None
+):
+    try:
+        projection = parse_fields(fields)
+    except ValueError as e:
+        return JSONResponse(
+            content={'message': f'An error occurred: {repr(e)}', 'statusCode': HTTPStatus.BAD_REQUEST},
+            status_code=HTTPStatus.BAD_REQUEST
+        )
+    try:
+        char_data = beyond.get_one_characters_data(char_id=char_id, force_update=force_update, party=party)
+        return TimedJSONResponse(content=char_data, fields=projection)
+    except BeyondDnDAPIError as e:
+        return JSONResponse(
+            content={'message': f'An error occurred: {repr(e)}', 'statusCode': HTTPStatus.INTERNAL_SERVER_ERROR},
+            status_code=e.status_code
+        )
+    except Exception as e:
+        return JSONResponse(
+            content={'message': f'An error occurred: {repr(e)}', 'statusCode': HTTPStatus.INTERNAL_SERVER_ERROR},
+            status_code=HTTPStatus.INTERNAL_SERVER_ERROR
+        )
+
+
+@app.post("/characters/{char_id}/components/{component_name}/consume")
+@app.post("/parties/{party}/characters/{char_id}/components/{component_name}/consume")
+def consume_component(char_id: str, component_name: str, amount: int = Query(1, ge=1), party: str = DEFAULT_PARTY):
     try:
-        char_data = beyond.get_one_characters_data(char_id=char_id, force_update=force_update)
-        return JSONResponse(content=char_data)
+        updated_data = beyond.consume_component(char_id, component_name, amount, party=party)
+        return TimedJSONResponse(content=updated_data)
+    except BeyondDnDAPIError as e:
+        return JSONResponse(
+            content={'message': f'An error occurred: {repr(e)}', 'statusCode': HTTPStatus.INTERNAL_SERVER_ERROR},
+            status_code=e.status_code
+        )
+    except Exception as e:
+        return JSONResponse(
+            content={'message': f'An error occurred: {repr(e)}', 'statusCode': HTTPStatus.INTERNAL_SERVER_ERROR},
+            status_code=HTTPStatus.INTERNAL_SERVER_ERROR
+        )
+
+
+@app.post("/characters/{char_id}/components/{component_name}/restock")
+@app.post("/parties/{party}/characters/{char_id}/components/{component_name}/restock")
+def restock_component(char_id: str, component_name: str, amount: int = Query(1, ge=1), party: str = DEFAULT_PARTY):
+    try:
+        updated_data = beyond.restock_component(char_id, component_name, amount, party=party)
+        return TimedJSONResponse(content=updated_data)
     except BeyondDnDAPIError as e:
         return JSONResponse(
             content={'message': f'An error occurred: {repr(e)}', 'statusCode': HTTPStatus.INTERNAL_SERVER_ERROR},
@@ -74,10 +307,16 @@ def get_character_data(request: Request, char_id: str, force_update: bool = Fals
 
 
 @app.delete("/characters")
-def delete_cached_data():
+@app.delete("/parties/{party}/characters")
+def delete_cached_data(party: str = DEFAULT_PARTY):
     try:
-        beyond.delete_all_cached_character_data()
+        beyond.delete_all_cached_character_data(party=party)
         return Response(status_code=HTTPStatus.ACCEPTED)
+    except BeyondDnDAPIError as e:
+        return JSONResponse(
+            content={'message': f'An error occurred: {repr(e)}', 'statusCode': HTTPStatus.INTERNAL_SERVER_ERROR},
+            status_code=e.status_code
+        )
     except Exception as e:
         return JSONResponse(
             content={'message': f'An error occurred: {repr(e)}', 'statusCode': HTTPStatus.INTERNAL_SERVER_ERROR},
@@ -86,10 +325,11 @@ def delete_cached_data():
 
 
 @app.delete("/characters/{char_id}")
-def delete_character_by_id(char_id: str):
+@app.delete("/parties/{party}/characters/{char_id}")
+def delete_character_by_id(char_id: str, party: str = DEFAULT_PARTY):
     try:
-        updated_data = beyond.delete_character_by_id(char_id)
-        return JSONResponse(status_code=HTTPStatus.ACCEPTED, content=updated_data)
+        updated_data = beyond.delete_character_by_id(char_id, party=party)
+        return TimedJSONResponse(status_code=HTTPStatus.ACCEPTED, content=updated_data)
     except Exception as e:
         return JSONResponse(
             content={'message': f'An error occurred: {repr(e)}', 'statusCode': HTTPStatus.INTERNAL_SERVER_ERROR},
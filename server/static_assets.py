@@ -0,0 +1,210 @@
+import os
+import gzip
+import hashlib
+import mimetypes
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.responses import Response
+
+# Vite puts a content hash in every file name under assets/ (index-BX3kq9aZ.js), those never change under a URL
+HASHED_NAME_PATTERN = re.compile(r'[-.][A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Everything else (index.html above all) may be cached but has to be revalidated, which is a 304 while unchanged
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/javascript', 'application/json', 'application/manifest+json', 'image/svg+xml',
+    'application/xml', 'application/wasm',
+)
+# Smaller bodies fit in a packet either way, and the gzip variant is only kept if it saves at least this fraction
+MIN_COMPRESS_BYTES = 512
+MIN_COMPRESS_SAVING = 0.1
+
+Headers = List[Tuple[bytes, bytes]]
+
+
+class Asset:
+    """One file of the bundle with everything a response needs computed up front"""
+    __slots__ = ('body', 'etag', 'headers', 'gzip_body', 'gzip_etag', 'gzip_headers')
+
+    def __init__(self, body: bytes, content_type: str, cache_control: str, compress: bool):
+        self.body = body
+        self.etag = f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+        self.gzip_body = None
+        self.gzip_etag = None
+        vary = []
+        if compress and len(body) >= MIN_COMPRESS_BYTES:
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) <= len(body) * (1 - MIN_COMPRESS_SAVING):
+                self.gzip_body = compressed
+                # Strong ETags have to differ between encodings of the same file
+                self.gzip_etag = self.etag[:-1] + '-gz"'
+                vary = [(b'vary', b'Accept-Encoding')]
+        common = [(b'content-type', content_type.encode()), (b'cache-control', cache_control.encode())] + vary
+        self.headers: Headers = common + [(b'etag', self.etag.encode())]
+        self.gzip_headers: Optional[Headers] = None
+        if self.gzip_body is not None:
+            self.gzip_headers = common + [(b'etag', self.gzip_etag.encode()), (b'content-encoding', b'gzip')]
+
+    def select(self, accept_encoding: str, if_none_match: str) -> Tuple[int, bytes, Headers]:
+        """Status, body and headers for a request with these header values"""
+        if self.gzip_body is not None and _accepts_gzip(accept_encoding):
+            body, etag, headers = self.gzip_body, self.gzip_etag, self.gzip_headers
+        else:
+            body, etag, headers = self.body, self.etag, self.headers
+        if if_none_match and _etag_matches(if_none_match, etag):
+            return 304, b'', headers
+        return 200, body, headers + [(b'content-length', str(len(body)).encode())]
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    for coding in accept_encoding.lower().split(','):
+        name, _, params = coding.partition(';')
+        if name.strip() in ('gzip', '*'):
+            return params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == '*':
+        return True
+    # Weak comparison, which is what If-None-Match asks for
+    return any(tag.strip().removeprefix('W/') == etag for tag in if_none_match.split(','))
+
+
+class StaticBundle:
+    """
+    The built frontend (frontend/dist) read into memory once, with ETags and gzip variants computed at startup, so
+    serving a file is a dict lookup instead of a stat, an open and a read per request. The frontend doesn't change
+    while the server runs, a new build means restarting it anyway.
+
+    Hashed files under assets/ are served as immutable, browsers keep them for a year without asking again.
+    Everything else, index.html in particular, has to be revalidated and gets a 304 while it is unchanged.
+    """
+
+    def __init__(self, directory, immutable_prefix: str = 'assets/'):
+        self.directory = Path(directory)
+        self._assets: Dict[str, Asset] = {}
+        for root, _, files in os.walk(self.directory):
+            for file_name in files:
+                path = Path(root) / file_name
+                relative = path.relative_to(self.directory).as_posix()
+                with open(path, 'rb') as f:
+                    body = f.read()
+                content_type = mimetypes.guess_type(file_name)[0] or 'application/octet-stream'
+                if content_type.startswith('text/') or content_type == 'application/javascript':
+                    content_type += '; charset=utf-8'
+                immutable = relative.startswith(immutable_prefix) and HASHED_NAME_PATTERN.search(file_name)
+                self._assets[relative] = Asset(
+                    body, content_type,
+                    IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+                    content_type.startswith(COMPRESSIBLE_TYPES),
+                )
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._assets
+
+    def __len__(self) -> int:
+        return len(self._assets)
+
+    def total_bytes(self) -> int:
+        return sum(len(asset.body) + len(asset.gzip_body or b'') for asset in self._assets.values())
+
+    def get(self, path: str) -> Optional[Asset]:
+        return self._assets.get(path)
+
+    def response(self, path: str, request_headers) -> Response:
+        """Response for a route handler, e.g. index.html for / and SPA routes. Missing files are a 404."""
+        asset = self._assets.get(path)
+        if asset is None:
+            return Response(status_code=404)
+        return _asset_response(asset, request_headers)
+
+    def app(self, prefix: str = '') -> 'StaticBundleApp':
+        return StaticBundleApp(self, prefix)
+
+
+def _asset_response(asset: Asset, request_headers) -> Response:
+    status, body, headers = asset.select(
+        request_headers.get('accept-encoding', ''), request_headers.get('if-none-match', '')
+    )
+    response = Response(content=body, status_code=status)
+    # raw_headers keeps the precomputed ones as they are, content-length included
+    response.raw_headers = headers
+    return response
+
+
+class InlinedJSONPage:
+    """
+    A page of the bundle (index.html) with a JSON document inlined at the end of its <head> as
+    <script type="application/json" id="...">, so the frontend has the data without another round trip.
+
+    The combined page, with its ETag and gzip variant, is only rebuilt when a different document comes in: callers
+    pass the same bytes object for as long as their data is unchanged. Only call from one thread (the event loop).
+    """
+
+    def __init__(self, bundle: StaticBundle, path: str, element_id: str, attributes: Optional[Dict[str, str]] = None):
+        self._bundle = bundle
+        self._path = path
+        template = bundle.get(path).body
+        split = template.find(b'</head>')
+        if split < 0:
+            split = len(template)
+        self._head = template[:split]
+        self._tail = template[split:]
+        extra = ''.join(f' {name}="{value}"' for name, value in (attributes or {}).items())
+        self._open_tag = f'<script type="application/json" id="{element_id}"{extra}>'.encode()
+        self._document: Optional[bytes] = None
+        self._asset: Optional[Asset] = None
+
+    def response(self, document: Optional[bytes], request_headers) -> Response:
+        """The page with document inlined, the plain page if there is none"""
+        if document is None:
+            return self._bundle.response(self._path, request_headers)
+        if document is not self._document:
+            # '<' can't appear raw inside a script element, JSON strings may spell it as \u003c instead
+            inlined = self._head + self._open_tag + document.replace(b'<', b'\\u003c') + b'</script>' + self._tail
+            self._asset = Asset(inlined, 'text/html; charset=utf-8', REVALIDATE_CACHE_CONTROL, True)
+            self._document = document
+        return _asset_response(self._asset, request_headers)
+
+
+class StaticBundleApp:
+    """
+    ASGI app serving a StaticBundle under a mount, e.g. app.mount('/assets', bundle.app('assets/')). Requests are
+    answered straight from the precomputed bodies and headers, no Response objects involved.
+    """
+
+    def __init__(self, bundle: StaticBundle, prefix: str = ''):
+        self.bundle = bundle
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return
+        asset = self.bundle.get(self.prefix + self.__mounted_path(scope).lstrip('/'))
+        if asset is None or scope['method'] not in ('GET', 'HEAD'):
+            status = 404 if asset is None else 405
+            await send({'type': 'http.response.start', 'status': status, 'headers': [(b'content-length', b'0')]})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        accept_encoding = ''
+        if_none_match = ''
+        for key, value in scope['headers']:
+            if key == b'accept-encoding':
+                accept_encoding = value.decode('latin-1')
+            elif key == b'if-none-match':
+                if_none_match = value.decode('latin-1')
+        status, body, headers = asset.select(accept_encoding, if_none_match)
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body if scope['method'] == 'GET' else b''})
+
+    @staticmethod
+    def __mounted_path(scope) -> str:
+        # Starlette mounts keep the full path and add the mount point to root_path
+        path = scope['path']
+        root_path = scope.get('root_path', '')
+        if root_path and path.startswith(root_path):
+            return path[len(root_path):]
+        return path
@@ -0,0 +1,57 @@
+import time
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from upstream_trace import current_trace
+
+
+class _TracedConnectionMixin:
+    # Times opening a connection for the trace active on this thread. urllib3 resolves the name and connects in one
+    #   call, so connectMs covers both.
+    def _new_conn(self):
+        trace = current_trace()
+        if trace is None:
+            return super()._new_conn()
+        start = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            trace['connectMs'] = (trace['connectMs'] or 0) + (time.perf_counter() - start) * 1000
+
+
+class _TracedHTTPConnection(_TracedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TracedHTTPSConnection(_TracedConnectionMixin, HTTPSConnection):
+    def connect(self):
+        trace = current_trace()
+        if trace is None:
+            return super().connect()
+        before = trace['connectMs'] or 0
+        start = time.perf_counter()
+        super().connect()
+        # Whatever connect() spent besides opening the socket is the TLS handshake
+        elapsed = (time.perf_counter() - start) * 1000
+        trace['tlsMs'] = (trace['tlsMs'] or 0) + elapsed - ((trace['connectMs'] or 0) - before)
+
+
+class _TracedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TracedHTTPConnection
+
+
+class _TracedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TracedHTTPSConnection
+
+
+class TracedHTTPAdapter(HTTPAdapter):
+    """requests adapter whose connections report connect and TLS times to the active upstream trace"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TracedHTTPConnectionPool,
+            'https': _TracedHTTPSConnectionPool,
+        }
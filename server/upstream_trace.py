@@ -0,0 +1,113 @@
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+if TYPE_CHECKING:
+    import requests
+
+# Durations summarized by /debug/upstream
+TIMING_FIELDS = ('connectMs', 'tlsMs', 'ttfbMs', 'totalMs')
+
+_active = threading.local()
+
+
+def current_trace() -> Optional[dict]:
+    """Record of the upstream call in progress on this thread, None outside of UpstreamTracer.trace()"""
+    return getattr(_active, 'trace', None)
+
+
+def _percentile(sorted_values: List[float], p: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+
+class UpstreamTracer:
+    """
+    Keeps the last max_records D&D Beyond calls in memory: character id, start time, connect (name resolution
+    included)/TLS/TTFB/total durations, response size, status and retries. Timings are None when the phase did not
+    happen, e.g. no connect time for a request that reused a pooled connection.
+    """
+
+    def __init__(self, max_records: int = 500):
+        self._records = deque(maxlen=max_records)
+
+    @contextmanager
+    def trace(self, char_id: str):
+        record = {
+            'characterId': char_id,
+            'startedAt': time.time(),
+            'connectMs': None,
+            'tlsMs': None,
+            'ttfbMs': None,
+            'totalMs': None,
+            'bytes': None,
+            'statusCode': None,
+            'retries': 0,
+            'error': None,
+        }
+        previous = getattr(_active, 'trace', None)
+        _active.trace = record
+        start = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            record['error'] = repr(e)
+            raise
+        finally:
+            record['totalMs'] = (time.perf_counter() - start) * 1000
+            _active.trace = previous
+            # deque.append with maxlen is atomic, the oldest record drops out
+            self._records.append(record)
+
+    @staticmethod
+    def session() -> 'requests.Session':
+        # requests is a good part of the import time, loaded with the first upstream call instead of at startup
+        import requests
+        from traced_adapter import TracedHTTPAdapter
+        session = requests.Session()
+        adapter = TracedHTTPAdapter()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def records(self, char_id: Optional[str] = None) -> List[dict]:
+        records = list(self._records)
+        if char_id is not None:
+            records = [record for record in records if record['characterId'] == char_id]
+        return records
+
+    def summary(self, char_id: Optional[str] = None, slowest: int = 10) -> dict:
+        records = self.records(char_id)
+        timings: Dict[str, dict] = {}
+        for field in TIMING_FIELDS + ('bytes',):
+            values = sorted(record[field] for record in records if record[field] is not None)
+            if values:
+                timings[field] = {
+                    'p50': _percentile(values, 0.5),
+                    'p90': _percentile(values, 0.9),
+                    'p99': _percentile(values, 0.99),
+                    'max': values[-1],
+                }
+        statuses: Dict[str, int] = {}
+        per_character: Dict[str, List[float]] = {}
+        for record in records:
+            status = str(record['statusCode']) if record['statusCode'] is not None else 'error'
+            statuses[status] = statuses.get(status, 0) + 1
+            per_character.setdefault(record['characterId'], []).append(record['totalMs'])
+        slowest_characters = sorted(
+            (
+                {'characterId': cid, 'calls': len(totals), 'avgMs': sum(totals) / len(totals), 'maxMs': max(totals)}
+                for cid, totals in per_character.items()
+            ),
+            key=lambda entry: entry['avgMs'], reverse=True
+        )[:slowest]
+        return {
+            'calls': len(records),
+            'statusCodes': statuses,
+            'timings': timings,
+            'slowestCharacters': slowest_characters,
+        }
+
+
+UPSTREAM_TRACES = UpstreamTracer()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the on-disk cache: the component ledger and the journaled character store
+"""
+
+import os
+import sys
+import json
+
+import pytest
+
+# Add server directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'server'))
+
+from beyond_dnd import BeyondDnDAPIError, BeyondDnDClient
+from cache_manager import CacheManager
+from character_store import CharacterStore
+from component_ledger import ComponentLedger
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'test_data', 'full_fledged_custom_data.json')
+COMPONENT = 'Diamond_Dust'
+# Compaction thresholds no test reaches unless it compacts on purpose
+NEVER = 1 << 40
+
+
+def party(*char_ids):
+    with open(FIXTURE, 'rb') as f:
+        content = f.read()
+    client = BeyondDnDClient()
+    characters = {}
+    campaigns = {}
+    for char_id in char_ids:
+        character, campaign_id, campaign = client.parse_character_content(content, char_id)
+        characters[char_id] = character
+        campaigns[campaign_id] = campaign
+    return {'characters': characters, 'campaigns': campaigns}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # The client caches under the working directory
+    monkeypatch.chdir(tmp_path)
+    cache = CacheManager(tmp_path / 'tmp')
+    with cache.writing():
+        cache.store.replace(party('1'))
+    client = BeyondDnDClient()
+    yield client
+    client.close()
+
+
+def test_consume_and_restock(client):
+    assert party('1')['characters']['1'].custom_items[COMPONENT] == '500GP'
+    assert client.consume_component('1', COMPONENT, 3)['custom_items'][COMPONENT] == '497GP'
+    assert client.restock_component('1', COMPONENT)['custom_items'][COMPONENT] == '498GP'
+    assert json.loads(client.get_encoded_party())['characters']['1']['custom_items'][COMPONENT] == '498GP'
+    # The cached snapshot keeps the upstream count, only the ledger changed
+    assert client.get_cached_character_data()['characters']['1'].custom_items[COMPONENT] == '500GP'
+
+
+def test_consume_more_than_left(client):
+    client.consume_component('1', COMPONENT, 400)
+    with pytest.raises(BeyondDnDAPIError) as e:
+        client.consume_component('1', COMPONENT, 101)
+    assert e.value.status_code == 400
+    assert client.consume_component('1', COMPONENT, 100)['custom_items'][COMPONENT] == '0GP'
+
+
+def test_replay_skips_torn_trailing_line(tmp_path):
+    store = CharacterStore(tmp_path, compact_min_bytes=NEVER)
+    store.put(**party('1'))
+    with open(tmp_path / 'local_character_data.journal', 'ab') as f:
+        f.write(b'{"op": "put", "characters": {"2"')
+
+    store = CharacterStore(tmp_path, compact_min_bytes=NEVER)
+    assert list(store.load()['characters']) == ['1']
+
+    # The next record starts on a line of its own instead of completing the torn one
+    store.put(**party('3'))
+    assert sorted(CharacterStore(tmp_path, compact_min_bytes=NEVER).load()['characters']) == ['1', '3']
+
+
+def test_recovers_interrupted_compaction(tmp_path):
+    store = CharacterStore(tmp_path, compact_min_bytes=NEVER)
+    store.put(**party('1'))
+    # Crashed after rotating the journal, before the new snapshot was written
+    os.replace(tmp_path / 'local_character_data.journal', tmp_path / 'local_character_data.journal.compacting')
+
+    store = CharacterStore(tmp_path, compact_min_bytes=NEVER)
+    store.put(**party('2'))
+    store.compact()
+    assert not (tmp_path / 'local_character_data.journal.compacting').exists()
+    with open(tmp_path / 'local_character_data.json', 'rb') as f:
+        assert sorted(json.load(f)['characters']) == ['1', '2']
+    assert sorted(CharacterStore(tmp_path).load()['characters']) == ['1', '2']
+
+
+def test_ledger_compaction(tmp_path):
+    path = tmp_path / 'component_ledger.jsonl'
+    ledger = ComponentLedger(path, compact_min_bytes=4096)
+    for _ in range(200):
+        ledger.record('1', COMPONENT, '500GP', -1)
+        ledger.record('2', COMPONENT, '500GP', 1)
+    ledger.forget('2')
+
+    assert os.path.getsize(path) < 4096
+    assert ledger.get_adjustments('1') == {COMPONENT: {'base': '500GP', 'delta': -200}}
+    assert ComponentLedger(path).get_adjustments('1') == {COMPONENT: {'base': '500GP', 'delta': -200}}
+    assert not ComponentLedger(path).get_adjustments('2')
+
+
+def test_ledger_follows_rewritten_file(tmp_path):
+    path = tmp_path / 'component_ledger.jsonl'
+    writer = ComponentLedger(path, compact_min_bytes=NEVER)
+    follower = ComponentLedger(path, compact_min_bytes=NEVER)
+    writer.record('1', COMPONENT, '500GP', -1)
+    assert follower.get_adjustments('1')[COMPONENT]['delta'] == -1
+
+    writer.compact()
+    for _ in range(10):
+        writer.record('1', COMPONENT, '500GP', -1)
+    follower.sync()
+    assert follower.get_adjustments('1')[COMPONENT]['delta'] == -11
+
+    # Rewritten in place and grown past what the follower read, only the first line tells it apart
+    with open(path, 'rb') as f:
+        body = f.read()
+    with open(path, 'r+b') as f:
+        f.write(json.dumps({'op': 'compacted', 'at': 0}).encode() + b'\n' + body.split(b'\n', 1)[1] * 2)
+    assert follower.has_external_changes()
+    follower.sync()
+    assert follower.get_adjustments('1')[COMPONENT]['delta'] == -22